@@ -0,0 +1,94 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Compares the per-call overhead of the ctypes and cffi backends for every
+tracer factory of the native SDK interface.
+
+Run with the oneagent package (and cffi) importable, e.g.::
+
+    python benchmarks/bench_backends.py [--number N] [--sdklibname PATH]
+
+The agent is not initialized, so the native functions return immediately and
+the timings are dominated by the Python-side and FFI overhead.
+'''
+
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from oneagent._impl.native import sdkctypesiface
+
+try:
+    from oneagent._impl.native import sdkcffiiface
+except ImportError:
+    sdkcffiiface = None
+
+def tracer_factories(nsdk):
+    dbh = nsdk.databaseinfo_create(u'db', u'vendor', 1, u'localhost:5432')
+    wapph = nsdk.webapplicationinfo_create(u'vhost', u'app', u'/')
+    msgh = nsdk.messagingsysteminfo_create(u'vendor', u'queue', 1, 1, u'localhost:5672')
+    link = nsdk.create_in_process_link()
+    return (
+        ('customservicetracer_create',
+         lambda: nsdk.customservicetracer_create(u'method', u'Service')),
+        ('databaserequesttracer_create_sql',
+         lambda: nsdk.databaserequesttracer_create_sql(dbh, u'SELECT * FROM t')),
+        ('outgoingremotecalltracer_create',
+         lambda: nsdk.outgoingremotecalltracer_create(
+             u'method', u'Service', u'endpoint', 1, u'localhost:1234')),
+        ('incomingremotecalltracer_create',
+         lambda: nsdk.incomingremotecalltracer_create(u'method', u'Service', u'endpoint')),
+        ('incomingwebrequesttracer_create',
+         lambda: nsdk.incomingwebrequesttracer_create(wapph, u'/path?q=1', u'GET')),
+        ('outgoingwebrequesttracer_create',
+         lambda: nsdk.outgoingwebrequesttracer_create(u'http://host/path', u'GET')),
+        ('outgoingmessagetracer_create',
+         lambda: nsdk.outgoingmessagetracer_create(msgh)),
+        ('incomingmessagereceivetracer_create',
+         lambda: nsdk.incomingmessagereceivetracer_create(msgh)),
+        ('incomingmessageprocesstracer_create',
+         lambda: nsdk.incomingmessageprocesstracer_create(msgh)),
+        ('trace_in_process_link',
+         lambda: nsdk.trace_in_process_link(link)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--number', type=int, default=100000)
+    parser.add_argument('--sdklibname', default=None)
+    args = parser.parse_args()
+
+    backends = [('ctypes', sdkctypesiface.loadsdk(args.sdklibname))]
+    if sdkcffiiface is None:
+        print('cffi is not installed, only measuring ctypes.')
+    else:
+        backends.append(('cffi', sdkcffiiface.loadsdk(args.sdklibname)))
+
+    results = []
+    for _, nsdk in backends:
+        timings = []
+        for name, func in tracer_factories(nsdk):
+            best = min(timeit.repeat(func, number=args.number, repeat=3))
+            timings.append((name, best / args.number * 1e6))
+        results.append(timings)
+
+    print('{:<40}'.format('us per call') + ''.join(
+        '{:>10}'.format(name) for name, _ in backends))
+    for i, (name, _) in enumerate(results[0]):
+        print('{:<40}'.format(name) + ''.join(
+            '{:10.2f}'.format(timings[i][1]) for timings in results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Measures time and allocations per tracer on the no-op SDK (no agent).
+
+Run with the oneagent package importable (Python 3.4+), e.g.::
+
+    python benchmarks/bench_null_sdk.py [--number N]
+
+Without calling oneagent.initialize, oneagent.get_sdk() returns the no-op SDK.
+The "retained" column is the memory that is still allocated after keeping all
+N returned objects alive, divided by N, as reported by tracemalloc. It is zero
+if the calls return shared objects instead of allocating new ones.
+'''
+
+from __future__ import print_function
+
+import argparse
+import timeit
+import tracemalloc
+
+import oneagent
+from oneagent.sdk import Channel, ChannelType
+
+def make_cases():
+    sdk = oneagent.get_sdk()
+    chan = Channel(ChannelType.TCP_IP, 'localhost:5432')
+    dbinfo = sdk.create_database_info('db', 'PostgreSQL', chan)
+    webapp = sdk.create_web_application_info('vhost', 'app', '/')
+    headers = {'Host': 'example.com', 'Accept': '*/*'}
+    prepared = sdk.prepare_custom_service('method', 'Service')
+
+    def traced_with():
+        with sdk.trace_custom_service('method', 'Service') as tracer:
+            return tracer
+
+    return (
+        ('get_sdk', oneagent.get_sdk),
+        ('custom service', lambda: sdk.trace_custom_service('method', 'Service')),
+        ('custom service with', traced_with),
+        ('prepared custom service', prepared),
+        ('sql', lambda: sdk.trace_sql_database_request(dbinfo, 'SELECT 1')),
+        ('incoming web request', lambda: sdk.trace_incoming_web_request(
+            webapp, 'http://example.com/', 'GET', headers=headers)),
+        ('database info', lambda: sdk.create_database_info('db', 'PostgreSQL', chan)),
+        ('trace context', sdk.tracecontext_get_current))
+
+def retained_per_call(func, number):
+    results = [None] * number
+    func() # Warm up caches
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(number):
+            results[i] = func()
+        return (tracemalloc.get_traced_memory()[0] - before) / float(number)
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    print('{:<24} {:>10} {:>14}'.format('case', 'ns/call', 'retained B/call'))
+    for name, func in make_cases():
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print('{:<24} {:10.1f} {:14.2f}'.format(
+            name, best / args.number * 1e9, retained_per_call(func, args.number)))
+
+if __name__ == '__main__':
+    main()
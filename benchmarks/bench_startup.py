@@ -0,0 +1,60 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Measures how long loading the native SDK takes with eager and lazy binding.
+
+Run with the oneagent package importable, e.g.::
+
+    python benchmarks/bench_startup.py [--number N] [--sdklibname PATH]
+
+The "lazy + 1 tracer" line additionally binds the functions used to trace a
+single custom service call, which is closer to what a typical worker does.
+'''
+
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from oneagent._impl.native import sdkctypesiface
+
+def load(sdklibname, lazy_bind):
+    return sdkctypesiface.loadsdk(sdklibname, lazy_bind=lazy_bind)
+
+def load_and_bind_tracer(sdklibname):
+    nsdk = load(sdklibname, True)
+    #pylint:disable=pointless-statement
+    nsdk.customservicetracer_create
+    nsdk.tracer_start
+    nsdk.tracer_end
+    return nsdk
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--number', type=int, default=200)
+    parser.add_argument('--sdklibname', default=None)
+    args = parser.parse_args()
+
+    load(args.sdklibname, False) # Warm up: dlopen, imports
+    cases = (
+        ('eager', lambda: load(args.sdklibname, False)),
+        ('lazy', lambda: load(args.sdklibname, True)),
+        ('lazy + 1 tracer', lambda: load_and_bind_tracer(args.sdklibname)))
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print('{:<16} {:8.1f} us per load'.format(name, best / args.number * 1e6))
+
+if __name__ == '__main__':
+    main()
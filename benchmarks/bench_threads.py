@@ -0,0 +1,77 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Compares tracing throughput of many threads with and without retain_gil.
+
+Run with the oneagent package importable, e.g.::
+
+    python benchmarks/bench_threads.py [--threads N] [--iterations N]
+
+Each mode runs in a fresh interpreter, since the SDK can only be initialized
+once per process.
+'''
+
+from __future__ import print_function
+
+import argparse
+import subprocess
+import sys
+import threading
+import timeit
+
+def run_mode(retain_gil, threads, iterations):
+    import oneagent
+    oneagent.initialize(retain_gil=retain_gil)
+    sdk = oneagent.get_sdk()
+
+    def worker():
+        for _ in range(iterations):
+            with sdk.trace_custom_service('bench', 'BenchService'):
+                pass
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = timeit.default_timer()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = timeit.default_timer() - start
+    oneagent.shutdown()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--retain-gil', choices=('0', '1'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.retain_gil is not None:
+        print(run_mode(args.retain_gil == '1', args.threads, args.iterations))
+        return
+
+    total = args.threads * args.iterations
+    for retain_gil in ('0', '1'):
+        out = subprocess.check_output([
+            sys.executable, __file__,
+            '--threads', str(args.threads),
+            '--iterations', str(args.iterations),
+            '--retain-gil', retain_gil], universal_newlines=True)
+        elapsed = float(out.split()[-1])
+        print('retain_gil={:<5} {:8.2f} us per traced call, {:10.0f} calls/s'.format(
+            str(retain_gil == '1'), elapsed / total * 1e6, total / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -355,6 +355,10 @@ def main():
         include_package_data=True,
         zip_safe=True,
         python_requires='>=2.7,!=3.0.*,!=3.1.*,!=3.2.*,!=3.3.*',
+        extras_require={
+            # Faster calls into the native SDK, see sdkcffiiface.py
+            'cffi': ['cffi>=1.12'],
+        },
         cmdclass=cmdclss,
         name='oneagent-sdk',
         version=__version__,
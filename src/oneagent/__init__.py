@@ -77,6 +77,7 @@
 '''
 
 import logging
+import os
 import sys
 from collections import namedtuple
 from threading import Lock
@@ -85,7 +86,7 @@ from oneagent._impl.six.moves import range #pylint:disable=import-error
 from oneagent.version import __version__
 
 from .common import (
-    SDKError, SDKInitializationError, ErrorCode,
+    SDKError, SDKInitializationError, ErrorCode, AgentForkState,
     _ONESDK_INIT_FLAG_FORKABLE, _add_enum_helpers)
 from ._impl.native import nativeagent
 from ._impl.native.nativeagent import try_get_sdk
@@ -135,6 +136,16 @@ _should_shutdown = False
 
 _sdk_instance = None
 
+# The SDK instance returned by get_sdk. It is rebound to the native SDK by
+# initialize and to a null SDK by shutdown, so that references obtained before
+# initialize (e.g. by decorators) remain usable.
+_shared_sdk = None
+_shared_sdk_lk = Lock()
+
+# Whether forked children complete the agent initialization right away, see
+# initialize.
+_eager_child_init = False
+
 def sdkopts_from_commandline(argv=None, remove=False, prefix='--dt_'):
     '''Creates a SDK option list for use with the :code:`sdkopts` parameter of
     :func:`.initialize` from a list :code:`argv` of command line parameters.
@@ -180,18 +191,33 @@ def get_sdk():
     same object.
 
     .. note:: You have to initialize the SDK first using :meth:`initialize`
-        before this function will return a valid SDK instance.
+        before this function will return a valid SDK instance. Before that
+        (and after :func:`shutdown`), the returned instance does nothing and
+        its tracers are shared no-op objects.
 
     .. versionadded:: 1.1.0
-    '''
-    global _sdk_instance #pylint:disable=global-statement
-
-    if _sdk_instance is None:
-        return SDK(SDKNullInterface())
 
-    return _sdk_instance
-
-def initialize(sdkopts=(), sdklibname=None, forkable=False):
+    .. versionchanged:: 1.6.0
+        The same instance is returned before and after :func:`initialize` (it
+        starts tracing once the SDK is initialized). Previously, a new no-op
+        instance was returned for each call before initialization.
+    '''
+    sdk = _sdk_instance
+    if sdk is None:
+        sdk = _get_shared_sdk()
+    return sdk
+
+def _get_shared_sdk():
+    global _shared_sdk #pylint:disable=global-statement
+
+    with _shared_sdk_lk:
+        if _shared_sdk is None:
+            _shared_sdk = SDK(SDKNullInterface())
+        return _shared_sdk
+
+def initialize( #pylint:disable=too-many-arguments
+        sdkopts=(), sdklibname=None, forkable=False, lazy_bind=False, retain_gil=False,
+        backend=None, eager_child_init=False):
     '''Attempts to initialize the SDK with the specified options.
 
     Even if initialization fails, a dummy SDK will be available so that SDK
@@ -241,23 +267,67 @@ def initialize(sdkopts=(), sdklibname=None, forkable=False):
         You are responsible for providing a native SDK version that matches the
         Python SDK version.
     :param bool forkable: Use the SDK in 'forkable' mode.
+    :param bool lazy_bind: Only look up each native SDK function when it is
+        first used instead of all of them when loading the native SDK. This
+        reduces the startup time of processes that only use a few tracer types.
+        A native SDK library that lacks a function will then only fail when
+        that function is first used. Ignored in all but the first
+        :code:`initialize` call.
+
+        .. versionadded:: 1.6.0
+    :param bool retain_gil: Keep holding the Python GIL while calling short,
+        non-blocking native SDK functions (e.g. starting and ending tracers).
+        Releasing and re-acquiring the GIL usually costs more than these calls
+        themselves and causes lock convoys when many threads use the SDK.
+        Functions that may block (like initializing or shutting down the agent)
+        still release the GIL. Ignored in all but the first :code:`initialize`
+        call.
+
+        .. versionadded:: 1.6.0
+    :param str backend: The Python module used for calling the native SDK:
+        :code:`'cffi'` or :code:`'ctypes'`. If None, cffi is used if it is
+        installed (it has a much lower overhead per call) and neither
+        :code:`retain_gil` nor :code:`lazy_bind` is set (both are only
+        supported by ctypes), otherwise ctypes. Ignored in all but the first
+        :code:`initialize` call.
+
+        .. versionadded:: 1.6.0
+    :param bool eager_child_init: Only used with :code:`forkable`: Complete
+        the initialization of the agent in each forked child process right
+        after the fork (see :func:`os.register_at_fork`, Python 3.7+),
+        instead of on the first SDK call that needs it (e.g., when the first
+        request is traced). Forked processes that don't use the SDK then pay
+        for the initialization too.
+
+        .. versionadded:: 1.6.0
 
     :rtype: InitResult
     '''
 
     global _sdk_ref_count #pylint:disable=global-statement
     global _sdk_instance #pylint:disable=global-statement
+    global _eager_child_init #pylint:disable=global-statement
 
     with _sdk_ref_lk:
         logger.debug("initialize: ref count = %d", _sdk_ref_count)
-        result = _try_init_noref(sdkopts, sdklibname, forkable)
+        loadopts = {}
+        if lazy_bind:
+            loadopts['lazy_bind'] = True
+        if retain_gil:
+            loadopts['retain_gil'] = True
+        if backend is not None:
+            loadopts['backend'] = backend
+        result = _try_init_noref(sdkopts, sdklibname, forkable, loadopts)
+        if forkable and result.status != InitResult.STATUS_ALREADY_INITIALIZED:
+            _eager_child_init = eager_child_init
         if _sdk_instance is None:
-            _sdk_instance = SDK(try_get_sdk())
+            _sdk_instance = _get_shared_sdk()
+            _sdk_instance._set_native_sdk(try_get_sdk()) #pylint:disable=protected-access
         _sdk_ref_count += 1
     return result
 
 
-def _try_init_noref(sdkopts=(), sdklibname=None, forkable=False):
+def _try_init_noref(sdkopts=(), sdklibname=None, forkable=False, loadopts=None):
     global _should_shutdown #pylint:disable=global-statement
 
     sdk = nativeagent.try_get_sdk()
@@ -275,7 +345,7 @@ def _try_init_noref(sdkopts=(), sdklibname=None, forkable=False):
         logger.info(
             'Initializing SDK on Python=%s with options=%s, libname=%s.',
             (sys.version or '?').replace('\n', '  ').replace('\r', ''), sdkopts, sdklibname)
-        sdk = nativeagent.initialize(sdklibname)
+        sdk = nativeagent.initialize(sdklibname, **(loadopts or {}))
 
         have_warning = False
         for opt in sdkopts:
@@ -334,6 +404,7 @@ def shutdown():
     global _sdk_ref_count #pylint:disable=global-statement
     global _sdk_instance #pylint:disable=global-statement
     global _should_shutdown #pylint:disable=global-statement
+    global _eager_child_init #pylint:disable=global-statement
 
     with _sdk_ref_lk:
         logger.debug("shutdown: ref count = %d, should_shutdown = %s", \
@@ -348,6 +419,9 @@ def shutdown():
             _sdk_ref_count -= 1
             return None
         logger.info('shutdown: Shutting down SDK.')
+        if _sdk_instance is not None:
+            _sdk_instance.stop_agent_state_watcher()
+            _sdk_instance.stop_overhead_governor()
         try:
             if _should_shutdown:
                 _rc = nsdk.shutdown()
@@ -360,10 +434,40 @@ def shutdown():
             logger.warning('shutdown failed', exc_info=sys.exc_info())
             return e
         _sdk_ref_count = 0
-        _sdk_instance = None
+        _eager_child_init = False
+        if _sdk_instance is not None:
+            _sdk_instance._set_native_sdk(SDKNullInterface()) #pylint:disable=protected-access
+            _sdk_instance = None
         nativeagent._force_initialize(None) #pylint:disable=protected-access
         logger.debug('shutdown: completed')
         return None
 
+def _after_fork_in_child():
+    '''Resets the Python-side state of the SDK in a forked child process
+    (registered with :func:`os.register_at_fork` where available).'''
+    global _sdk_ref_lk #pylint:disable=global-statement
+    global _shared_sdk_lk #pylint:disable=global-statement
+
+    # Other threads of the parent might have held the locks while forking.
+    _sdk_ref_lk = Lock()
+    _shared_sdk_lk = Lock()
+    if _shared_sdk is not None:
+        _shared_sdk._after_fork_in_child() #pylint:disable=protected-access
+    nsdk = nativeagent.try_get_sdk()
+    after_fork = getattr(nsdk, '_after_fork_in_child', None)
+    if after_fork is not None:
+        after_fork()
+    if _eager_child_init and nsdk:
+        try:
+            if nsdk.agent_get_fork_state() == AgentForkState.PRE_INITIALIZED:
+                # Querying the agent state completes the initialization.
+                state = nsdk.agent_get_current_state()
+                logger.debug('after fork: initialized agent, state = %d', state)
+        except Exception: #pylint:disable=broad-except
+            logger.exception('after fork: failed initializing agent')
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child) #pylint:disable=no-member
+
 #pylint:disable=wrong-import-position
 from .sdk import SDK # Public
@@ -27,12 +27,32 @@ def _force_initialize(sdkinit):
     _sdk = sdkinit
     return _sdk
 
-def initialize(sdkinit=None):
+def _get_loadsdk(backend, retain_gil=False, lazy_bind=False):
+    if backend is None:
+        # cffi always releases the GIL and binds all functions when loading,
+        # so only ctypes supports retain_gil and lazy_bind.
+        if not retain_gil and not lazy_bind:
+            try:
+                from .sdkcffiiface import loadsdk
+                return loadsdk
+            except ImportError:
+                pass
+        backend = 'ctypes'
+    if backend == 'cffi':
+        from .sdkcffiiface import loadsdk
+    elif backend == 'ctypes':
+        from .sdkctypesiface import loadsdk
+    else:
+        raise ValueError('Unknown native SDK backend: ' + repr(backend))
+    return loadsdk
+
+def initialize(sdkinit=None, backend=None, **loadopts):
     if _sdk:
         raise ValueError('Agent is already initialized.')
     if not sdkinit or isinstance(sdkinit, str):
-        from .sdkctypesiface import loadsdk
-        return _force_initialize(loadsdk(sdkinit))
+        loadsdk = _get_loadsdk(
+            backend, loadopts.get('retain_gil', False), loadopts.get('lazy_bind', False))
+        return _force_initialize(loadsdk(sdkinit, **loadopts))
     return _force_initialize(sdkinit)
 
 def checkresult(nsdk, error_code, msg=None):
@@ -0,0 +1,728 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''cffi based alternative to :mod:`.sdkctypesiface`.
+
+cffi converts arguments in C, which makes calls considerably cheaper than
+calls through ctypes. cffi's ABI mode is used, so no C compiler is needed when
+installing. This module can only be imported if the optional cffi package is
+installed.
+'''
+
+import threading
+import weakref
+from functools import wraps, partial
+from itertools import islice
+
+import cffi
+
+from oneagent import logger
+from oneagent._impl import six
+from oneagent._impl.six.moves import zip #pylint:disable=import-error,redefined-builtin
+from oneagent.version import min_stub_version, max_stub_version
+from oneagent.common import SDKInitializationError, ErrorCode
+
+from .sdkversion import OnesdkStubVersion
+from .sdkdllinfo import WIN32
+from .sdkctypesiface import (
+    CCStringCache, CCSID_UTF8, str_to_u8, u8_to_str, toxstr, ufromxstr,
+    loadiface, numeric_buffer, _INT64_BUFFER_FORMATS, _DOUBLE_BUFFER_FORMATS,
+    _invalid_tracecontext, _ONESDK_TRACE_ID_BUFFER_SIZE, _ONESDK_SPAN_ID_BUFFER_SIZE,
+    _TAG_BUFFER_SIZE)
+
+_CDEF = '''
+typedef uint64_t onesdk_handle_t;
+typedef int32_t onesdk_bool_t;
+typedef %(result)s onesdk_result_t;
+typedef %(xchar)s onesdk_xchar_t;
+typedef uint16_t onesdk_ccsid_t;
+
+typedef struct {
+    const void* data;
+    size_t byte_length;
+    onesdk_ccsid_t ccsid;
+} onesdk_string_t;
+
+typedef struct {
+    uint32_t major;
+    uint32_t minor;
+    uint32_t patch;
+} onesdk_stub_version_t;
+
+typedef void (%(call)s *onesdk_stub_logging_callback_t)(
+    int32_t level, const onesdk_xchar_t* message);
+typedef void (%(call)s *onesdk_agent_logging_callback_t)(const char* message);
+
+int32_t %(call)s onesdk_agent_get_current_state(void);
+const onesdk_xchar_t* %(call)s onesdk_agent_get_version_string(void);
+void %(call)s onesdk_stub_get_version(onesdk_stub_version_t* out_version);
+void %(call)s onesdk_stub_get_agent_load_info(
+    onesdk_bool_t* agent_found, onesdk_bool_t* agent_compatible);
+
+onesdk_bool_t %(call)s onesdk_stub_is_sdk_cmdline_arg(const onesdk_xchar_t* arg);
+onesdk_result_t %(call)s onesdk_stub_process_cmdline_arg(
+    const onesdk_xchar_t* arg, onesdk_bool_t replace_existing);
+onesdk_result_t %(call)s onesdk_stub_set_variable(
+    const onesdk_xchar_t* var_spec, onesdk_bool_t replace_existing);
+void %(call)s onesdk_stub_set_logging_level(int32_t level);
+void %(call)s onesdk_stub_default_logging_function(
+    int32_t level, const onesdk_xchar_t* message);
+void %(call)s onesdk_stub_set_logging_callback(onesdk_stub_logging_callback_t callback);
+void %(call)s onesdk_stub_free_variables(void);
+
+onesdk_result_t %(call)s onesdk_initialize_2(uint32_t flags);
+onesdk_result_t %(call)s onesdk_shutdown(void);
+onesdk_result_t %(call)s onesdk_agent_set_warning_callback(
+    onesdk_agent_logging_callback_t callback);
+onesdk_result_t %(call)s onesdk_agent_set_verbose_callback(
+    onesdk_agent_logging_callback_t callback);
+const onesdk_xchar_t* %(call)s onesdk_stub_xstrerror(
+    onesdk_result_t error_code, onesdk_xchar_t* buffer, size_t buffer_size);
+int32_t %(call)s onesdk_agent_get_fork_state(void);
+onesdk_result_t %(call)s onesdk_ex_api_enable_techtype(void);
+void %(call)s onesdk_ex_agent_add_process_technology_p(
+    int32_t type, const onesdk_string_t* edition, const onesdk_string_t* version);
+
+onesdk_handle_t %(call)s onesdk_databaseinfo_create_p(
+    const onesdk_string_t* name, const onesdk_string_t* vendor,
+    int32_t channel_type, const onesdk_string_t* channel_endpoint);
+onesdk_handle_t %(call)s onesdk_databaserequesttracer_create_sql_p(
+    onesdk_handle_t databaseinfo, const onesdk_string_t* statement);
+void %(call)s onesdk_databaserequesttracer_set_returned_row_count(
+    onesdk_handle_t tracer, int32_t count);
+void %(call)s onesdk_databaserequesttracer_set_round_trip_count(
+    onesdk_handle_t tracer, int32_t count);
+void %(call)s onesdk_databaseinfo_delete(onesdk_handle_t databaseinfo);
+
+onesdk_handle_t %(call)s onesdk_outgoingremotecalltracer_create_p(
+    const onesdk_string_t* method, const onesdk_string_t* name,
+    const onesdk_string_t* endpoint, int32_t channel_type,
+    const onesdk_string_t* channel_endpoint);
+void %(call)s onesdk_outgoingremotecalltracer_set_protocol_name_p(
+    onesdk_handle_t tracer, const onesdk_string_t* protocol_name);
+onesdk_handle_t %(call)s onesdk_incomingremotecalltracer_create_p(
+    const onesdk_string_t* method, const onesdk_string_t* name,
+    const onesdk_string_t* endpoint);
+void %(call)s onesdk_incomingremotecalltracer_set_protocol_name_p(
+    onesdk_handle_t tracer, const onesdk_string_t* protocol_name);
+
+onesdk_handle_t %(call)s onesdk_webapplicationinfo_create_p(
+    const onesdk_string_t* virtual_host, const onesdk_string_t* application_id,
+    const onesdk_string_t* context_root);
+void %(call)s onesdk_webapplicationinfo_delete(onesdk_handle_t webapplicationinfo);
+onesdk_handle_t %(call)s onesdk_incomingwebrequesttracer_create_p(
+    onesdk_handle_t webapplicationinfo, const onesdk_string_t* url,
+    const onesdk_string_t* method);
+void %(call)s onesdk_incomingwebrequesttracer_add_request_headers_p(
+    onesdk_handle_t tracer, const onesdk_string_t* names,
+    const onesdk_string_t* values, size_t count);
+void %(call)s onesdk_incomingwebrequesttracer_add_response_headers_p(
+    onesdk_handle_t tracer, const onesdk_string_t* names,
+    const onesdk_string_t* values, size_t count);
+void %(call)s onesdk_incomingwebrequesttracer_add_parameters_p(
+    onesdk_handle_t tracer, const onesdk_string_t* names,
+    const onesdk_string_t* values, size_t count);
+void %(call)s onesdk_incomingwebrequesttracer_set_remote_address_p(
+    onesdk_handle_t tracer, const onesdk_string_t* remote_address);
+void %(call)s onesdk_incomingwebrequesttracer_set_status_code(
+    onesdk_handle_t tracer, int32_t status_code);
+
+size_t %(call)s onesdk_inprocesslink_create(
+    char* buffer, size_t buffer_size, size_t* required_buffer_size);
+onesdk_handle_t %(call)s onesdk_inprocesslinktracer_create(
+    const char* in_process_link, size_t in_process_link_size);
+
+onesdk_handle_t %(call)s onesdk_outgoingwebrequesttracer_create_p(
+    const onesdk_string_t* url, const onesdk_string_t* method);
+void %(call)s onesdk_outgoingwebrequesttracer_add_request_headers_p(
+    onesdk_handle_t tracer, const onesdk_string_t* names,
+    const onesdk_string_t* values, size_t count);
+void %(call)s onesdk_outgoingwebrequesttracer_add_response_headers_p(
+    onesdk_handle_t tracer, const onesdk_string_t* names,
+    const onesdk_string_t* values, size_t count);
+void %(call)s onesdk_outgoingwebrequesttracer_set_status_code(
+    onesdk_handle_t tracer, int32_t status_code);
+
+void %(call)s onesdk_tracer_start(onesdk_handle_t tracer);
+void %(call)s onesdk_tracer_end(onesdk_handle_t tracer);
+void %(call)s onesdk_tracer_error_p(
+    onesdk_handle_t tracer, const onesdk_string_t* error_class,
+    const onesdk_string_t* error_message);
+size_t %(call)s onesdk_tracer_get_outgoing_dynatrace_string_tag(
+    onesdk_handle_t tracer, char* buffer, size_t buffer_size, size_t* required_buffer_size);
+size_t %(call)s onesdk_tracer_get_outgoing_dynatrace_byte_tag(
+    onesdk_handle_t tracer, char* buffer, size_t buffer_size, size_t* required_buffer_size);
+void %(call)s onesdk_tracer_set_incoming_dynatrace_string_tag_p(
+    onesdk_handle_t tracer, const onesdk_string_t* string_tag);
+void %(call)s onesdk_tracer_set_incoming_dynatrace_byte_tag(
+    onesdk_handle_t tracer, const char* byte_tag, size_t byte_tag_size);
+
+void %(call)s onesdk_customrequestattribute_add_integers_p(
+    const onesdk_string_t* keys, const int64_t* values, size_t count);
+void %(call)s onesdk_customrequestattribute_add_floats_p(
+    const onesdk_string_t* keys, const double* values, size_t count);
+void %(call)s onesdk_customrequestattribute_add_strings_p(
+    const onesdk_string_t* keys, const onesdk_string_t* values, size_t count);
+
+onesdk_handle_t %(call)s onesdk_customservicetracer_create_p(
+    const onesdk_string_t* service_method, const onesdk_string_t* service_name);
+
+onesdk_handle_t %(call)s onesdk_messagingsysteminfo_create_p(
+    const onesdk_string_t* vendor_name, const onesdk_string_t* destination_name,
+    int32_t destination_type, int32_t channel_type,
+    const onesdk_string_t* channel_endpoint);
+void %(call)s onesdk_messagingsysteminfo_delete(onesdk_handle_t messagingsysteminfo);
+onesdk_handle_t %(call)s onesdk_outgoingmessagetracer_create(
+    onesdk_handle_t messagingsysteminfo);
+void %(call)s onesdk_outgoingmessagetracer_set_vendor_message_id_p(
+    onesdk_handle_t tracer, const onesdk_string_t* vendor_message_id);
+void %(call)s onesdk_outgoingmessagetracer_set_correlation_id_p(
+    onesdk_handle_t tracer, const onesdk_string_t* correlation_id);
+onesdk_handle_t %(call)s onesdk_incomingmessagereceivetracer_create(
+    onesdk_handle_t messagingsysteminfo);
+onesdk_handle_t %(call)s onesdk_incomingmessageprocesstracer_create(
+    onesdk_handle_t messagingsysteminfo);
+void %(call)s onesdk_incomingmessageprocesstracer_set_vendor_message_id_p(
+    onesdk_handle_t tracer, const onesdk_string_t* vendor_message_id);
+void %(call)s onesdk_incomingmessageprocesstracer_set_correlation_id_p(
+    onesdk_handle_t tracer, const onesdk_string_t* correlation_id);
+
+onesdk_result_t %(call)s onesdk_tracecontext_get_current(
+    char* trace_id_buffer, size_t trace_id_buffer_size,
+    char* span_id_buffer, size_t span_id_buffer_size);
+'''
+
+ffi = cffi.FFI()
+ffi.cdef(_CDEF % {
+    'result': 'uint32_t' if WIN32 else 'int32_t',
+    'xchar': 'wchar_t' if WIN32 else 'char',
+    'call': '__stdcall' if WIN32 else ''})
+
+_CSTRING_PTR_TYPE = ffi.typeof('onesdk_string_t*')
+_XCHAR_PTR_TYPE = ffi.typeof('onesdk_xchar_t*')
+
+# Maps each onesdk_string_t to the buffer its data points into, keeping the
+# buffer alive as long as the onesdk_string_t is.
+_cstring_buffers = weakref.WeakKeyDictionary()
+
+def _new_cstring(data, ccsid):
+    cstr = ffi.new('onesdk_string_t*')
+    buf = ffi.from_buffer(data)
+    cstr.data = buf
+    cstr.byte_length = len(data)
+    cstr.ccsid = ccsid
+    _cstring_buffers[cstr] = buf
+    return cstr
+
+def cstring_from_unicode(pyustr):
+    return _new_cstring(str_to_u8(pyustr), CCSID_UTF8)
+
+NULL_CSTRING = ffi.new('onesdk_string_t*') # Zero-initialized, i.e. CCSID_NULL
+
+#: The :class:`.CCStringCache` used by :func:`to_cstring`.
+cstring_cache = CCStringCache(convert=cstring_from_unicode)
+
+def to_cstring(pystr):
+    '''Returns an :code:`onesdk_string_t*` for the Python string
+    :code:`pystr`.'''
+    if isinstance(pystr, six.text_type):
+        return cstring_cache.lookup(pystr)
+    if pystr is None:
+        return NULL_CSTRING
+    if isinstance(pystr, six.binary_type):
+        return _new_cstring(pystr, CCSID_UTF8)
+    raise ValueError(
+        'Attempt to pass non-string type to SDK function expecting a'
+        ' string. Actual type: ' + str(type(pystr)))
+
+def _prepare_arg(argtype, arg):
+    if argtype == _CSTRING_PTR_TYPE:
+        return to_cstring(arg)
+    if argtype == _XCHAR_PTR_TYPE:
+        return toxstr(arg)
+    return arg
+
+class _ThreadBuffers(threading.local):
+    '''Per-thread cffi buffers that are reused across calls.'''
+
+    def __init__(self): #pylint:disable=super-init-not-called
+        self.tag_buf = ffi.new('char[]', _TAG_BUFFER_SIZE)
+        self.required_size = ffi.new('size_t*')
+        self.trace_id_buf = ffi.new('char[]', _ONESDK_TRACE_ID_BUFFER_SIZE)
+        self.span_id_buf = ffi.new('char[]', _ONESDK_SPAN_ID_BUFFER_SIZE)
+        self.last_trace_id_u8 = None
+        self.last_span_id_u8 = None
+        self.last_tracecontext = None
+
+    def fill_tag_buf(self, getter, *args):
+        '''Like :meth:`.sdkctypesiface._ThreadBuffers.fill_tag_buf`.'''
+        buf = self.tag_buf
+        required_size = self.required_size
+        count = getter(*(args + (buf, len(buf), required_size)))
+        if required_size[0] > len(buf):
+            buf = self.tag_buf = ffi.new('char[]', required_size[0])
+            count = getter(*(args + (buf, len(buf), required_size)))
+        return ffi.unpack(buf, count), required_size[0]
+
+#pylint:disable=too-many-instance-attributes,too-many-public-methods
+class SDKCffiInterface(object):
+    '''Implements the same interface as
+    :class:`.sdkctypesiface.SDKDllInterface` using cffi.
+
+    Binding a native function is cheap with cffi, so all functions are always
+    bound when loading. The GIL is always released during native calls, so
+    :code:`retain_gil` is not supported.'''
+
+    _ONESDK_PREFIX = 'onesdk_'
+
+    _MANDATORY_FUNCTIONS = (
+        'agent_get_current_state',
+        'agent_get_version_string',
+        'stub_get_version',
+        'stub_get_agent_load_info')
+
+    _PLAIN_FUNCTIONS = (
+        'agent_get_current_state',
+        'stub_set_logging_level',
+        'stub_free_variables',
+        'shutdown',
+        'agent_get_fork_state',
+        'databaserequesttracer_set_returned_row_count',
+        'databaserequesttracer_set_round_trip_count',
+        'databaseinfo_delete',
+        'webapplicationinfo_delete',
+        'incomingwebrequesttracer_set_status_code',
+        'outgoingwebrequesttracer_set_status_code',
+        'tracer_start',
+        'tracer_end',
+        'messagingsysteminfo_delete',
+        'outgoingmessagetracer_create',
+        'incomingmessagereceivetracer_create',
+        'incomingmessageprocesstracer_create')
+
+    def __init__(self, libname, lazy_bind=False, retain_gil=False):
+        self._log_cb = None
+        self._diag_cb = None
+        self._py_diag_cb = None
+
+        self._agent_found = False
+        self._agent_is_compatible = False
+        self._agent_sdk_version = '-'
+        self._agent_version = None
+        self._buffers = _ThreadBuffers()
+
+        if lazy_bind:
+            logger.debug('lazy_bind is not needed for the cffi backend, ignoring it.')
+        if retain_gil:
+            logger.warning('retain_gil is not supported by the cffi backend, ignoring it.')
+
+        lib = self._lib = ffi.dlopen(libname)
+
+        try:
+            for name in self._MANDATORY_FUNCTIONS:
+                if not hasattr(lib, self._ONESDK_PREFIX + name):
+                    raise SDKInitializationError(
+                        ErrorCode.INVALID_AGENT_BINARY,
+                        'Unable to find function ' + self._ONESDK_PREFIX + name +
+                        ' in the OneAgent SDK for C/C++')
+
+            _stub_version = self._get_stub_version()
+            self._agent_sdk_version = str(_stub_version)
+
+            if not min_stub_version <= _stub_version < max_stub_version:
+                raise SDKInitializationError(ErrorCode.INVALID_AGENT_BINARY, \
+                               'The version of the OneAgent SDK for C/C++ does not match the ' \
+                               'prerequisites for this OneAgent SDK for Python: ' + \
+                               str(min_stub_version) + ' <= ' + self._agent_sdk_version + ' < ' + \
+                               str(max_stub_version))
+
+            logger.info('Native SDK library "%s" version %s loaded (cffi).', \
+                        libname, self._agent_sdk_version)
+        except SDKInitializationError as e:
+            if e.code == ErrorCode.INVALID_AGENT_BINARY:
+                e.agent_version = '-/' + self._agent_sdk_version
+            raise
+
+        # Public name -> native function, for prepare_call
+        self._fn_specs = {}
+        for name in self._PLAIN_FUNCTIONS:
+            setattr(self, name, self._getfn(name))
+
+        self._init_headerlist_fns()
+
+    def _getfn(self, name, native_name=None):
+        func = getattr(self._lib, self._ONESDK_PREFIX + (native_name or name))
+        self._fn_specs[name] = func
+        return func
+
+    def _get_stub_version(self):
+        version = ffi.new('onesdk_stub_version_t*')
+        self._lib.onesdk_stub_get_version(version)
+        return OnesdkStubVersion(version.major, version.minor, version.patch)
+
+    # Args
+
+    def stub_is_sdk_cmdline_arg(self, arg):
+        return self._lib.onesdk_stub_is_sdk_cmdline_arg(toxstr(arg))
+
+    def stub_process_cmdline_arg(self, arg, replace_existing):
+        return self._lib.onesdk_stub_process_cmdline_arg(toxstr(arg), replace_existing)
+
+    def stub_set_variable(self, var_spec, replace_existing):
+        return self._lib.onesdk_stub_set_variable(toxstr(var_spec), replace_existing)
+
+    def stub_default_logging_function(self, level, msg):
+        self._lib.onesdk_stub_default_logging_function(level, toxstr(msg))
+
+    # Init/Shutdown
+
+    def initialize(self, init_flags=0):
+        lib = self._lib
+        result = lib.onesdk_initialize_2(init_flags)
+
+        self._agent_version = ufromxstr(ffi.string(lib.onesdk_agent_get_version_string())) \
+                                        + '/' + self._agent_sdk_version
+
+        found = ffi.new('onesdk_bool_t*')
+        compatible = ffi.new('onesdk_bool_t*')
+        lib.onesdk_stub_get_agent_load_info(found, compatible)
+        self._agent_found = found[0] != 0
+        self._agent_is_compatible = compatible[0] != 0
+
+        enable_result = lib.onesdk_ex_api_enable_techtype()
+        if self._agent_is_compatible and enable_result != ErrorCode.SUCCESS:
+            logger.warning(
+                "Tech type reporting API could not be enabled: %d %s",
+                enable_result, self.strerror(enable_result))
+
+        return result
+
+    def agent_found(self):
+        return self._agent_found
+
+    def agent_is_compatible(self):
+        return self._agent_is_compatible
+
+    def agent_get_version_string(self):
+        return self._agent_version
+
+    def strerror(self, error_code):
+        buf = ffi.new('onesdk_xchar_t[]', 1024)
+        return ufromxstr(ffi.string(self._lib.onesdk_stub_xstrerror(error_code, buf, 1024)))
+
+    def ex_agent_add_process_technology(self, tech_type, tech_edition, tech_version):
+        self._lib.onesdk_ex_agent_add_process_technology_p(
+            tech_type, to_cstring(tech_edition), to_cstring(tech_version))
+
+    # Logging
+
+    def stub_set_logging_callback(self, sink):
+        if sink is None:
+            self._lib.onesdk_stub_set_logging_callback(ffi.NULL)
+            self._log_cb = None
+        else:
+            def cb_wrapper(level, msg):
+                return sink(level, ufromxstr(ffi.string(msg)))
+            c_cb = ffi.callback('onesdk_stub_logging_callback_t', cb_wrapper)
+            self._lib.onesdk_stub_set_logging_callback(c_cb)
+            self._log_cb = c_cb
+
+    def _invoke_agent_log_cb_setter(self, callback, setter, update_stored_cb):
+        result = None
+        store_c_cb = lambda c_cb: setattr(self, "_diag_cb_" + setter.__name__, c_cb)
+        if callback is None:
+            result = setter(ffi.NULL)
+            if result == ErrorCode.SUCCESS:
+                store_c_cb(None)
+                if update_stored_cb:
+                    self._py_diag_cb = None
+        else:
+            @wraps(callback)
+            def cb_wrapper(msg):
+                # Also called from Python, with Python strings
+                if isinstance(msg, ffi.CData):
+                    msg = ffi.string(msg)
+                if isinstance(msg, six.binary_type):
+                    msg = u8_to_str(msg)
+                return callback(msg)
+
+            c_cb = ffi.callback('onesdk_agent_logging_callback_t', cb_wrapper)
+            result = setter(c_cb)
+            if result == ErrorCode.SUCCESS:
+                store_c_cb(c_cb)
+                if update_stored_cb:
+                    self._py_diag_cb = cb_wrapper
+        return result
+
+    def agent_set_warning_callback(self, callback):
+        return self._invoke_agent_log_cb_setter(
+            callback, self._lib.onesdk_agent_set_warning_callback, update_stored_cb=True)
+
+    def agent_set_verbose_callback(self, callback):
+        return self._invoke_agent_log_cb_setter(
+            callback, self._lib.onesdk_agent_set_verbose_callback, update_stored_cb=False)
+
+    def agent_get_logging_callback(self):
+        return self._py_diag_cb
+
+    def __del__(self):
+        # __del__ is also called when __init__ fails, so safeguard against that
+        if hasattr(self, '_lib'):
+            self.stub_set_logging_callback(None)
+
+    # Database
+
+    def databaseinfo_create(self, dbname, dbvendor, chan_ty, chan_ep):
+        return self._lib.onesdk_databaseinfo_create_p(
+            to_cstring(dbname), to_cstring(dbvendor), chan_ty, to_cstring(chan_ep))
+
+    def databaserequesttracer_create_sql(self, dbh, sql):
+        return self._lib.onesdk_databaserequesttracer_create_sql_p(dbh, to_cstring(sql))
+
+    # Remote calls
+
+    def outgoingremotecalltracer_create(
+            self, svc_method, svc_name, svc_endpoint, chan_ty, chan_ep):
+        #pylint:disable=too-many-arguments
+        return self._lib.onesdk_outgoingremotecalltracer_create_p(
+            to_cstring(svc_method),
+            to_cstring(svc_name),
+            to_cstring(svc_endpoint),
+            chan_ty,
+            to_cstring(chan_ep))
+
+    def outgoingremotecalltracer_set_protocol_name(self, tracer_h, protocol_name):
+        self._lib.onesdk_outgoingremotecalltracer_set_protocol_name_p(
+            tracer_h, to_cstring(protocol_name))
+
+    def incomingremotecalltracer_create(self, svc_method, svc_name, svc_endpoint):
+        return self._lib.onesdk_incomingremotecalltracer_create_p(
+            to_cstring(svc_method), to_cstring(svc_name), to_cstring(svc_endpoint))
+
+    def incomingremotecalltracer_set_protocol_name(self, tracer_h, protocol_name):
+        self._lib.onesdk_incomingremotecalltracer_set_protocol_name_p(
+            tracer_h, to_cstring(protocol_name))
+
+    # Web requests
+
+    def webapplicationinfo_create(self, vhost, appid, ctxroot):
+        return self._lib.onesdk_webapplicationinfo_create_p(
+            to_cstring(vhost), to_cstring(appid), to_cstring(ctxroot))
+
+    def incomingwebrequesttracer_create(self, wapp_h, uri, http_method):
+        return self._lib.onesdk_incomingwebrequesttracer_create_p(
+            wapp_h, to_cstring(uri), to_cstring(http_method))
+
+    def incomingwebrequesttracer_set_remote_address(self, tracer_h, addr):
+        self._lib.onesdk_incomingwebrequesttracer_set_remote_address_p(
+            tracer_h, to_cstring(addr))
+
+    def outgoingwebrequesttracer_create(self, uri, http_method):
+        return self._lib.onesdk_outgoingwebrequesttracer_create_p(
+            to_cstring(uri), to_cstring(http_method))
+
+    def _init_headerlist_fns(self):
+        lib = self._lib
+        for name in (
+                'incomingwebrequesttracer_add_request_headers',
+                'incomingwebrequesttracer_add_response_headers',
+                'incomingwebrequesttracer_add_parameters',
+                'outgoingwebrequesttracer_add_request_headers',
+                'outgoingwebrequesttracer_add_response_headers'):
+            self._wrap_headerlist_fn(name, getattr(lib, self._ONESDK_PREFIX + name + '_p'))
+        for name, value_type in (
+                ('customrequestattribute_add_integers', 'int64_t[]'),
+                ('customrequestattribute_add_floats', 'double[]'),
+                ('customrequestattribute_add_strings', None)):
+            self._wrap_typed_headerlist_fn(
+                name, getattr(lib, self._ONESDK_PREFIX + name + '_p'), value_type)
+
+    @staticmethod
+    def _cstring_array(cstrs):
+        return ffi.new('onesdk_string_t[]', [cstr[0] for cstr in cstrs])
+
+    def _wrap_headerlist_fn(self, fn_name, func):
+        fn_singular_name = fn_name[:-1]
+        cstring_array = self._cstring_array
+
+        def headerlist_fn(handle, keys, values, count):
+            if count is None:
+                count = len(keys)
+            pairs = list(islice(zip(keys, values), count))
+            if not pairs:
+                return
+            # The onesdk_string_t objects must stay alive until the call returns.
+            key_cstrs = [to_cstring(key) for key, _ in pairs]
+            val_cstrs = [to_cstring(value) for _, value in pairs]
+            func(handle, cstring_array(key_cstrs), cstring_array(val_cstrs), len(pairs))
+        headerlist_fn.__doc__ = "(tracer, keys, values, count)"
+        headerlist_fn.__name__ = fn_name
+
+        def single_header_fn(handle, key, value):
+            return func(handle, to_cstring(key), to_cstring(value), 1)
+        single_header_fn.__doc__ = "(tracer, key, value)"
+        single_header_fn.__name__ = fn_singular_name
+
+        setattr(self, fn_name, headerlist_fn)
+        setattr(self, fn_singular_name, single_header_fn)
+
+    def _wrap_typed_headerlist_fn(self, fn_name, func, value_array_type):
+        fn_singular_name = fn_name[:-1]
+        cstring_array = self._cstring_array
+        buffer_formats = (
+            _INT64_BUFFER_FORMATS if value_array_type == 'int64_t[]' else _DOUBLE_BUFFER_FORMATS)
+
+        def headerlist_fn(keys, values, count):
+            if count is None:
+                count = len(keys)
+            view = None if value_array_type is None else numeric_buffer(values, buffer_formats)
+            if view is not None:
+                # Passes the memory of view to the native SDK without copying.
+                key_cstrs = [to_cstring(key) for key in islice(keys, min(count, len(view)))]
+                if key_cstrs:
+                    func(cstring_array(key_cstrs),
+                         ffi.from_buffer(value_array_type, view),
+                         len(key_cstrs))
+                return
+            pairs = list(islice(zip(keys, values), count))
+            if not pairs:
+                return
+            key_cstrs = [to_cstring(key) for key, _ in pairs]
+            if value_array_type is None:
+                val_cstrs = [to_cstring(value) for _, value in pairs]
+                val_arr = cstring_array(val_cstrs)
+            else:
+                val_arr = ffi.new(value_array_type, [value for _, value in pairs])
+            func(cstring_array(key_cstrs), val_arr, len(pairs))
+        headerlist_fn.__doc__ = "(keys, values, count)"
+        headerlist_fn.__name__ = fn_name
+
+        def single_header_fn(key, value):
+            if value_array_type is None:
+                return func(to_cstring(key), to_cstring(value), 1)
+            return func(to_cstring(key), ffi.new(value_array_type, [value]), 1)
+        single_header_fn.__doc__ = "(key, value)"
+        single_header_fn.__name__ = fn_singular_name
+
+        setattr(self, fn_name, headerlist_fn)
+        setattr(self, fn_singular_name, single_header_fn)
+
+    # Generic tracer functions
+
+    def tracer_error(self, tracer_h, error_class, error_message):
+        self._lib.onesdk_tracer_error_p(
+            tracer_h, to_cstring(error_class), to_cstring(error_message))
+
+    def tracer_get_outgoing_tag(self, tracer, use_byte_tag=False):
+        lib = self._lib
+        getter = (
+            lib.onesdk_tracer_get_outgoing_dynatrace_byte_tag if use_byte_tag
+            else lib.onesdk_tracer_get_outgoing_dynatrace_string_tag)
+        tag, required_size = self._buffers.fill_tag_buf(getter, tracer)
+        if use_byte_tag:
+            assert len(tag) == required_size
+        else:
+            assert len(tag) + 1 == required_size # Excluding the terminating NUL
+        return tag
+
+    def tracer_set_incoming_string_tag(self, tracer_h, tag):
+        self._lib.onesdk_tracer_set_incoming_dynatrace_string_tag_p(tracer_h, to_cstring(tag))
+
+    def tracer_set_incoming_byte_tag(self, tracer, tag):
+        self._lib.onesdk_tracer_set_incoming_dynatrace_byte_tag(tracer, tag, len(tag))
+
+    # In-process links
+
+    def create_in_process_link(self):
+        link, required_size = self._buffers.fill_tag_buf(self._lib.onesdk_inprocesslink_create)
+        assert len(link) == required_size
+        return link
+
+    def _after_fork_in_child(self):
+        self._buffers = _ThreadBuffers()
+        cstring_cache._after_fork_in_child() #pylint:disable=protected-access
+
+    def trace_in_process_link(self, link_bytes):
+        return self._lib.onesdk_inprocesslinktracer_create(link_bytes, len(link_bytes))
+
+    # Custom service
+
+    def customservicetracer_create(self, service_method, service_name):
+        return self._lib.onesdk_customservicetracer_create_p(
+            to_cstring(service_method), to_cstring(service_name))
+
+    # Messaging
+
+    def messagingsysteminfo_create(
+            self, vendor_name, destination_name, destination_type, channel_type,
+            channel_endpoint):
+        #pylint:disable=too-many-arguments
+        return self._lib.onesdk_messagingsysteminfo_create_p(
+            to_cstring(vendor_name),
+            to_cstring(destination_name),
+            destination_type,
+            channel_type,
+            to_cstring(channel_endpoint))
+
+    def outgoingmessagetracer_set_vendor_message_id(self, tracer_handle, vendor_message_id):
+        self._lib.onesdk_outgoingmessagetracer_set_vendor_message_id_p(
+            tracer_handle, to_cstring(vendor_message_id))
+
+    def outgoingmessagetracer_set_correlation_id(self, tracer_handle, correlation_id):
+        self._lib.onesdk_outgoingmessagetracer_set_correlation_id_p(
+            tracer_handle, to_cstring(correlation_id))
+
+    def incomingmessageprocesstracer_set_vendor_message_id(
+            self, tracer_handle, vendor_message_id):
+        self._lib.onesdk_incomingmessageprocesstracer_set_vendor_message_id_p(
+            tracer_handle, to_cstring(vendor_message_id))
+
+    def incomingmessageprocesstracer_set_correlation_id(self, tracer_handle, correlation_id):
+        self._lib.onesdk_incomingmessageprocesstracer_set_correlation_id_p(
+            tracer_handle, to_cstring(correlation_id))
+
+    # Trace context
+
+    def tracecontext_get_current(self):
+        buffers = self._buffers
+        trace_id_buf = buffers.trace_id_buf
+        span_id_buf = buffers.span_id_buf
+        result = self._lib.onesdk_tracecontext_get_current(
+            trace_id_buf, _ONESDK_TRACE_ID_BUFFER_SIZE, span_id_buf, _ONESDK_SPAN_ID_BUFFER_SIZE)
+        if result != ErrorCode.SUCCESS:
+            return _invalid_tracecontext(result)
+        trace_id = ffi.string(trace_id_buf)
+        span_id = ffi.string(span_id_buf)
+        if trace_id != buffers.last_trace_id_u8 or span_id != buffers.last_span_id_u8:
+            buffers.last_trace_id_u8 = trace_id
+            buffers.last_span_id_u8 = span_id
+            buffers.last_tracecontext = (result, u8_to_str(trace_id), u8_to_str(span_id))
+        # Repeated calls return the identical tuple while the context is unchanged
+        return buffers.last_tracecontext
+
+    # Prepared calls
+
+    def prepare_call(self, fn_name, *args):
+        '''Like :meth:`.sdkctypesiface.SDKDllInterface.prepare_call`.'''
+        func = self._fn_specs.get(fn_name)
+        if func is None:
+            func = self._getfn(fn_name, fn_name + '_p')
+        return partial(func, *[
+            _prepare_arg(argtype, arg)
+            for argtype, arg in zip(ffi.typeof(func).args, args)])
+
+def loadsdk(libname=None, lazy_bind=False, retain_gil=False):
+    return loadiface(SDKCffiInterface, libname, lazy_bind=lazy_bind, retain_gil=retain_gil)
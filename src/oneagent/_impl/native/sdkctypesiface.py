@@ -22,14 +22,23 @@ low-level manner.
 
 import ctypes
 import ctypes.util
+import struct
 import sys
+import threading
+from collections import OrderedDict
+try:
+    from _collections import OrderedDict as _COrderedDict
+except ImportError: # Python 2, other implementations
+    _COrderedDict = None
+from itertools import islice
 from os import path
-from functools import wraps
+from functools import wraps, partial
 
 from oneagent import logger
 from oneagent.version import min_stub_version, max_stub_version
 from oneagent._impl import six
-from oneagent.common import SDKError, SDKInitializationError, ErrorCode
+from oneagent._impl.six.moves import zip #pylint:disable=import-error,redefined-builtin
+from oneagent.common import SDKError, SDKInitializationError, ErrorCode, TraceContextInfo
 
 from .sdkversion import OnesdkStubVersion
 from .sdkdllinfo import WIN32, dll_name, _dll_name_in_home
@@ -44,6 +53,11 @@ CCSID_UTF16_LE = 1203
 _ONESDK_TRACE_ID_BUFFER_SIZE = 33
 _ONESDK_SPAN_ID_BUFFER_SIZE = 17
 
+# Initial size of the per-thread buffer for outgoing tags and in-process links.
+# Large enough for all tags and links seen in practice; the buffer grows if
+# the agent ever reports a larger required size.
+_TAG_BUFFER_SIZE = 512
+
 bool_t = ctypes.c_int32
 result_t = ctypes.c_uint32 if WIN32 else ctypes.c_int32
 xchar_p = ctypes.c_wchar_p if WIN32 else ctypes.c_char_p
@@ -79,7 +93,7 @@ class CCString(ctypes.Structure):
         if pystr is None:
             return NULL_STR
         if isinstance(pystr, six.text_type):
-            return cls.from_unicode(pystr)
+            return ccstring_cache.lookup(pystr)
         # PyPy sometimes auto-converts, e.g. when assigning to an array
         # For these cases, it is nice when from_param is idempotent.
         if isinstance(pystr, cls):
@@ -102,6 +116,111 @@ class CCString(ctypes.Structure):
 
 NULL_STR = CCString(None, 0, CCSID_NULL)
 
+class CCStringCache(object):
+    '''Bounded, thread-safe LRU cache of :class:`CCString` objects keyed by the
+    unicode string they were created from.
+
+    Service names, method names, SQL statements, header names, etc. are usually
+    a small set of literals that are passed to the SDK over and over again.
+    With this cache, converting them costs a dictionary lookup instead of an
+    encode and three ctypes allocations.
+
+    Cached :class:`CCString` objects are shared between threads and must be
+    treated as immutable.
+
+    :code:`convert` creates the cached objects from unicode strings. It
+    defaults to :meth:`CCString.from_unicode`; other native backends use their
+    own string types.
+    '''
+
+    def __init__(self, maxsize=512, max_str_len=2048, convert=None):
+        self._lk = threading.Lock()
+        self._entries = OrderedDict()
+        self._convert = convert or CCString.from_unicode
+
+        #: Maximum number of cached strings. Zero disables the cache.
+        self.maxsize = maxsize
+
+        #: Strings longer than this (in characters) are never cached.
+        self.max_str_len = max_str_len
+
+        #: Number of lookups that were served from the cache (approximate if
+        #: multiple threads use the cache concurrently).
+        self.hits = 0
+
+        #: Number of lookups of cacheable strings that had to create a new
+        #: :class:`CCString`.
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # With the C implementation of OrderedDict, get and move_to_end are
+    # atomic, so hits don't need the lock. The pure-Python implementation
+    # (and pop+set on Python 2, which could re-insert a concurrently evicted
+    # entry) needs the lock for reordering the entries.
+    _LOCK_FREE_HITS = _COrderedDict is not None and OrderedDict is _COrderedDict
+
+    if six.PY3:
+        @staticmethod
+        def _touch(entries, key):
+            entries.move_to_end(key)
+    else:
+        @staticmethod
+        def _touch(entries, key):
+            entries[key] = entries.pop(key)
+
+    def lookup(self, pyustr):
+        '''Returns a (possibly shared) :class:`CCString` for the unicode string
+        :code:`pyustr`.'''
+        entries = self._entries
+        result = entries.get(pyustr)
+        if result is not None:
+            if self._LOCK_FREE_HITS:
+                try:
+                    entries.move_to_end(pyustr)
+                except KeyError: # Evicted concurrently, which is harmless.
+                    pass
+                self.hits += 1
+            else:
+                with self._lk:
+                    if pyustr in entries: # May have been evicted in the meantime.
+                        self._touch(entries, pyustr)
+                    self.hits += 1
+            return result
+        if len(pyustr) > self.max_str_len:
+            return self._convert(pyustr)
+        result = self._convert(pyustr)
+        with self._lk:
+            self.misses += 1
+            if self.maxsize > 0:
+                entries[pyustr] = result
+                if len(entries) > self.maxsize:
+                    entries.popitem(last=False)
+        return result
+
+    def resize(self, maxsize):
+        '''Sets :attr:`maxsize`, evicting the least recently used entries if
+        necessary.'''
+        with self._lk:
+            self.maxsize = maxsize
+            while self._entries and len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        '''Removes all entries and resets the hit/miss counters.'''
+        with self._lk:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _after_fork_in_child(self):
+        # The lock may have been held by another thread of the parent.
+        self._lk = threading.Lock()
+
+#: The :class:`CCStringCache` used by :meth:`CCString.from_param`.
+ccstring_cache = CCStringCache()
+
 class XStrPInArg(object):
     '''ctypes argument type for xchar pointers.'''
     @staticmethod
@@ -132,6 +251,139 @@ else:
     def ufromxstr(xstr):
         return u8_to_str(xstr)
 
+class _ThreadBuffers(threading.local):
+    '''Per-thread ctypes buffers that are reused across calls.
+
+    Arrays only ever grow (up to :attr:`_MAX_CAPACITY` items), so after
+    warming up, marshalling e.g. header lists does not allocate any ctypes
+    objects anymore. The string slots are cleared after each call (see
+    :meth:`clear`), so that the arrays don't keep the strings of earlier
+    calls alive.'''
+
+    _MIN_CAPACITY = 16
+
+    # Arrays for more items are allocated for each call instead of being kept.
+    _MAX_CAPACITY = 256
+
+    _NULLS = (NULL_STR,) * _MAX_CAPACITY
+
+    def __init__(self): #pylint:disable=super-init-not-called
+        self.key_arr = None
+        self.val_arrs = {}
+        self.tag_buf = ctypes.create_string_buffer(_TAG_BUFFER_SIZE)
+        self.required_size = ctypes.c_size_t()
+        self.trace_id_buf = ctypes.create_string_buffer(_ONESDK_TRACE_ID_BUFFER_SIZE)
+        self.span_id_buf = ctypes.create_string_buffer(_ONESDK_SPAN_ID_BUFFER_SIZE)
+        self.last_trace_id_u8 = None
+        self.last_span_id_u8 = None
+        self.last_tracecontext = None
+
+    @classmethod
+    def _grow(cls, arr, item_type, count):
+        if arr is not None and len(arr) >= count:
+            return arr
+        capacity = cls._MIN_CAPACITY
+        while capacity < count:
+            capacity *= 2
+        return (item_type * capacity)()
+
+    def arrays(self, value_type, count):
+        '''Returns a :class:`CCString` key array and a :code:`value_type`
+        value array, each with room for at least :code:`count` items.'''
+        if count > self._MAX_CAPACITY:
+            return (CCString * count)(), (value_type * count)()
+        key_arr = self.key_arr = self._grow(self.key_arr, CCString, count)
+        val_arr = self._grow(self.val_arrs.get(value_type), value_type, count)
+        self.val_arrs[value_type] = val_arr
+        return key_arr, val_arr
+
+    @classmethod
+    def clear(cls, arr, filled):
+        '''Drops the references that the :class:`CCString` array :code:`arr`
+        keeps to the strings assigned to its first :code:`filled` items.'''
+        if filled <= cls._MAX_CAPACITY: # Larger arrays are not kept anyway
+            arr[:filled] = cls._NULLS[:filled]
+
+    def fill_tag_buf(self, getter, *args):
+        '''Calls :code:`getter(*args, buffer, buffer_size, required_size)`
+        with :attr:`tag_buf` and returns the written bytes.
+
+        Usually this is a single native call. Only if the buffer is too small,
+        it is grown and the getter is called a second time.'''
+        buf = self.tag_buf
+        required_size = self.required_size
+        cnt = getter(*(args + (buf, len(buf), required_size)))
+        if required_size.value > len(buf):
+            buf = self.tag_buf = ctypes.create_string_buffer(required_size.value)
+            cnt = getter(*(args + (buf, len(buf), required_size)))
+        return buf[:cnt], required_size.value
+
+_INVALID_TRACECONTEXTS = {}
+
+def _invalid_tracecontext(result):
+    tracecontext = _INVALID_TRACECONTEXTS.get(result)
+    if tracecontext is None:
+        tracecontext = _INVALID_TRACECONTEXTS.setdefault(
+            result, (result, TraceContextInfo.INVALID_TRACE_ID, TraceContextInfo.INVALID_SPAN_ID))
+    return tracecontext
+
+if WIN32:
+    #pylint:disable=protected-access
+    class _GilRetainingWinDLL(ctypes.WinDLL):
+        '''Like :code:`ctypes.PyDLL`, but using the stdcall convention of WinDLL.'''
+        _func_flags_ = ctypes.WinDLL._func_flags_ | ctypes._FUNCFLAG_PYTHONAPI
+    #pylint:enable=protected-access
+
+class _LazyFn(object): #pylint:disable=too-few-public-methods
+    '''Placeholder for a native function that is bound on first use.
+
+    Mimics the ctypes function attributes that :code:`SDKDllInterface`
+    touches while declaring functions (:code:`__name__` and
+    :code:`__doc__`).'''
+
+    #pylint:disable=too-many-arguments
+    def __init__(self, dll, fullname, attrname, argtypes, restype):
+        self.dll = dll
+        self.__name__ = fullname
+        self.__doc__ = None
+        self.attrname = attrname
+        self.argtypes = argtypes
+        self.restype = restype
+        self.wrap = None
+
+# Buffer formats (without native byte order prefix) of 8 byte items that can be
+# passed as int64_t/double arrays.
+_INT64_BUFFER_FORMATS = frozenset(code for code in 'qln' if struct.calcsize(code) == 8)
+_DOUBLE_BUFFER_FORMATS = frozenset('d')
+_NATIVE_BYTE_ORDER_PREFIXES = ('@', '=', '<' if sys.byteorder == 'little' else '>')
+
+def numeric_buffer(values, formats):
+    '''Returns a memoryview of :code:`values` if it supports the buffer
+    protocol with one dimensional, contiguous, native 8 byte items of one of
+    the struct :code:`formats`, None otherwise.'''
+    if isinstance(values, (list, tuple)):
+        return None
+    try:
+        view = memoryview(values)
+    except TypeError:
+        return None
+    fmt = view.format
+    if fmt[:1] in _NATIVE_BYTE_ORDER_PREFIXES:
+        fmt = fmt[1:]
+    if (view.ndim != 1 or view.itemsize != 8 or fmt not in formats
+            or not getattr(view, 'c_contiguous', False)):
+        return None
+    return view
+
+_PREPARED_ARG_TYPES = {CCStringPInArg: ctypes.POINTER(CCString)}
+
+def _prepare_arg(argtype, arg):
+    if argtype is CCStringPInArg:
+        return ctypes.byref(CCString.from_param(arg))
+    if argtype is XStrPInArg:
+        return XStrPInArg.from_param(arg)
+    return argtype(arg)
+
 #pylint:disable=too-many-instance-attributes
 class SDKDllInterface(object):
 
@@ -146,24 +398,67 @@ class SDKDllInterface(object):
             name = name[:-2]
         return name
 
-    def _initfn(self, name, args, ret, public=True, check=False): #pylint:disable=too-many-arguments
+    #pylint:disable=too-many-arguments
+    def _initfn(
+            self, name, args, ret, public=True, check=False, attrname=None, blocking=False):
         fullname = self._ONESDK_PREFIX + name
+        # Functions that may block must release the GIL while they run.
+        dll = self._dll if blocking or self._gil_dll is None else self._gil_dll
 
         if check and not hasattr(self._dll, fullname):
             msg = 'Unable to find function '+ fullname + ' in the OneAgent SDK for C/C++'
             raise SDKInitializationError(ErrorCode.INVALID_AGENT_BINARY, msg)
 
-        func = getattr(self._dll, fullname)
+        if attrname is None:
+            attrname = self._fn_basename(fullname)
+            if not public:
+                attrname = '_' + attrname
+        self._fn_specs[attrname] = (dll, fullname, args, ret)
+
+        if self._lazy_fns is not None and not check:
+            func = _LazyFn(dll, fullname, attrname, args, ret)
+            self._lazy_fns[attrname] = func
+            return func
+
+        func = getattr(dll, fullname)
         func.argtypes = args
         func.restype = ret
-        name = self._fn_basename(fullname)
-        if not public:
-            name = '_' + name
-        setattr(self, name, func)
+        setattr(self, attrname, func)
         return func
+    #pylint:enable=too-many-arguments
+
+    def _bindfn(self, lazyfn):
+        func = getattr(lazyfn.dll, lazyfn.__name__)
+        func.argtypes = lazyfn.argtypes
+        func.restype = lazyfn.restype
+        if lazyfn.__doc__:
+            func.__doc__ = lazyfn.__doc__
+        setattr(self, lazyfn.attrname, func)
+        if lazyfn.wrap:
+            wrap, wrap_args = lazyfn.wrap
+            wrap(func, *wrap_args)
+
+    def __getattr__(self, name):
+        # Only called if name is not found the usual way, i.e. for unbound
+        # functions in lazy binding mode (and genuinely missing attributes).
+        lazy_fns = self.__dict__.get('_lazy_fns')
+        lazyfn = lazy_fns.get(name) if lazy_fns else None
+        if lazyfn is None:
+            raise AttributeError(
+                "'{}' object has no attribute '{}'".format(type(self).__name__, name))
+        # Binding is idempotent, so concurrent first calls are harmless.
+        self._bindfn(lazyfn)
+        return self.__dict__[name]
+
+    def __dir__(self):
+        names = set(dir(type(self)))
+        names.update(self.__dict__)
+        if self._lazy_fns:
+            names.update(self._lazy_fns)
+        return sorted(names)
 
     #pylint:disable=too-many-statements
-    def __init__(self, libname):
+    def __init__(self, libname, lazy_bind=False, retain_gil=False):
         self._log_cb = None
         self._diag_cb = None
         self._py_diag_cb = None
@@ -172,8 +467,15 @@ class SDKDllInterface(object):
         self._agent_is_compatible = False
         self._agent_sdk_version = None
         self._agent_version = None
+        self._fn_specs = {}
+        self._lazy_fns = {} if lazy_bind else None
+        self._buffers = _ThreadBuffers()
 
         self._dll = ctypes.WinDLL(libname) if WIN32 else ctypes.CDLL(libname)
+        # Loads the same library again, the OS returns the already loaded one.
+        self._gil_dll = None
+        if retain_gil:
+            self._gil_dll = _GilRetainingWinDLL(libname) if WIN32 else ctypes.PyDLL(libname)
 
         initfn = self._initfn
 
@@ -185,7 +487,8 @@ class SDKDllInterface(object):
                 'agent_get_current_state',
                 (),
                 ctypes.c_int32,
-                check=True) # avail since 1.0.0
+                check=True,
+                blocking=True) # avail since 1.0.0
 
             initfn(
                 'agent_get_version_string',
@@ -256,12 +559,14 @@ class SDKDllInterface(object):
         initfn(
             'stub_default_logging_function',
             (log_level_t, XStrPInArg),
-            None)
+            None,
+            blocking=True)
         initfn(
             'stub_set_logging_callback',
             (stub_logging_callback_t,),
             None,
-            public=False)
+            public=False,
+            blocking=True)
         initfn(
             'stub_free_variables',
             (),
@@ -272,23 +577,27 @@ class SDKDllInterface(object):
             'initialize_2',
             (ctypes.c_uint32,),
             result_t,
-            public=False)
+            public=False,
+            blocking=True)
         initfn(
             'shutdown',
             (),
-            result_t)
+            result_t,
+            blocking=True)
 
         initfn(
             'agent_set_warning_callback',
             (agent_logging_callback_t,),
             result_t,
-            public=False)
+            public=False,
+            blocking=True)
 
         initfn(
             'agent_set_verbose_callback',
             (agent_logging_callback_t,),
             result_t,
-            public=False)
+            public=False,
+            blocking=True)
 
         initfn(
             'stub_xstrerror',
@@ -306,11 +615,13 @@ class SDKDllInterface(object):
             'ex_api_enable_techtype',
             (),
             result_t,
-            public=False)
+            public=False,
+            blocking=True)
         initfn(
             'ex_agent_add_process_technology_p',
             (ctypes.c_int32, CCStringPInArg, CCStringPInArg),
-            None).__doc__ = '''(tech_type, tech_edition, tech_version)'''
+            None,
+            blocking=True).__doc__ = '''(tech_type, tech_edition, tech_version)'''
 
         # Specific nodes
 
@@ -471,11 +782,11 @@ class SDKDllInterface(object):
             ctypes.c_size_t,
             public=False)
 
-        self.tracer_set_incoming_string_tag = initfn(
+        initfn(
             'tracer_set_incoming_dynatrace_string_tag_p',
             (handle_t, CCStringPInArg),
             None,
-            public=False)
+            attrname='tracer_set_incoming_string_tag')
 
         initfn(
             'tracer_set_incoming_dynatrace_byte_tag',
@@ -613,34 +924,72 @@ class SDKDllInterface(object):
         return version
 
     #pylint:enable=too-many-statements
+    def _defer_wrap(self, lazyfn, wrap, *wrap_args):
+        fn_name = self._fn_basename(lazyfn.__name__)
+        lazyfn.wrap = (wrap, wrap_args)
+        self._lazy_fns[fn_name] = self._lazy_fns[fn_name[:-1]] = lazyfn
+
     def _wrap_typed_headerlist_fn(self, func, value_type):
+        if isinstance(func, _LazyFn):
+            return self._defer_wrap(func, self._wrap_typed_headerlist_fn, value_type)
         fn_name = self._fn_basename(func.__name__)
         assert fn_name.endswith('s')
         fn_singular_name = fn_name[:-1]
 
         c_type_is_string = value_type == CCString
+        buffer_formats = (
+            _INT64_BUFFER_FORMATS if value_type == ctypes.c_int64 else _DOUBLE_BUFFER_FORMATS)
+        buffers = self._buffers
+        from_param = CCString.from_param
+        clear = _ThreadBuffers.clear
+
+        def buffer_headerlist_fn(keys, view, count):
+            # Passes the memory of view to the native SDK without copying.
+            count = min(count, len(view))
+            key_arr = buffers.arrays(value_type, count)[0]
+            filled = 0
+            try:
+                for key in islice(keys, count):
+                    key_arr[filled] = from_param(key)
+                    filled += 1
+                if not filled:
+                    return
+                if view.readonly: # ctypes can only share writable memory
+                    values = (value_type * filled).from_buffer_copy(view)
+                else:
+                    values = ctypes.byref(value_type.from_buffer(view))
+                func(key_arr, values, filled)
+            finally:
+                clear(key_arr, filled)
 
         @wraps(func)
         def headerlist_fn(keys, values, count):
             if count is None:
                 count = len(keys)
-
-            arr_t = CCString * count
-            key_arr = arr_t()
-            for i, key in enumerate(keys):
-                key_arr[i] = CCString.from_param(key)
-
-            arr_t = value_type * count
-            val_arr = arr_t()
-
-            if c_type_is_string:
-                for i, value in enumerate(values):
-                    val_arr[i] = CCString.from_param(value)
-            else:
-                for i, value in enumerate(values):
-                    val_arr[i] = value_type(value)
-
-            return func(key_arr, val_arr, count)
+            if not c_type_is_string:
+                view = numeric_buffer(values, buffer_formats)
+                if view is not None:
+                    return buffer_headerlist_fn(keys, view, count)
+            key_arr, val_arr = buffers.arrays(value_type, count)
+            filled = 0
+            try:
+                if c_type_is_string:
+                    for key, value in islice(zip(keys, values), count):
+                        key_arr[filled] = from_param(key)
+                        val_arr[filled] = from_param(value)
+                        filled += 1
+                else:
+                    for key, value in islice(zip(keys, values), count):
+                        key_arr[filled] = from_param(key)
+                        val_arr[filled] = value
+                        filled += 1
+                if filled:
+                    func(key_arr, val_arr, filled)
+            finally:
+                clear(key_arr, filled)
+                if c_type_is_string:
+                    clear(val_arr, filled)
+            return None
         headerlist_fn.__doc__ = "(keys, values, count)"
 
         def single_header_fn(key, value):
@@ -655,22 +1004,32 @@ class SDKDllInterface(object):
         return headerlist_fn, single_header_fn
 
     def _wrap_headerlist_fn(self, func):
+        if isinstance(func, _LazyFn):
+            return self._defer_wrap(func, self._wrap_headerlist_fn)
         fn_name = self._fn_basename(func.__name__)
         assert fn_name.endswith('s')
         fn_singular_name = fn_name[:-1]
 
+        buffers = self._buffers
+        from_param = CCString.from_param
+        clear = _ThreadBuffers.clear
+
         @wraps(func)
         def headerlist_fn(handle, keys, values, count):
             if count is None:
                 count = len(keys)
-            arr_t = CCString * count
-            key_arr = arr_t()
-            for i, key in enumerate(keys):
-                key_arr[i] = CCString.from_param(key)
-            val_arr = arr_t()
-            for i, value in enumerate(values):
-                val_arr[i] = CCString.from_param(value)
-            return func(handle, key_arr, val_arr, count)
+            key_arr, val_arr = buffers.arrays(CCString, count)
+            filled = 0
+            try:
+                for key, value in islice(zip(keys, values), count):
+                    key_arr[filled] = from_param(key)
+                    val_arr[filled] = from_param(value)
+                    filled += 1
+                if filled:
+                    func(handle, key_arr, val_arr, filled)
+            finally:
+                clear(key_arr, filled)
+                clear(val_arr, filled)
         headerlist_fn.__doc__ = "(tracer, keys, values, count)"
 
         def single_header_fn(handle, key, value):
@@ -686,18 +1045,33 @@ class SDKDllInterface(object):
         setattr(self, fn_singular_name, single_header_fn)
         return headerlist_fn, single_header_fn
 
+    def prepare_call(self, fn_name, *args):
+        '''Returns a callable that invokes the native function behind
+        :code:`fn_name` with :code:`args`.
+
+        All arguments are converted once, here. The returned callable uses a
+        separate function pointer whose argtypes accept the converted
+        arguments as-is, so calling it is a single FFI call without any
+        per-call conversion.'''
+        dll, fullname, argtypes, restype = self._fn_specs[fn_name]
+        func = dll[fullname] # Not shared with the function named fn_name
+        func.argtypes = tuple(
+            _PREPARED_ARG_TYPES.get(argtype, argtype) for argtype in argtypes)
+        func.restype = restype
+        return partial(func, *[
+            _prepare_arg(argtype, arg) for argtype, arg in zip(argtypes, args)])
+
     def trace_in_process_link(self, link_bytes):
         return self._inprocesslinktracer_create(ctypes.c_char_p(link_bytes), len(link_bytes))
 
     def create_in_process_link(self):
-        bufsz = ctypes.c_size_t()
-        self._inprocesslink_create(None, 0, bufsz)
+        link, required_size = self._buffers.fill_tag_buf(self._inprocesslink_create)
+        assert len(link) == required_size
+        return link
 
-        buf = ctypes.create_string_buffer(bufsz.value)
-        cnt = self._inprocesslink_create(buf, bufsz, None)
-        assert cnt == bufsz.value
-
-        return buf.raw
+    def _after_fork_in_child(self):
+        self._buffers = _ThreadBuffers()
+        ccstring_cache._after_fork_in_child() #pylint:disable=protected-access
 
     def strerror(self, error_code):
         buf = mkxstrbuf(1024)
@@ -762,37 +1136,52 @@ class SDKDllInterface(object):
         return self._py_diag_cb
 
     def tracer_get_outgoing_tag(self, tracer, use_byte_tag=False):
-        tagsz = ctypes.c_size_t()
         getter = (
             self._tracer_get_outgoing_dynatrace_byte_tag if use_byte_tag
             else self._tracer_get_outgoing_dynatrace_string_tag)
-        getter(tracer, None, 0, tagsz)
-        buf = ctypes.create_string_buffer(tagsz.value)
-        cnt = getter(tracer, buf, tagsz, None)
+        tag, required_size = self._buffers.fill_tag_buf(getter, tracer)
         if use_byte_tag:
-            assert cnt == tagsz.value
-            return buf.raw
-        assert cnt + 1 == tagsz.value
-        return buf.value
+            assert len(tag) == required_size
+        else:
+            assert len(tag) + 1 == required_size # Excluding the terminating NUL
+        return tag
 
     def tracecontext_get_current(self):
-        trace_id_buf = ctypes.create_string_buffer(b'0' * (_ONESDK_TRACE_ID_BUFFER_SIZE - 1))
-        span_id_buf = ctypes.create_string_buffer(b'0' * (_ONESDK_SPAN_ID_BUFFER_SIZE - 1))
+        buffers = self._buffers
+        trace_id_buf = buffers.trace_id_buf
+        span_id_buf = buffers.span_id_buf
         result = self._tracecontext_get_current(
-            trace_id_buf, len(trace_id_buf), span_id_buf, len(span_id_buf))
-        return result, u8_to_str(trace_id_buf.value), u8_to_str(span_id_buf.value)
+            trace_id_buf, _ONESDK_TRACE_ID_BUFFER_SIZE, span_id_buf, _ONESDK_SPAN_ID_BUFFER_SIZE)
+        if result != ErrorCode.SUCCESS:
+            return _invalid_tracecontext(result)
+        trace_id = trace_id_buf.value
+        span_id = span_id_buf.value
+        if trace_id != buffers.last_trace_id_u8 or span_id != buffers.last_span_id_u8:
+            buffers.last_trace_id_u8 = trace_id
+            buffers.last_span_id_u8 = span_id
+            buffers.last_tracecontext = (result, u8_to_str(trace_id), u8_to_str(span_id))
+        # Repeated calls return the identical tuple while the context is unchanged
+        return buffers.last_tracecontext
 
 
     def tracer_set_incoming_byte_tag(self, tracer, tag):
         self._tracer_set_incoming_dynatrace_byte_tag(tracer, tag, len(tag))
 
 
-def loadsdk(libname=None):
-    if libname:
-        logger.warning('Overriding C SDK location with %s', libname)
-        if not path.isfile(libname):
-            libname = _dll_name_in_home(libname)
-    else:
+_packaged_libname = None
+
+def _get_packaged_libname():
+    '''Returns the path of the native SDK library packaged with this module.
+
+    Importing pkg_resources is expensive (it scans all installed
+    distributions), so it is only used if the library is not a plain file next
+    to this module, i.e. if the package is installed as a zipped egg.'''
+    global _packaged_libname #pylint:disable=global-statement
+    if _packaged_libname is not None:
+        return _packaged_libname
+    thisdir = path.dirname(path.abspath(__file__))
+    libname = path.join(thisdir, dll_name())
+    if not path.isfile(libname):
         try:
             import pkg_resources
             libname = pkg_resources.resource_filename(__name__, dll_name())
@@ -801,15 +1190,33 @@ def loadsdk(libname=None):
                 'Could not get native SDK path via pkg_resources:'
                 ' loading native SDK library might fail',
                 exc_info=sys.exc_info())
-            thisdir = path.dirname(path.abspath(__file__))
-            libname = path.join(thisdir, dll_name())
+    _packaged_libname = libname
+    return libname
 
+def resolve_libname(libname=None):
+    '''Returns the path of the native SDK library to load for the
+    :code:`sdklibname` passed to :func:`oneagent.initialize`.'''
+    if libname:
+        logger.warning('Overriding C SDK location with %s', libname)
+        if not path.isfile(libname):
+            libname = _dll_name_in_home(libname)
+        return libname
+    return _get_packaged_libname()
+
+def loadiface(iface_type, libname=None, **kwargs):
+    '''Creates an :code:`iface_type` instance for the native SDK library
+    :code:`libname` (see :func:`resolve_libname`), translating load errors to
+    :class:`SDKError`.'''
+    libname = resolve_libname(libname)
     try:
         logger.info('Loading native SDK library "%s".', libname)
-        return SDKDllInterface(libname)
+        return iface_type(libname, **kwargs)
     except OSError as e:
         msg = 'Failed loading SDK stub from ' + libname + ': "' + str(e) + \
             '". Check your installation of the oneagent-sdk Python package,' + \
             ' e.g., try running ' + \
             '`pip install --verbose --force-reinstall oneagent-sdk`.'
         six.raise_from(SDKError(ErrorCode.LOAD_AGENT, msg), e)
+
+def loadsdk(libname=None, lazy_bind=False, retain_gil=False):
+    return loadiface(SDKDllInterface, libname, lazy_bind=lazy_bind, retain_gil=retain_gil)
@@ -22,10 +22,16 @@ import sys
 
 from oneagent._impl import six
 
-from oneagent.common import ErrorCode, AgentState, AgentForkState
+from oneagent.common import ErrorCode, AgentState, AgentForkState, TraceContextInfo
 
 NULL_HANDLE = 0
 
+_NO_TRACECONTEXT = (
+    ErrorCode.NO_DATA, TraceContextInfo.INVALID_TRACE_ID, TraceContextInfo.INVALID_SPAN_ID)
+
+def _return_null_handle():
+    return NULL_HANDLE
+
 class SDKNullInterface(object): #pylint:disable=too-many-public-methods
     def __init__(self, version='-/-'):
         self._diag_cb = None
@@ -239,6 +245,9 @@ class SDKNullInterface(object): #pylint:disable=too-many-public-methods
     def customrequestattribute_add_string(self, key, value):
         pass
 
+    def prepare_call(self, fn_name, *args):
+        return _return_null_handle
+
     def trace_in_process_link(self, link_bytes):
         pass
 
@@ -283,4 +292,4 @@ class SDKNullInterface(object): #pylint:disable=too-many-public-methods
         return NULL_HANDLE
 
     def tracecontext_get_current(self):
-        return (ErrorCode.NO_DATA, '00000000000000000000000000000000', '0000000000000000')
+        return _NO_TRACECONTEXT
@@ -38,3 +38,36 @@ def error_from_exc(nsdk, tracer_h, e_val=None, e_ty=None):
     if e_ty is None and e_val is not None:
         e_ty = type(e_val)
     nsdk.tracer_error(tracer_h, getfullname(e_ty), str(e_val))
+
+class FrozenNullObject(object):
+    """Mixin for the shared no-op instances of SDK object types (tracers,
+    info handles) that are returned instead of new objects if the native SDK
+    rejected the request.
+
+    Because these instances are shared, their attributes can't be modified
+    after :meth:`freeze` was called."""
+
+    _frozen = False
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(
+                "Can't set attribute {!r} of shared no-op {}".format(name, type(self).__name__))
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if self._frozen:
+            raise AttributeError(
+                "Can't delete attribute {!r} of shared no-op {}".format(name, type(self).__name__))
+        object.__delattr__(self, name)
+
+    def freeze(self):
+        object.__setattr__(self, '_frozen', True)
+        return self
+
+def make_null_object(base, *args, **members):
+    """Returns a frozen instance of a :class:`FrozenNullObject` subclass of
+    :code:`base` that is initialized with :code:`args` and has the additional
+    class :code:`members`."""
+    null_type = type('Null' + base.__name__, (FrozenNullObject, base), members)
+    return null_type(*args).freeze()
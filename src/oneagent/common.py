@@ -395,12 +395,35 @@ class DbInfoHandle(SDKHandleBase):
 class WebapplicationInfoHandle(SDKHandleBase):
     '''Opaque handle to web application information. See
         :meth:`oneagent.sdk.SDK.create_web_application_info`.'''
+
+    def __init__(self, nsdk, handle, service_key=None):
+        SDKHandleBase.__init__(self, nsdk, handle)
+
+        #: The :code:`(virtual_host, application_id, context_root)` tuple the
+        #: info was created with, which identifies the web application for
+        #: samplers (see :mod:`oneagent.sdk.sampling`).
+        #:
+        #: .. versionadded:: 1.6.0
+        self.service_key = service_key
+
     def close_handle(self, nsdk, handle):
         nsdk.webapplicationinfo_delete(handle)
 
 class MessagingSystemInfoHandle(SDKHandleBase):
     '''Opaque handle for messaging system info object. See
         :meth:`oneagent.sdk.SDK.create_messaging_system_info`.'''
+
+    def __init__(self, nsdk, handle, service_key=None):
+        SDKHandleBase.__init__(self, nsdk, handle)
+
+        #: The :code:`(vendor_name, destination_name, destination_type,
+        #: channel_type, channel_endpoint)` tuple the info was created with,
+        #: which identifies the messaging system for samplers (see
+        #: :mod:`oneagent.sdk.sampling`).
+        #:
+        #: .. versionadded:: 1.6.0
+        self.service_key = service_key
+
     def close_handle(self, nsdk, handle):
         nsdk.messagingsysteminfo_delete(handle)
 
@@ -414,8 +437,14 @@ class TraceContextInfo(object):
 
         Note that contrary to other info objects, no manual cleanup (delete calls or similar)
         are required (or possible) for this class.
+
+        Instances should be treated as immutable: Repeated calls to
+        :meth:`oneagent.sdk.SDK.tracecontext_get_current` on the same thread may
+        return the same object as long as the trace context does not change.
         '''
 
+    __slots__ = ('is_valid', 'trace_id', 'span_id')
+
     #: All-zero (invalid) W3C trace ID.
     INVALID_TRACE_ID = "00000000000000000000000000000000"
 
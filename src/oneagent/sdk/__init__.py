@@ -34,7 +34,11 @@
        each channel type.
 '''
 
+import functools
+import numbers
+import threading
 from collections import namedtuple
+from decimal import Decimal
 
 try:
     from collections.abc import Mapping
@@ -42,12 +46,17 @@ except (ImportError, NameError):
     from collections import Mapping
 
 from oneagent._impl import six
+from oneagent._impl.util import make_null_object
 from oneagent._impl.native.nativeagent import try_get_sdk as _try_get_nsdk
+from oneagent._impl.native.sdknulliface import SDKNullInterface, NULL_HANDLE
 from oneagent import initialize as _init_nsdk, logger
 
 from oneagent.common import * #pylint:disable=wildcard-import
 
-from . import tracers
+from . import tracers, _decorators
+from .tracers import _new_tracer, _link_cache, _NULL_NSDK, _NULL_TRACERS
+from .sampling import SamplingCounts, UnsampledInterface, UnsampledState
+from .governor import OverheadGovernor, Throttling, _TimedInterface
 
 
 Channel = namedtuple('Channel', 'type_ endpoint')
@@ -71,6 +80,78 @@ def _get_kvc(kv_arg):
         kv_arg[1],
         kv_arg[2] if len(kv_arg) == 3 else len(kv_arg[0]))
 
+_ATTR_INT, _ATTR_FLOAT, _ATTR_STRING = range(3)
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+def _custom_attribute_kind(value):
+    '''Returns :code:`(kind, value)` for a custom request attribute value,
+    where value is converted to the Python type matching the kind. kind is None
+    for unsupported values.'''
+    # bool is an int subclass, so check it first.
+    if isinstance(value, bool):
+        return _ATTR_STRING, 'true' if value else 'false'
+    if isinstance(value, numbers.Integral):
+        value = int(value)
+        if _INT64_MIN <= value <= _INT64_MAX:
+            return _ATTR_INT, value
+        return _ATTR_STRING, str(value) # Would be truncated otherwise
+    if isinstance(value, (numbers.Real, Decimal)):
+        try:
+            return _ATTR_FLOAT, float(value)
+        except ValueError: # Signaling NaN Decimals can't be converted.
+            return None, value
+    if isinstance(value, six.string_types):
+        return _ATTR_STRING, value
+    return None, value
+
+def _noop(*_args):
+    pass
+
+def _make_null_info(info_type):
+    # Keeps NULL_HANDLE as handle so that it can still be passed to the native
+    # SDK (e.g., if the agent becomes active again).
+    return make_null_object(
+        info_type, _NULL_NSDK, NULL_HANDLE, close=_noop, __del__=_noop)
+
+_NULL_DB_INFO = _make_null_info(DbInfoHandle)
+_NULL_WEBAPP_INFO = _make_null_info(WebapplicationInfoHandle)
+_NULL_MESSAGING_INFO = _make_null_info(MessagingSystemInfoHandle)
+
+class _SDKThreadState(threading.local):
+    '''Python-side per-thread state of an :class:`SDK`.'''
+
+    def __init__(self): #pylint:disable=super-init-not-called
+        self.tracecontext_raw = None
+        self.tracecontext = None
+
+class _AgentStateWatcher(object):
+    '''Periodically updates the cached agent state of an :class:`SDK` on a
+    daemon thread.'''
+
+    def __init__(self, sdk, poll_interval):
+        self.poll_interval = poll_interval
+        self._sdk = sdk
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='oneagent-agent-state-watcher')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self._sdk._update_agent_state() #pylint:disable=protected-access
+            except Exception: #pylint:disable=broad-except
+                logger.exception('Failed updating agent state.')
+
 class SDK(object): # pylint:disable=too-many-public-methods
     '''The main entry point to the Dynatrace SDK.'''
 
@@ -79,7 +160,7 @@ class SDK(object): # pylint:disable=too-many-public-methods
             return
         if byte_tag is not None:
             if str_tag is not None:
-                warn = self._nsdk.agent_get_logging_callback()
+                warn = self._agent_nsdk.agent_get_logging_callback()
                 if warn:
                     warn('Both str_tag and byte_tag specified. Use only one!')
                 return # Discard tags, to not let this error go unnoticed
@@ -88,7 +169,31 @@ class SDK(object): # pylint:disable=too-many-public-methods
             self._nsdk.tracer_set_incoming_string_tag(tracer.handle, str_tag)
 
     def __init__(self, native_sdk):
+        # _nsdk is used for tracing and is swapped to _inactive_nsdk by the
+        # agent state watcher while the agent is permanently inactive, and to
+        # _active_nsdk otherwise. _active_nsdk is the native SDK wrapped for
+        # measuring by the overhead governor, if it is running.
+        # _agent_nsdk always refers to the actual native SDK.
         self._nsdk = native_sdk
+        self._agent_nsdk = native_sdk
+        self._active_nsdk = native_sdk
+        self._inactive_nsdk = None
+        self._tls = _SDKThreadState()
+        self._agent_state = None
+        self._state_watcher = None
+        self._state_watcher_lk = threading.Lock()
+        self._sampler = None
+        self._unsampled = UnsampledState()
+        self._unsampled_nsdk = UnsampledInterface(self._unsampled)
+        self._sampling_lk = threading.Lock()
+        self._sampled_count = 0
+        self._dropped_count = 0
+        # Tracer types disabled by the overhead governor, shared with prepared
+        # tracer factories.
+        self._throttling = Throttling()
+        self._governor = None
+        self._governor_lk = threading.Lock()
+        self._header_filter = None
 
     # Keyword-only arguments are only available in Python 3, so
     #pylint:disable=too-many-arguments
@@ -109,8 +214,10 @@ class SDK(object): # pylint:disable=too-many-public-methods
         :returns: A new handle, holding the given database information.
         :rtype: DbInfoHandle
         '''
-        return DbInfoHandle(self._nsdk, self._nsdk.databaseinfo_create(
-            name, vendor, channel.type_, channel.endpoint))
+        handle = self._nsdk.databaseinfo_create(name, vendor, channel.type_, channel.endpoint)
+        if not handle:
+            return _NULL_DB_INFO
+        return DbInfoHandle(self._nsdk, handle)
 
     def create_web_application_info(
             self, virtual_host, application_id, context_root):
@@ -133,9 +240,11 @@ class SDK(object): # pylint:disable=too-many-public-methods
             a slash :code:`'/'`.
         :rtype: WebapplicationInfoHandle
         '''
+        handle = self._nsdk.webapplicationinfo_create(virtual_host, application_id, context_root)
+        if not handle:
+            return _NULL_WEBAPP_INFO
         return WebapplicationInfoHandle(
-            self._nsdk, self._nsdk.webapplicationinfo_create(
-                virtual_host, application_id, context_root))
+            self._nsdk, handle, (virtual_host, application_id, context_root))
 
 
     def trace_sql_database_request(self, database, sql):
@@ -151,8 +260,10 @@ class SDK(object): # pylint:disable=too-many-public-methods
         :rtype: tracers.DatabaseRequestTracer
         '''
         assert isinstance(database, DbInfoHandle)
-        return tracers.DatabaseRequestTracer(
-            self._nsdk,
+        if self._unsampled.active() or tracers.DatabaseRequestTracer in self._throttling.types:
+            return _NULL_TRACERS[tracers.DatabaseRequestTracer]
+        return _new_tracer(
+            tracers.DatabaseRequestTracer, self._nsdk,
             self._nsdk.databaserequesttracer_create_sql(database.handle, sql))
 
     def trace_incoming_web_request(
@@ -186,6 +297,9 @@ class SDK(object): # pylint:disable=too-many-public-methods
             that particular header, set the value to an appropriately
             concatenated string.
 
+            The header filter of the SDK, if any, is applied (see
+            :meth:`set_header_filter`).
+
             .. warning:: If you use Python 2, be sure to use the UTF-8 encoding
                 or the :class:`unicode` type! See :ref:`here
                 <http-encoding-warning>` for more information.
@@ -206,16 +320,22 @@ class SDK(object): # pylint:disable=too-many-public-methods
         :rtype: tracers.IncomingWebRequestTracer
         '''
         assert isinstance(webapp_info, WebapplicationInfoHandle)
-        result = tracers.IncomingWebRequestTracer(
-            self._nsdk,
+        tracer = self._unsampled_tracer(
+            tracers.IncomingWebRequestTracer, webapp_info.service_key, str_tag, byte_tag)
+        if tracer is not None:
+            return tracer
+        result = _new_tracer(
+            tracers.IncomingWebRequestTracer, self._nsdk,
             self._nsdk.incomingwebrequesttracer_create(
                 webapp_info.handle, url, method))
         if not result:
             return result
         try:
+            if self._header_filter is not None:
+                result._header_filter = self._header_filter #pylint:disable=protected-access
             if headers:
                 self._nsdk.incomingwebrequesttracer_add_request_headers(
-                    result.handle, *_get_kvc(headers))
+                    result.handle, *self._filtered_headers(headers))
             if remote_address:
                 self._nsdk.incomingwebrequesttracer_set_remote_address(
                     result.handle, remote_address)
@@ -244,6 +364,9 @@ class SDK(object): # pylint:disable=too-many-public-methods
             that particular header, set the value to an appropriately
             concatenated string.
 
+            The header filter of the SDK, if any, is applied (see
+            :meth:`set_header_filter`).
+
             .. warning:: If you use Python 2, be sure to use the UTF-8 encoding
                 or the :class:`unicode` type! See :ref:`here
                 <http-encoding-warning>` for more information.
@@ -256,16 +379,21 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         .. versionadded:: 1.1.0
         '''
-        result = tracers.OutgoingWebRequestTracer(
-            self._nsdk, self._nsdk.outgoingwebrequesttracer_create(url, method))
+        if self._unsampled.active() or tracers.OutgoingWebRequestTracer in self._throttling.types:
+            return _NULL_TRACERS[tracers.OutgoingWebRequestTracer]
+        result = _new_tracer(
+            tracers.OutgoingWebRequestTracer, self._nsdk,
+            self._nsdk.outgoingwebrequesttracer_create(url, method))
 
         if not result:
             return result
 
         try:
+            if self._header_filter is not None:
+                result._header_filter = self._header_filter #pylint:disable=protected-access
             if headers:
-                self._nsdk.outgoingwebrequesttracer_add_request_headers(result.handle,
-                                                                        *_get_kvc(headers))
+                self._nsdk.outgoingwebrequesttracer_add_request_headers(
+                    result.handle, *self._filtered_headers(headers))
         except:
             result.end()
             raise
@@ -298,15 +426,17 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         :rtype: tracers.OutgoingRemoteCallTracer
         '''
-        result = tracers.OutgoingRemoteCallTracer(
-            self._nsdk,
+        if self._unsampled.active():
+            return _NULL_TRACERS[tracers.OutgoingRemoteCallTracer]
+        result = _new_tracer(
+            tracers.OutgoingRemoteCallTracer, self._nsdk,
             self._nsdk.outgoingremotecalltracer_create(
                 method,
                 service,
                 endpoint,
                 channel.type_,
                 channel.endpoint))
-        if protocol_name is not None:
+        if protocol_name is not None and result:
             self._nsdk.outgoingremotecalltracer_set_protocol_name(
                 result.handle, protocol_name)
         return result
@@ -326,9 +456,15 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         :rtype: tracers.IncomingRemoteCallTracer
         '''
-        result = tracers.IncomingRemoteCallTracer(
-            self._nsdk,
+        tracer = self._unsampled_tracer(
+            tracers.IncomingRemoteCallTracer, name, str_tag, byte_tag)
+        if tracer is not None:
+            return tracer
+        result = _new_tracer(
+            tracers.IncomingRemoteCallTracer, self._nsdk,
             self._nsdk.incomingremotecalltracer_create(method, name, endpoint))
+        if not result:
+            return result
         if protocol_name is not None:
             self._nsdk.incomingremotecalltracer_set_protocol_name(
                 result.handle, protocol_name)
@@ -356,12 +492,25 @@ class SDK(object): # pylint:disable=too-many-public-methods
               they can only be used with :meth:`trace_in_process_link`.
             * Links returned by this function can only be used in the process in which they were
               created.
+            * The link is cached per thread until a tracer is started or ended on it, so that
+              creating links for many tasks under the same active tracer (e.g., when fanning
+              out) needs only one call into the native SDK. Links can be used any number of
+              times. Only tracers started through this SDK are taken into account.
 
         :rtype: bytes
 
         .. versionadded:: 1.1.0
+
+        .. versionchanged:: 1.6.0
+            The link is cached for the active tracer.
         '''
-        return self._nsdk.create_in_process_link()
+        nsdk = self._nsdk
+        cached = _link_cache.link
+        if cached is not None and cached[0] is nsdk:
+            return cached[1]
+        link = nsdk.create_in_process_link()
+        _link_cache.link = (nsdk, link)
+        return link
 
     def trace_in_process_link(self, link_bytes):
         '''Creates a tracer for tracing asynchronous related processing in the same process.
@@ -374,8 +523,10 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         .. versionadded:: 1.1.0
         '''
-        return tracers.InProcessLinkTracer(self._nsdk,
-                                           self._nsdk.trace_in_process_link(link_bytes))
+        if self._unsampled.active():
+            return _NULL_TRACERS[tracers.InProcessLinkTracer]
+        return _new_tracer(tracers.InProcessLinkTracer, self._nsdk,
+                           self._nsdk.trace_in_process_link(link_bytes))
 
     def set_diagnostic_callback(self, callback):
         '''Sets the agent warning callback function.
@@ -402,11 +553,11 @@ class SDK(object): # pylint:disable=too-many-public-methods
         :param callable callback: The callback function. Receives the (unicode)
             error message as its only argument.
         '''
-        result = self._nsdk.agent_set_warning_callback(callback)
+        result = self._agent_nsdk.agent_set_warning_callback(callback)
         if result != ErrorCode.SUCCESS:
             logger.error(
                 "Could not set warning callback: Error %d: %s",
-                result, self._nsdk.strerror(result))
+                result, self._agent_nsdk.strerror(result))
 
     def set_verbose_callback(self, callback):
         '''Sets the verbose agent logging callback function.
@@ -428,11 +579,11 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         .. versionadded:: 1.4.0
         '''
-        result = self._nsdk.agent_set_verbose_callback(callback)
+        result = self._agent_nsdk.agent_set_verbose_callback(callback)
         if result != ErrorCode.SUCCESS:
             logger.error(
                 "Could not set verbose callback: Error %d: %s",
-                result, self._nsdk.strerror(result))
+                result, self._agent_nsdk.strerror(result))
 
 
     @property
@@ -445,8 +596,19 @@ class SDK(object): # pylint:disable=too-many-public-methods
            (see :class:`~oneagent.common.AgentForkState` and :meth:`.agent_fork_state`)
            when :func:`oneagent.initialize` was called with :code:`forkable=True`.
 
-        :rtype: int'''
-        return self._nsdk.agent_get_current_state()
+        While the agent state watcher is running (see
+        :meth:`start_agent_state_watcher`), this returns the state cached by
+        the last poll without calling into the native SDK.
+
+        :rtype: int
+
+        .. versionchanged:: 1.6.0
+            Returns the cached state while the agent state watcher is running.
+        '''
+        state = self._agent_state
+        if state is not None:
+            return state
+        return self._agent_nsdk.agent_get_current_state()
 
     @property
     def agent_fork_state(self):
@@ -461,7 +623,7 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         :rtype: int
         '''
-        return self._nsdk.agent_get_fork_state()
+        return self._agent_nsdk.agent_get_fork_state()
 
     @property
     def agent_version_string(self):
@@ -474,7 +636,7 @@ class SDK(object): # pylint:disable=too-many-public-methods
             or make any assumptions about it's format.
 
         :rtype: str'''
-        return self._nsdk.agent_get_version_string()
+        return self._agent_nsdk.agent_get_version_string()
 
     @property
     def agent_found(self):
@@ -484,7 +646,7 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         .. versionadded:: 1.1.0
         '''
-        return self._nsdk.agent_found()
+        return self._agent_nsdk.agent_found()
 
     @property
     def agent_is_compatible(self):
@@ -495,7 +657,320 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
         .. versionadded:: 1.1.0
         '''
-        return self._nsdk.agent_is_compatible()
+        return self._agent_nsdk.agent_is_compatible()
+
+    def start_agent_state_watcher(self, poll_interval=5.0):
+        '''Starts polling the agent state every :code:`poll_interval` seconds
+        on a background (daemon) thread.
+
+        While the watcher is running, :attr:`agent_state` returns the state
+        cached by the last poll. Additionally, while the agent is
+        :attr:`~oneagent.common.AgentState.PERMANENTLY_INACTIVE`, all tracer
+        factories of this SDK (e.g., :meth:`trace_custom_service`) skip the
+        native SDK entirely and return a shared falsy tracer. When the agent
+        becomes active again, tracing resumes with the next poll.
+
+        If the watcher is already running, it is restarted with the new
+        interval. The agent state is polled once synchronously before this
+        method returns. :func:`oneagent.shutdown` stops the watcher of the SDK
+        instance returned by :func:`oneagent.get_sdk` (start it only after
+        :func:`oneagent.initialize`); stop watchers of other instances with
+        :meth:`stop_agent_state_watcher`.
+
+        .. note:: Prepared tracer factories (see e.g.
+            :meth:`prepare_custom_service`) are not affected by the watcher.
+
+        .. warning:: Polling the agent state completes the initialization of a
+            **pre-initialized** agent (see :func:`oneagent.initialize`), so
+            only start the watcher in processes that will not fork any more
+            children that use the SDK.
+
+        :param float poll_interval: The time between two polls, in seconds.
+            Must be positive.
+
+        .. versionadded:: 1.6.0
+        '''
+        if not poll_interval > 0:
+            raise ValueError('poll_interval must be positive, got {!r}'.format(poll_interval))
+        with self._state_watcher_lk:
+            if self._state_watcher is not None:
+                self._state_watcher.stop()
+            self._update_agent_state()
+            self._state_watcher = _AgentStateWatcher(self, poll_interval)
+            self._state_watcher.start()
+
+    def stop_agent_state_watcher(self):
+        '''Stops the agent state watcher started by
+        :meth:`start_agent_state_watcher`, if any.
+
+        Afterwards, :attr:`agent_state` queries the native SDK again and tracer
+        factories always call into the native SDK.
+
+        .. versionadded:: 1.6.0
+        '''
+        with self._state_watcher_lk:
+            if self._state_watcher is None:
+                return
+            self._state_watcher.stop()
+            self._state_watcher = None
+            self._agent_state = None
+            self._nsdk = self._active_nsdk
+
+    def start_overhead_governor(
+            self, budget=0.02, window=1.0, restore_ratio=0.5, restore_windows=3):
+        '''Starts measuring the time spent in SDK calls and throttles tracing
+        while it is too high.
+
+        At the end of each window, the CPU time spent in calls into the native
+        SDK (measured per calling thread where :func:`time.thread_time` is
+        available, otherwise approximated by their wall time) is compared to
+        the CPU time used by the whole process during the window. If that share exceeds :code:`budget`, the next throttling
+        level is entered: First, database requests and custom services are no
+        longer traced, then outgoing web requests, too (see
+        :data:`oneagent.sdk.governor.THROTTLING_LEVELS`). Throttled tracer
+        factories, including those prepared with :meth:`prepare_sql` and
+        :meth:`prepare_custom_service`, return a shared falsy tracer. After
+        :code:`restore_windows` windows in a row with a share below
+        :code:`budget * restore_ratio`, the previous level is restored. If the
+        budget is exceeded again right after restoring, the number of windows
+        required for the next attempt is doubled.
+
+        Measuring adds a small cost to each call into the native SDK. If the
+        governor is already running, it is restarted with the new settings
+        and tracing is fully enabled again. :func:`oneagent.shutdown` stops
+        the governor of the SDK instance returned by :func:`oneagent.get_sdk`.
+
+        .. note:: Only tracer factories prepared after starting the governor
+            are measured (but all are throttled).
+
+        :param float budget: The maximum share of process CPU time to spend in
+            SDK calls, e.g., 0.02 for 2%.
+        :param float window: The duration of one measurement window, in
+            seconds.
+        :param float restore_ratio: The share of the budget that must not be
+            exceeded to restore the previous level, between 0 and 1.
+        :param int restore_windows: The number of windows in a row that must
+            stay below :code:`budget * restore_ratio` to restore the previous
+            level.
+        :returns: The started governor, which can be queried for the current
+            throttling level and measurements.
+        :rtype: governor.OverheadGovernor
+
+        .. versionadded:: 1.6.0
+        '''
+        if not budget > 0:
+            raise ValueError('budget must be positive, got {!r}'.format(budget))
+        if not window > 0:
+            raise ValueError('window must be positive, got {!r}'.format(window))
+        if not 0 <= restore_ratio <= 1:
+            raise ValueError(
+                'restore_ratio must be between 0 and 1, got {!r}'.format(restore_ratio))
+        with self._governor_lk:
+            self._stop_overhead_governor()
+            timed_nsdk = _TimedInterface(self._agent_nsdk)
+            self._governor = OverheadGovernor(
+                timed_nsdk, self._throttling, budget, window, restore_ratio, restore_windows)
+            if self._nsdk is self._active_nsdk:
+                self._nsdk = timed_nsdk
+            self._active_nsdk = timed_nsdk
+            self._governor.start()
+            return self._governor
+
+    def stop_overhead_governor(self):
+        '''Stops the overhead governor started by
+        :meth:`start_overhead_governor`, if any, and enables all tracer types
+        again.
+
+        .. versionadded:: 1.6.0
+        '''
+        with self._governor_lk:
+            self._stop_overhead_governor()
+
+    def _stop_overhead_governor(self):
+        if self._governor is None:
+            return
+        self._governor.stop()
+        self._governor = None
+        self._throttling.types = frozenset()
+        if self._nsdk is self._active_nsdk:
+            self._nsdk = self._agent_nsdk
+        self._active_nsdk = self._agent_nsdk
+
+    @property
+    def overhead_governor(self):
+        '''The overhead governor started by :meth:`start_overhead_governor` or
+        None.
+
+        :rtype: governor.OverheadGovernor
+
+        .. versionadded:: 1.6.0
+        '''
+        return self._governor
+
+    def set_header_filter(self, header_filter):
+        '''Sets the filter that selects and truncates the HTTP headers
+        captured by web request tracers created afterwards.
+
+        The filter is applied to the :code:`headers` passed to
+        :meth:`trace_incoming_web_request` and
+        :meth:`trace_outgoing_web_request` and to the response headers added
+        to the returned tracers, e.g.::
+
+            from oneagent.sdk.headers import HeaderFilter
+
+            sdk.set_header_filter(HeaderFilter(
+                allow=('Host', 'User-Agent', 'Content-Type', 'X-Request-Id'),
+                max_value_length=256, max_total_length=2048))
+
+        :param headers.HeaderFilter header_filter: The filter, or None to
+            capture all headers (the default).
+
+        .. versionadded:: 1.6.0
+        '''
+        self._header_filter = header_filter
+
+    @property
+    def header_filter(self):
+        '''The header filter set with :meth:`set_header_filter` or None.
+
+        :rtype: headers.HeaderFilter
+
+        .. versionadded:: 1.6.0
+        '''
+        return self._header_filter
+
+    def _filtered_headers(self, headers):
+        names, values, count = _get_kvc(headers)
+        if self._header_filter is not None:
+            return self._header_filter.apply(names, values, count)
+        return names, values, count
+
+    # sampling
+
+    def set_sampler(self, sampler):
+        '''Sets the sampler that decides which incoming requests are traced
+        and resets the :attr:`sampling_counts`.
+
+        The sampler is consulted by :meth:`trace_incoming_web_request`,
+        :meth:`trace_incoming_remote_call`,
+        :meth:`trace_incoming_message_process` and the factories returned by
+        :meth:`prepare_incoming_remote_call`. For a request that is not
+        sampled, these return a falsy tracer without calling into the native
+        SDK. While that tracer is started, all tracers created by this SDK in
+        the same thread or asyncio task are falsy too, so the whole request is
+        skipped (see :mod:`oneagent.sdk.sampling`).
+
+        See :mod:`oneagent.sdk.sampling` for the available samplers, e.g.::
+
+            from oneagent.sdk.sampling import IncomingTagSampler, RateLimitingSampler
+
+            sdk.set_sampler(IncomingTagSampler(RateLimitingSampler(rate=10)))
+
+        :param sampling.Sampler sampler: The sampler, or None to trace all
+            requests (the default).
+
+        .. versionadded:: 1.6.0
+        '''
+        with self._sampling_lk:
+            self._sampler = sampler
+            self._sampled_count = 0
+            self._dropped_count = 0
+
+    @property
+    def sampler(self):
+        '''The sampler set with :meth:`set_sampler` or None.
+
+        :rtype: sampling.Sampler
+
+        .. versionadded:: 1.6.0
+        '''
+        return self._sampler
+
+    @property
+    def sampling_counts(self):
+        '''The number of incoming requests that were traced and dropped by the
+        sampler since it was set (see :meth:`set_sampler`).
+
+        :rtype: sampling.SamplingCounts
+
+        .. versionadded:: 1.6.0
+        '''
+        with self._sampling_lk:
+            return SamplingCounts(self._sampled_count, self._dropped_count)
+
+    def _unsampled_tracer(self, tracer_type, service, str_tag=None, byte_tag=None):
+        '''Returns a falsy tracer if tracing is suppressed in this context or
+        the sampler rejects the request, None if the request should be traced.'''
+        if self._unsampled.active():
+            return _NULL_TRACERS[tracer_type]
+        sampler = self._sampler
+        if sampler is None:
+            return None
+        sampled = sampler.should_sample(service, bool(str_tag or byte_tag))
+        with self._sampling_lk:
+            if sampled:
+                self._sampled_count += 1
+            else:
+                self._dropped_count += 1
+        if sampled:
+            return None
+        return tracer_type(self._unsampled_nsdk, UnsampledInterface.new_handle())
+
+    def _set_native_sdk(self, nsdk):
+        '''Rebinds this SDK to another native SDK. Used by
+        :func:`oneagent.initialize` and :func:`oneagent.shutdown` for the shared
+        instance.'''
+        self.stop_agent_state_watcher()
+        self.stop_overhead_governor()
+        self._nsdk = nsdk
+        self._agent_nsdk = nsdk
+        self._active_nsdk = nsdk
+        self._inactive_nsdk = None
+
+    def _after_fork_in_child(self):
+        '''Resets the Python-side state that does not carry over to a forked
+        child process: The background threads (which don't exist in the
+        child), the locks (which other threads might have held), the cached
+        agent state, in-process link and per-thread state, and the sampling
+        counts.'''
+        self._state_watcher_lk = threading.Lock()
+        self._state_watcher = None
+        self._agent_state = None
+        self._governor_lk = threading.Lock()
+        if self._governor is not None:
+            self._governor = None
+            self._throttling.types = frozenset()
+            if self._nsdk is self._active_nsdk:
+                self._nsdk = self._agent_nsdk
+            self._active_nsdk = self._agent_nsdk
+        if self._nsdk is self._inactive_nsdk:
+            # Let the child check the agent state for itself.
+            self._nsdk = self._active_nsdk
+        self._sampling_lk = threading.Lock()
+        self._sampled_count = 0
+        self._dropped_count = 0
+        after_fork = getattr(self._sampler, '_after_fork_in_child', None)
+        if after_fork is not None:
+            after_fork()
+        # Only the forking thread exists in the child. The thread state
+        # object is shared with prepared tracer factories, so reset it in
+        # place.
+        self._tls.__init__()
+        _link_cache.link = None
+
+    def _update_agent_state(self):
+        state = self._agent_nsdk.agent_get_current_state()
+        self._agent_state = state
+        if state == AgentState.PERMANENTLY_INACTIVE:
+            if self._nsdk is self._active_nsdk:
+                if self._inactive_nsdk is None:
+                    self._inactive_nsdk = SDKNullInterface()
+                self._nsdk = self._inactive_nsdk
+                logger.info('Agent is permanently inactive, tracing is disabled.')
+        elif self._nsdk is not self._active_nsdk:
+            self._nsdk = self._active_nsdk
+            logger.info('Agent state changed to %d, tracing is enabled again.', state)
+        return state
 
     def add_custom_request_attribute(self, key, value):
         '''Adds a custom request attribute to the current active tracer.
@@ -504,23 +979,139 @@ class SDK(object): # pylint:disable=too-many-public-methods
                 may not be None.
             :param value: The value of the custom request attribute. Currently supported types
                 are integer, float and string values. The value is mandatory and may
-                not be None.
+                not be None. See :meth:`add_custom_request_attributes` for how other
+                types are converted.
             :type value: str or int or float
 
             .. versionadded:: 1.1.0
+
+            .. versionchanged:: 1.6.0
+                :code:`bool` values are added as the strings :code:`'true'` and
+                :code:`'false'` instead of as integers.
         '''
 
-        if isinstance(value, int):
+        kind, value = _custom_attribute_kind(value)
+        if kind is _ATTR_INT:
             self._nsdk.customrequestattribute_add_integer(key, value)
-        elif isinstance(value, float):
+        elif kind is _ATTR_FLOAT:
             self._nsdk.customrequestattribute_add_float(key, value)
-        elif isinstance(value, six.string_types):
+        elif kind is _ATTR_STRING:
             self._nsdk.customrequestattribute_add_string(key, value)
         else:
-            warn = self._nsdk.agent_get_logging_callback()
-            if warn:
-                warn('Can\'t add custom request attribute \'{0}\' '
-                     'because the value type \'{1}\' is not supported!'.format(key, type(value)))
+            self._warn_unsupported_attribute(key, value)
+
+    def add_custom_request_attributes(self, attributes):
+        '''Adds multiple custom request attributes to the current active tracer.
+
+            This is equivalent to calling :meth:`add_custom_request_attribute` for
+            each attribute, but needs at most three calls into the native SDK (one
+            per value type) instead of one per attribute.
+
+            Values are converted as follows:
+
+            * :code:`bool` values are added as the strings :code:`'true'` and
+              :code:`'false'`.
+            * Other integral values (e.g. :code:`int` or :class:`numbers.Integral`
+              implementations) are added as integers. Values that do not fit into
+              a signed 64 bit integer are added as strings.
+            * :class:`decimal.Decimal` values and other real numbers
+              (:class:`numbers.Real`) are added as floats.
+            * Strings are added as strings.
+            * Attributes with values of other types (including None) are skipped
+              with a warning to the diagnostic callback.
+
+            :param attributes: The attributes to add, either as a mapping from
+                names to values or as an iterable of :code:`(name, value)` pairs.
+            :type attributes: ~typing.Mapping[str, object] or
+                ~typing.Iterable[~typing.Tuple[str, object]]
+
+            .. versionadded:: 1.6.0
+        '''
+        if hasattr(attributes, 'items'):
+            attributes = attributes.items()
+        int_keys, int_values = [], []
+        float_keys, float_values = [], []
+        str_keys, str_values = [], []
+        for key, value in attributes:
+            value_type = type(value)
+            # Exact type checks first, they are much cheaper than isinstance
+            # and cover almost all values.
+            if value_type is str or value_type is six.text_type:
+                str_keys.append(key)
+                str_values.append(value)
+                continue
+            if value_type is float:
+                float_keys.append(key)
+                float_values.append(value)
+                continue
+            kind, value = _custom_attribute_kind(value)
+            if kind is _ATTR_INT:
+                int_keys.append(key)
+                int_values.append(value)
+            elif kind is _ATTR_FLOAT:
+                float_keys.append(key)
+                float_values.append(value)
+            elif kind is _ATTR_STRING:
+                str_keys.append(key)
+                str_values.append(value)
+            else:
+                self._warn_unsupported_attribute(key, value)
+
+        nsdk = self._nsdk
+        if int_keys:
+            nsdk.customrequestattribute_add_integers(int_keys, int_values, len(int_keys))
+        if float_keys:
+            nsdk.customrequestattribute_add_floats(float_keys, float_values, len(float_keys))
+        if str_keys:
+            nsdk.customrequestattribute_add_strings(str_keys, str_values, len(str_keys))
+
+    def add_custom_request_integer_attributes(self, keys, values):
+        '''Adds multiple integer custom request attributes to the current active
+            tracer with a single call into the native SDK.
+
+            If :code:`values` supports the buffer protocol with native signed 64 bit
+            items (e.g. an :code:`array.array('q')` or a one dimensional
+            :code:`numpy.int64` array), its memory is passed to the native SDK
+            without converting the individual values to Python objects.
+
+            :param keys: The names of the attributes.
+            :type keys: ~typing.Sequence[str]
+            :param values: The values of the attributes. Only the first
+                :code:`len(keys)` values are used.
+            :type values: ~typing.Sequence[int]
+
+            .. versionadded:: 1.6.0
+        '''
+        count = min(len(keys), len(values))
+        if count:
+            self._nsdk.customrequestattribute_add_integers(keys, values, count)
+
+    def add_custom_request_float_attributes(self, keys, values):
+        '''Adds multiple float custom request attributes to the current active
+            tracer with a single call into the native SDK.
+
+            Like :meth:`add_custom_request_integer_attributes`, but for
+            :code:`float` values. Buffers with native double items (e.g. an
+            :code:`array.array('d')` or a :code:`numpy.float64` array) are passed
+            without conversion.
+
+            :param keys: The names of the attributes.
+            :type keys: ~typing.Sequence[str]
+            :param values: The values of the attributes. Only the first
+                :code:`len(keys)` values are used.
+            :type values: ~typing.Sequence[float]
+
+            .. versionadded:: 1.6.0
+        '''
+        count = min(len(keys), len(values))
+        if count:
+            self._nsdk.customrequestattribute_add_floats(keys, values, count)
+
+    def _warn_unsupported_attribute(self, key, value):
+        warn = self._nsdk.agent_get_logging_callback()
+        if warn:
+            warn('Can\'t add custom request attribute \'{0}\' '
+                 'because the value type \'{1}\' is not supported!'.format(key, type(value)))
 
     # messaging
 
@@ -546,9 +1137,13 @@ class SDK(object): # pylint:disable=too-many-public-methods
             .. versionadded:: 1.2.0
         '''
 
+        handle = self._nsdk.messagingsysteminfo_create(
+            vendor_name, destination_name, destination_type, channel.type_, channel.endpoint)
+        if not handle:
+            return _NULL_MESSAGING_INFO
         return MessagingSystemInfoHandle(
-            self._nsdk, self._nsdk.messagingsysteminfo_create(
-                vendor_name, destination_name, destination_type, channel.type_, channel.endpoint))
+            self._nsdk, handle,
+            (vendor_name, destination_name, destination_type, channel.type_, channel.endpoint))
 
     def trace_outgoing_message(self, messaging_system_info):
         '''Creates a tracer for tracing an outgoing message.
@@ -561,8 +1156,11 @@ class SDK(object): # pylint:disable=too-many-public-methods
             .. versionadded:: 1.2.0
         '''
 
-        return tracers.OutgoingMessageTracer(
-            self._nsdk, self._nsdk.outgoingmessagetracer_create(messaging_system_info.handle))
+        if self._unsampled.active():
+            return _NULL_TRACERS[tracers.OutgoingMessageTracer]
+        return _new_tracer(
+            tracers.OutgoingMessageTracer, self._nsdk,
+            self._nsdk.outgoingmessagetracer_create(messaging_system_info.handle))
 
     def trace_incoming_message_receive(self, messaging_system_info):
         '''Creates a tracer for tracing the receipt of an incoming message.
@@ -582,8 +1180,10 @@ class SDK(object): # pylint:disable=too-many-public-methods
             .. versionadded:: 1.2.0
         '''
 
-        return tracers.IncomingMessageReceiveTracer(
-            self._nsdk,
+        if self._unsampled.active():
+            return _NULL_TRACERS[tracers.IncomingMessageReceiveTracer]
+        return _new_tracer(
+            tracers.IncomingMessageReceiveTracer, self._nsdk,
             self._nsdk.incomingmessagereceivetracer_create(messaging_system_info.handle))
 
     def trace_incoming_message_process(self, messaging_system_info, str_tag=None, byte_tag=None):
@@ -608,11 +1208,16 @@ class SDK(object): # pylint:disable=too-many-public-methods
             .. versionadded:: 1.2.0
         '''
 
-        result = tracers.IncomingMessageProcessTracer(
-            self._nsdk, self._nsdk.incomingmessageprocesstracer_create(
-                messaging_system_info.handle))
+        tracer = self._unsampled_tracer(
+            tracers.IncomingMessageProcessTracer, messaging_system_info.service_key,
+            str_tag, byte_tag)
+        if tracer is not None:
+            return tracer
+        result = _new_tracer(
+            tracers.IncomingMessageProcessTracer, self._nsdk,
+            self._nsdk.incomingmessageprocesstracer_create(messaging_system_info.handle))
 
-        if result is not None:
+        if result:
             self._applytag(result, str_tag, byte_tag)
 
         return result
@@ -638,8 +1243,11 @@ class SDK(object): # pylint:disable=too-many-public-methods
 
             .. versionadded:: 1.2.0
         '''
-        return tracers.CustomServiceTracer(
-            self._nsdk, self._nsdk.customservicetracer_create(service_method, service_name))
+        if self._unsampled.active() or tracers.CustomServiceTracer in self._throttling.types:
+            return _NULL_TRACERS[tracers.CustomServiceTracer]
+        return _new_tracer(
+            tracers.CustomServiceTracer, self._nsdk,
+            self._nsdk.customservicetracer_create(service_method, service_name))
 
     def tracecontext_get_current(self):
         ''' Retrieves the current W3C trace context's span and trace ID.
@@ -652,11 +1260,255 @@ class SDK(object): # pylint:disable=too-many-public-methods
             If you need to find out why the trace/span ID is zero, use the usual mechanism,
             i.e. :meth:`.set_verbose_callback` and :meth:`.set_diagnostic_callback`.
             The most common cause is that there is no tracer currently active.
+
+            This function is cheap enough to be called for every log record: As long as the
+            trace context on the current thread does not change, the same
+            :class:`.TraceContextInfo` object is returned again.
         '''
 
-        result_code, trace_id, span_id = self._nsdk.tracecontext_get_current()
+        raw = self._nsdk.tracecontext_get_current()
+        tls = self._tls
+        # The native SDK returns the identical tuple if nothing changed.
+        if raw is tls.tracecontext_raw:
+            return tls.tracecontext
+
+        result_code, trace_id, span_id = raw
 
         # Note: We discard error information here, the interesting cases should be covered by
         # the diagnostic/verbose callback. In difficult cases, calling through to
         # the raw _nsdk method might be a way to get more error information.
-        return TraceContextInfo(result_code == ErrorCode.SUCCESS, trace_id, span_id)
+        result = TraceContextInfo(result_code == ErrorCode.SUCCESS, trace_id, span_id)
+        tls.tracecontext_raw = raw
+        tls.tracecontext = result
+        return result
+
+    # prepared tracer factories
+
+    def prepare_custom_service(self, service_method, service_name):
+        '''Prepares a factory for custom service tracers with the given service
+        method and name.
+
+        Calling the returned factory is equivalent to calling
+        :meth:`trace_custom_service` with the same arguments, but the arguments
+        are only converted once, here. Use this for hot code paths that trace
+        the same service over and over again.
+
+        For the parameters, see :meth:`trace_custom_service`.
+
+        :rtype: tracers.PreparedTracerFactory
+
+        .. versionadded:: 1.6.0
+        '''
+        return tracers.PreparedTracerFactory(
+            self._nsdk,
+            self._nsdk.prepare_call(
+                'customservicetracer_create', service_method, service_name),
+            tracers.CustomServiceTracer,
+            unsampled=self._unsampled,
+            throttling=self._throttling)
+
+    def prepare_sql(self, database, sql):
+        '''Prepares a factory for database request tracers with the given
+        database info and SQL statement.
+
+        Calling the returned factory is equivalent to calling
+        :meth:`trace_sql_database_request` with the same arguments, but the
+        arguments are only converted once, here. The database info must not be
+        closed while the factory is still in use.
+
+        For the parameters, see :meth:`trace_sql_database_request`.
+
+        :rtype: tracers.PreparedTracerFactory
+
+        .. versionadded:: 1.6.0
+        '''
+        assert isinstance(database, DbInfoHandle)
+        return tracers.PreparedTracerFactory(
+            self._nsdk,
+            self._nsdk.prepare_call(
+                'databaserequesttracer_create_sql', database.handle, sql),
+            tracers.DatabaseRequestTracer,
+            unsampled=self._unsampled,
+            throttling=self._throttling)
+
+    def prepare_outgoing_remote_call(
+            self,
+            method,
+            service,
+            endpoint,
+            channel,
+            protocol_name=None):
+        '''Prepares a factory for outgoing remote call tracers with the given
+        properties.
+
+        Calling the returned factory is equivalent to calling
+        :meth:`trace_outgoing_remote_call` with the same arguments, but the
+        arguments are only converted once, here.
+
+        For the parameters, see :meth:`trace_outgoing_remote_call`.
+
+        :rtype: tracers.PreparedTracerFactory
+
+        .. versionadded:: 1.6.0
+        '''
+        return tracers.PreparedTracerFactory(
+            self._nsdk,
+            self._nsdk.prepare_call(
+                'outgoingremotecalltracer_create',
+                method,
+                service,
+                endpoint,
+                channel.type_,
+                channel.endpoint),
+            tracers.OutgoingRemoteCallTracer,
+            self._protocol_name_setter(
+                self._nsdk.outgoingremotecalltracer_set_protocol_name, protocol_name),
+            unsampled=self._unsampled)
+
+    def prepare_incoming_remote_call(
+            self,
+            method,
+            name,
+            endpoint,
+            protocol_name=None):
+        '''Prepares a factory for incoming remote call tracers with the given
+        properties.
+
+        Calling the returned factory (optionally with the :code:`str_tag` or
+        :code:`byte_tag` of the incoming call) is equivalent to calling
+        :meth:`trace_incoming_remote_call` with the same arguments, but the
+        arguments are only converted once, here.
+
+        For the parameters, see :meth:`trace_incoming_remote_call`.
+
+        :rtype: tracers.PreparedIncomingTracerFactory
+
+        .. versionadded:: 1.6.0
+        '''
+        return tracers.PreparedIncomingTracerFactory(
+            self._nsdk,
+            self._nsdk.prepare_call(
+                'incomingremotecalltracer_create', method, name, endpoint),
+            tracers.IncomingRemoteCallTracer,
+            self._applytag,
+            self._protocol_name_setter(
+                self._nsdk.incomingremotecalltracer_set_protocol_name, protocol_name),
+            unsampled=self._unsampled,
+            sample=functools.partial(
+                self._unsampled_tracer, tracers.IncomingRemoteCallTracer, name))
+
+    @staticmethod
+    def _protocol_name_setter(set_protocol_name, protocol_name):
+        if protocol_name is None:
+            return None
+        def setup(tracer):
+            set_protocol_name(tracer.handle, protocol_name)
+        return setup
+
+    # decorators
+
+    def traced_custom_service(self, method=None, name=None):
+        '''Returns a decorator that traces each call of the decorated function
+        as a custom service call (see :meth:`trace_custom_service`).
+
+        The arguments are converted to their native representation only once
+        per decorated function, as with :meth:`prepare_custom_service`. The
+        tracer is started when the function is called and ended when it
+        returns. If an exception leaves the function, the tracer is marked as
+        failed with that exception (see
+        :meth:`tracers.Tracer.mark_failed_exc`). For generator functions, the
+        tracer covers the first step, from starting the generator until it
+        yields the first item. Each further step is traced with an
+        :class:`tracers.InProcessLinkTracer` linked to it (see
+        :meth:`create_in_process_link`), so that the code consuming the items
+        is not traced as part of the generator (closing the generator early
+        is not treated as failure). Coroutine functions (:code:`async def`)
+        are traced until the coroutine returns. Async generator functions are
+        not supported.
+
+        Functions can be decorated before the SDK is initialized, e.g. with the
+        instance returned by :func:`oneagent.get_sdk`; they are traced once
+        :func:`oneagent.initialize` has been called.
+
+        Example::
+
+            sdk = oneagent.get_sdk()
+
+            @sdk.traced_custom_service(name='OrderService')
+            def place_order(order):
+                ...
+
+        .. note:: The decorated function has no access to the tracer. Use
+            :meth:`trace_custom_service` if you need it.
+
+        :param str method: The name of the service method. Defaults to the name
+            of the decorated function.
+        :param str name: The name of the service. Defaults to the name of the
+            module of the decorated function, followed by the name of its class,
+            if any.
+
+        .. versionadded:: 1.6.0
+        '''
+        def get_prepare(func):
+            service_method = func.__name__ if method is None else method
+            service_name = _decorators.default_service_name(func) if name is None else name
+            return lambda: self.prepare_custom_service(service_method, service_name)
+        return _decorators.make_decorator(self, get_prepare)
+
+    def traced_outgoing_remote_call(
+            self, method, service, endpoint, channel, protocol_name=None):
+        '''Returns a decorator that traces each call of the decorated function
+        as an outgoing remote call (see :meth:`trace_outgoing_remote_call`).
+
+        See :meth:`traced_custom_service` for how the decorated function is
+        traced. The parameters are the same as for
+        :meth:`trace_outgoing_remote_call`, except that :code:`method` may be
+        None to use the name of the decorated function.
+
+        .. note:: The decorated function cannot get the outgoing tag of the
+            tracer, so the call can't be linked to the remote side. Use
+            :meth:`trace_outgoing_remote_call` if you need that.
+
+        .. versionadded:: 1.6.0
+        '''
+        def get_prepare(func):
+            method_name = func.__name__ if method is None else method
+            return lambda: self.prepare_outgoing_remote_call(
+                method_name, service, endpoint, channel, protocol_name)
+        return _decorators.make_decorator(self, get_prepare)
+
+    def traced_incoming_remote_call(self, method, name, endpoint, protocol_name=None):
+        '''Returns a decorator that traces each call of the decorated function
+        as an incoming remote call (see :meth:`trace_incoming_remote_call`).
+
+        See :meth:`traced_custom_service` for how the decorated function is
+        traced. The parameters are the same as for
+        :meth:`trace_incoming_remote_call`, except that :code:`method` may be
+        None to use the name of the decorated function. Incoming tags are not
+        supported.
+
+        .. versionadded:: 1.6.0
+        '''
+        def get_prepare(func):
+            method_name = func.__name__ if method is None else method
+            return lambda: self.prepare_incoming_remote_call(
+                method_name, name, endpoint, protocol_name)
+        return _decorators.make_decorator(self, get_prepare)
+
+    def traced_sql_database_request(self, database, sql):
+        '''Returns a decorator that traces each call of the decorated function
+        as a database request executing :code:`sql` (see
+        :meth:`trace_sql_database_request`).
+
+        See :meth:`traced_custom_service` for how the decorated function is
+        traced. Unlike the other decorators, this one can only be used after
+        :func:`oneagent.initialize`, because :code:`database` (see
+        :meth:`create_database_info`) must have been created with an
+        initialized SDK. It must not be closed while the decorated function is
+        still in use.
+
+        .. versionadded:: 1.6.0
+        '''
+        assert isinstance(database, DbInfoHandle)
+        return _decorators.make_decorator(
+            self, lambda func: lambda: self.prepare_sql(database, sql))
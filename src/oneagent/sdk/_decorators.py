@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Implementation of the tracing decorators of :class:`oneagent.sdk.SDK`.'''
+
+import functools
+import inspect
+import sys
+
+from oneagent._impl.util import getqualname
+
+class CallsiteTracerFactory(object):
+    '''Creates the tracers for one decorated function.
+
+    The arguments are prepared (see e.g.
+    :meth:`oneagent.sdk.SDK.prepare_custom_service`) on the first call and
+    again whenever the native SDK used by the SDK instance changes (e.g. by
+    :func:`oneagent.initialize` or the agent state watcher), so functions can
+    be decorated before the SDK is initialized.'''
+
+    __slots__ = ('_sdk', '_prepare', '_nsdk', '_factory')
+
+    def __init__(self, sdk, prepare):
+        self._sdk = sdk
+        self._prepare = prepare
+        self._nsdk = None
+        self._factory = None
+
+    def __call__(self):
+        nsdk = self._sdk._nsdk #pylint:disable=protected-access
+        if nsdk is not self._nsdk:
+            # If the native SDK changes concurrently, the mismatch is detected
+            # and the factory prepared again on the next call.
+            self._factory = self._prepare()
+            self._nsdk = nsdk
+        return self._factory()
+
+def default_service_name(func):
+    '''Returns the module name of :code:`func`, followed by the name of the
+    class it is defined in, if any.'''
+    owner = getqualname(func).rpartition('.')[0]
+    if not owner or '<locals>' in owner:
+        return func.__module__
+    return func.__module__ + '.' + owner
+
+def _wrap_function(func, make_tracer):
+    def wrapper(*args, **kwargs):
+        with make_tracer():
+            return func(*args, **kwargs)
+    return wrapper
+
+def resume(gen, to_send, to_throw):
+    '''Resumes :code:`gen` by sending :code:`to_send` or, if not None,
+    throwing :code:`to_throw` into it. Returns :code:`(False, item)` for the
+    next item, or :code:`(True, return value)` if :code:`gen` is exhausted.'''
+    try:
+        if to_throw is None:
+            return False, gen.send(to_send)
+        return False, gen.throw(to_throw)
+    except StopIteration as e:
+        return True, getattr(e, 'value', None) # No return values on Python 2
+
+def resume_first(sdk, gen, make_tracer):
+    '''Resumes :code:`gen` for the first time in the generator's tracer.
+    Returns the result of :func:`resume` and an in-process link to the tracer
+    (empty if it is not traced).'''
+    with make_tracer() as tracer:
+        done, value = resume(gen, None, None)
+        # A falsy tracer is not active, so a link would belong to the caller's
+        # tracer instead.
+        link = sdk.create_in_process_link() if tracer and not done else b''
+    return done, value, link
+
+def resume_linked(sdk, gen, link, to_send, to_throw):
+    '''Resumes :code:`gen` in an in-process link tracer for :code:`link`,
+    like :func:`resume`.'''
+    if not link:
+        return resume(gen, to_send, to_throw)
+    with sdk.trace_in_process_link(link):
+        return resume(gen, to_send, to_throw)
+
+def _wrap_generator(sdk, func, make_tracer):
+    # One tracer covers the first step (resuming gen until it yields the first
+    # item), the following steps are linked to it with in-process links. Thus
+    # the generator is traced once, but no tracer is left started while the
+    # consumer runs, which might end it on another thread or start tracers of
+    # its own that would end up nested in it. Delegates like "yield from",
+    # which is not available on Python 2. The return value of func is lost
+    # (generators can't return values there).
+    def wrapper(*args, **kwargs):
+        gen = func(*args, **kwargs)
+        done, item, link = resume_first(sdk, gen, make_tracer)
+        while not done:
+            to_send = to_throw = None
+            try:
+                to_send = yield item
+            except GeneratorExit:
+                # Not consuming the generator completely is no failure.
+                gen.close()
+                return
+            except BaseException as e: #pylint:disable=broad-except
+                to_throw = e
+            done, item = resume_linked(sdk, gen, link, to_send, to_throw)
+    return wrapper
+
+if sys.version_info >= (3, 5):
+    from oneagent.sdk import _decorators_py3 as _py3
+
+    def _wrap(sdk, func, make_tracer):
+        if inspect.iscoroutinefunction(func):
+            return _py3.wrap_coroutine(func, make_tracer)
+        if _py3.isasyncgenfunction(func):
+            raise TypeError('Tracing async generator functions is not supported.')
+        if inspect.isgeneratorfunction(func):
+            return _py3.wrap_generator(sdk, func, make_tracer)
+        return _wrap_function(func, make_tracer)
+else:
+    def _wrap(sdk, func, make_tracer):
+        if inspect.isgeneratorfunction(func):
+            return _wrap_generator(sdk, func, make_tracer)
+        return _wrap_function(func, make_tracer)
+
+def make_decorator(sdk, get_prepare):
+    '''Returns a tracing decorator. :code:`get_prepare(func)` is called once
+    per decorated function and must return a callable without arguments that
+    prepares a tracer factory with :code:`sdk`.'''
+    def decorator(func):
+        make_tracer = CallsiteTracerFactory(sdk, get_prepare(func))
+        return functools.wraps(func)(_wrap(sdk, func, make_tracer))
+    return decorator
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tracing decorator wrappers that need Python 3.5+ syntax. See
+:mod:`oneagent.sdk._decorators`.'''
+
+import inspect
+
+from oneagent.sdk._decorators import resume_first, resume_linked
+
+isasyncgenfunction = getattr(inspect, 'isasyncgenfunction', lambda func: False)
+
+def wrap_generator(sdk, func, make_tracer):
+    # Like _decorators._wrap_generator, but keeps the return value of func.
+    def wrapper(*args, **kwargs):
+        gen = func(*args, **kwargs)
+        done, item, link = resume_first(sdk, gen, make_tracer)
+        while not done:
+            to_send = to_throw = None
+            try:
+                to_send = yield item
+            except GeneratorExit:
+                # Not consuming the generator completely is no failure.
+                gen.close()
+                return None
+            except BaseException as e: #pylint:disable=broad-except
+                to_throw = e
+            done, item = resume_linked(sdk, gen, link, to_send, to_throw)
+        return item
+    return wrapper
+
+def wrap_coroutine(func, make_tracer):
+    async def wrapper(*args, **kwargs):
+        async with make_tracer():
+            return await func(*args, **kwargs)
+    return wrapper
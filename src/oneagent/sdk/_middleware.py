@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Common base of the web server middlewares (:mod:`oneagent.sdk.wsgi`,
+:mod:`oneagent.sdk.asgi`).'''
+
+import threading
+
+import oneagent
+from oneagent._impl.util import getfullname
+
+def _default_application_id(app):
+    if hasattr(app, '__qualname__') or hasattr(app, '__name__'):
+        return getfullname(app)
+    return getfullname(type(app))
+
+class WebAppMiddleware(object):
+    '''Holds the web application info of a middleware, which is created on
+    the first request and reused until the native SDK of the SDK changes (by
+    :func:`oneagent.initialize` or :func:`oneagent.shutdown`), which closes
+    it. Switching between the active and inactive state (see
+    :meth:`oneagent.sdk.SDK.start_agent_state_watcher`) or throttling by the
+    overhead governor does not change the native SDK.'''
+
+    #pylint:disable=too-many-arguments
+    def __init__(self, app, application_id=None, virtual_host=None, context_root=None,
+                 sdk=None):
+        self.app = app
+        self.application_id = application_id or _default_application_id(app)
+        self.virtual_host = virtual_host
+        self.context_root = context_root
+        self._sdk = sdk
+        self._webapp_info = None # (agent native SDK, web application info)
+        self._webapp_info_lk = threading.Lock()
+
+    def _get_sdk(self):
+        return self._sdk or oneagent.get_sdk()
+
+    def _get_webapp_info(self, sdk, default_virtual_host, default_context_root):
+        agent_nsdk = sdk._agent_nsdk #pylint:disable=protected-access
+        cached = self._webapp_info
+        if cached is not None and cached[0] is agent_nsdk:
+            return cached[1]
+        with self._webapp_info_lk:
+            cached = self._webapp_info
+            if cached is not None and cached[0] is agent_nsdk:
+                return cached[1]
+            info = sdk.create_web_application_info(
+                self.virtual_host or default_virtual_host,
+                self.application_id,
+                self.context_root or default_context_root or '/')
+            if not info:
+                # Created while the agent is inactive: Don't keep the null
+                # info once it becomes active again.
+                return info
+            self._webapp_info = (agent_nsdk, info)
+        if cached is not None:
+            cached[1].close()
+        return info
+
+    def close(self):
+        '''Closes the web application info used for tracing, if any. The
+        middleware may still be used afterwards.'''
+        with self._webapp_info_lk:
+            cached, self._webapp_info = self._webapp_info, None
+        if cached is not None:
+            cached[1].close()
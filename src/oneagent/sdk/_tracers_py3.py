@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+'''Asynchronous context manager methods of
+:class:`oneagent.sdk.tracers.Tracer` (need Python 3.5+ syntax).'''
+
+try:
+    import contextvars
+except ImportError: # Python < 3.7
+    contextvars = None
+
+# The oneagent.sdk.aio state of the task whose step is currently running, if
+# any (see there).
+current_task = contextvars.ContextVar('oneagent.sdk.current_task', default=None) \
+    if contextvars is not None else None
+
+def _null_nsdk():
+    from oneagent.sdk.tracers import _NULL_NSDK
+    return _NULL_NSDK
+
+async def tracer_aenter(self):
+    '''Starts the tracer (as if calling :meth:`.start`) and returns
+    :code:`self`. For use with :code:`async with` blocks.
+
+    In a task created by the task factory of :mod:`oneagent.sdk.aio`, the
+    tracer is discarded instead (i.e., becomes a no-op) while another task
+    keeps its tracers started on the thread.
+
+    .. versionadded:: 1.6.0
+    '''
+    task = current_task.get() if current_task is not None else None
+    if task is not None and self:
+        if task.nested:
+            # Another task keeps its tracers started on this thread, so this
+            # one could not be ended in the right order: Discard it.
+            self.end()
+            self.nsdk = _null_nsdk()
+            return self
+        self.start()
+        task.held += 1
+        return self
+    self.start()
+    return self
+
+async def tracer_aexit(self, e_ty, e_val, e_tb):
+    '''Like :meth:`__exit__`, for use with :code:`async with` blocks.
+
+    .. versionadded:: 1.6.0
+    '''
+    held = bool(self)
+    try:
+        self.__exit__(e_ty, e_val, e_tb)
+    finally:
+        if held and current_task is not None:
+            task = current_task.get()
+            if task is not None:
+                task.held -= 1
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tracing of :mod:`asyncio` tasks. Requires Python 3.7 or newer.
+
+The agent tracks the active tracer per thread, so the steps of asyncio tasks
+that are interleaved on an event loop thread would otherwise be recorded as
+nested into each other's tracers. The task factory of this module links each
+new task to the tracer that is active where it is created (see
+:meth:`oneagent.sdk.SDK.create_in_process_link`) and runs each step of the
+task (i.e., the code between two suspensions) in an
+:class:`oneagent.sdk.tracers.InProcessLinkTracer` for that link, so that the
+work of the task is attributed to the operation that created it::
+
+    import oneagent.sdk.aio
+
+    async def main():
+        oneagent.sdk.aio.install()
+        ...
+
+Tracers that are ended in the same step in which they were started need no
+special handling. A tracer that stays started across an :code:`await` must
+be used in an :code:`async with` block (see
+:class:`oneagent.sdk.tracers.Tracer`; the coroutine functions decorated by
+:meth:`oneagent.sdk.SDK.traced_custom_service` etc. do so): The native agent
+cannot suspend tracers, so the task keeps its tracers started on the thread
+until the :code:`async with` block is left. The steps of other tasks that run
+on the thread in the meantime are still traced, but tracers that they start in
+:code:`async with` blocks are discarded, because they could not be ended in the
+right order.
+
+.. versionadded:: 1.6.0
+'''
+
+import asyncio
+import threading
+from collections.abc import Coroutine
+
+import oneagent
+from oneagent.sdk._tracers_py3 import current_task
+
+# owner: The _TaskState of the task whose tracers stay started on this thread
+# while it is suspended, if any.
+_thread_state = threading.local()
+
+class _TaskState(object):
+    '''Tracing state of a task created by a :class:`LinkingTaskFactory`.'''
+
+    __slots__ = ('sdk', 'link', 'tracer', 'held', 'nested')
+
+    def __init__(self, sdk, link):
+        self.sdk = sdk
+        self.link = link
+        self.tracer = None # The in-process link tracer while started
+        self.held = 0 # The number of tracers started in async with blocks
+        # Whether the current step runs while another task keeps its tracers
+        # started on the thread.
+        self.nested = False
+
+class _LinkedCoroutine(Coroutine):
+    '''Wraps the coroutine of a task to run each of its steps for the task's
+    :class:`_TaskState`.'''
+
+    __slots__ = ('_coro', '_state')
+
+    def __init__(self, coro, state):
+        self._coro = coro
+        self._state = state
+
+    def _step(self, method, *args):
+        state = self._state
+        owner = getattr(_thread_state, 'owner', None)
+        state.nested = owner is not None and owner is not state
+        if owner is not state and state.link:
+            state.tracer = state.sdk.trace_in_process_link(state.link)
+            state.tracer.start()
+        done = False
+        token = current_task.set(state)
+        try:
+            return method(*args)
+        except BaseException:
+            done = True
+            raise
+        finally:
+            current_task.reset(token)
+            if state.held and not done:
+                _thread_state.owner = state
+            else:
+                if owner is state:
+                    _thread_state.owner = None
+                tracer, state.tracer = state.tracer, None
+                if tracer is not None:
+                    tracer.end()
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args): #pylint:disable=arguments-differ
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        self._step(self._coro.close)
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def __getattr__(self, name):
+        # cr_frame, __qualname__ etc. (used by asyncio for reprs and stacks)
+        return getattr(self._coro, name)
+
+class LinkingTaskFactory(object):
+    '''An asyncio task factory (see :meth:`asyncio.loop.set_task_factory`)
+    that links each task to the tracer that is active where it is created,
+    as described in :mod:`oneagent.sdk.aio`.
+
+    :param oneagent.sdk.SDK sdk: The SDK to use. Defaults to the one returned
+        by :func:`oneagent.get_sdk` at the time of each task creation.
+    :param task_factory: The task factory that creates the tasks, e.g., the
+        one that was set on the loop before. Defaults to creating an
+        :class:`asyncio.Task`.
+    '''
+
+    def __init__(self, sdk=None, task_factory=None):
+        self.sdk = sdk
+        self.task_factory = task_factory
+
+    def __call__(self, loop, coro, **kwargs):
+        sdk = self.sdk or oneagent.get_sdk()
+        if sdk._unsampled.active(): #pylint:disable=protected-access
+            link = b''
+        else:
+            link = sdk.create_in_process_link()
+        coro = _LinkedCoroutine(coro, _TaskState(sdk, link))
+        if self.task_factory is not None:
+            return self.task_factory(loop, coro, **kwargs)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+def install(loop=None, sdk=None):
+    '''Sets a :class:`LinkingTaskFactory` as the task factory of
+    :code:`loop` (defaults to the running event loop), wrapping any task
+    factory that is already set. Tasks created before are not affected.
+
+    :param asyncio.AbstractEventLoop loop: The event loop.
+    :param oneagent.sdk.SDK sdk: See :class:`LinkingTaskFactory`.
+    :rtype: LinkingTaskFactory
+    '''
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    previous = loop.get_task_factory()
+    if isinstance(previous, LinkingTaskFactory):
+        return previous
+    factory = LinkingTaskFactory(sdk, previous)
+    loop.set_task_factory(factory)
+    return factory
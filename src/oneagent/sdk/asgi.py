@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''ASGI (version 3) middleware that traces incoming HTTP requests. Requires
+Python 3.5 or newer.
+
+Wrap your ASGI application to trace the requests it handles, e.g.::
+
+    from oneagent.sdk.asgi import TracingMiddleware
+
+    app = TracingMiddleware(app, application_id='MyWebApp')
+
+.. versionadded:: 1.6.0
+'''
+
+import asyncio
+import threading
+from urllib.parse import quote
+
+from oneagent import logger
+from oneagent.common import DYNATRACE_HTTP_HEADER_NAME
+from oneagent.sdk._middleware import WebAppMiddleware
+from oneagent.sdk.sampling import UnsampledInterface
+from oneagent.sdk.tracers import Tracer
+
+_TAG_HEADER = DYNATRACE_HTTP_HEADER_NAME.lower().encode('ascii')
+
+_current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
+
+# owner: Per (event loop) thread, the task whose request tracer of a
+# TracingMiddleware is started on it, if any.
+_thread_state = threading.local()
+
+def _request_url(scope, host):
+    if host is not None:
+        host = host.decode('latin-1')
+    else:
+        server = scope.get('server')
+        if not server:
+            host = ''
+        elif server[1] is None:
+            host = server[0]
+        else:
+            host = '{}:{}'.format(*server)
+    root_path = scope.get('root_path', '')
+    path = scope.get('path', '')
+    if not path.startswith(root_path):
+        path = root_path + path
+    url = scope.get('scheme', 'http') + '://' + host + quote(path)
+    query = scope.get('query_string')
+    if query:
+        url += '?' + query.decode('latin-1')
+    return url
+
+class TracingMiddleware(WebAppMiddleware):
+    '''Traces each HTTP request handled by the ASGI application :code:`app`
+    with an :class:`oneagent.sdk.tracers.IncomingWebRequestTracer`. Other
+    scope types (e.g., :code:`websocket` and :code:`lifespan`) are passed
+    through.
+
+    The request headers are passed to the SDK as the raw byte pairs of the
+    scope, without decoding them (subject to the header filter of the SDK, see
+    :meth:`oneagent.sdk.SDK.set_header_filter`), and the
+    :data:`oneagent.common.DYNATRACE_HTTP_HEADER_NAME` header is used as the
+    incoming string tag. The status code and response headers are taken from
+    the :code:`http.response.start` message.
+
+    The tracer is created, started and ended by the task that handles the
+    request, on the event loop thread. Because the agent tracks the active
+    tracer per thread and tracers cannot be suspended, a request that starts
+    while the tracer of another request is started on the same event loop
+    would be recorded as nested into it. Therefore, the task of a traced
+    request owns its event loop thread until the request completes. Requests
+    of other tasks that start in the meantime are not traced, and tracing is
+    suppressed in their tasks like for unsampled requests. They are counted in
+    :attr:`skipped_count` (and logged). Requests that are not sampled (see
+    :mod:`oneagent.sdk.sampling`) or not traced for other reasons don't own
+    the thread. For the same reason, code that runs on the
+    event loop while a request is traced should not keep tracers of its own
+    started across :code:`await` points.
+
+    The parameters are the same as for :class:`oneagent.sdk.wsgi.TracingMiddleware`,
+    except that the virtual host defaults to the server address of the
+    first request and the context root to its :code:`root_path`.
+
+    .. versionadded:: 1.6.0
+    '''
+
+    #: The number of requests that were not traced because they started
+    #: while the request of another task was traced on the same thread.
+    skipped_count = 0
+
+    def _skip(self):
+        self.skipped_count += 1
+        if self.skipped_count == 1:
+            logger.warning(
+                'ASGI request of %s not traced: Overlaps with a traced request on the same'
+                ' thread. Further requests that are skipped for this reason are counted'
+                ' in skipped_count and logged at debug level only.', self.application_id)
+        else:
+            logger.debug(
+                'ASGI request of %s not traced: Overlaps with a traced request on the same'
+                ' thread (%d skipped).', self.application_id, self.skipped_count)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        task = _current_task()
+        owner = getattr(_thread_state, 'owner', None)
+        if owner is not None:
+            # In the owner's task, the request is already traced (e.g., by the
+            # middleware of an application that this one is mounted in).
+            if owner is task:
+                await self.app(scope, receive, send)
+                return
+            self._skip()
+            # Tracers started while handling the skipped request would be
+            # nested into the owner's request, so tracing is suppressed in the
+            # context of its task (as for an unsampled request).
+            sdk = self._get_sdk()
+            #pylint:disable=protected-access
+            with Tracer(sdk._unsampled_nsdk, UnsampledInterface.new_handle()):
+                await self.app(scope, receive, send)
+            return
+
+        headers = scope.get('headers') or ()
+        host = tag = None
+        for name, value in headers:
+            if name == b'host':
+                host = value
+            elif name == _TAG_HEADER:
+                tag = value
+
+        sdk = self._get_sdk()
+        server = scope.get('server')
+        tracer = sdk.trace_incoming_web_request(
+            self._get_webapp_info(
+                sdk, server[0] if server else '', scope.get('root_path')),
+            _request_url(scope, host),
+            scope.get('method', 'GET'),
+            headers=(
+                (name for name, _ in headers), (value for _, value in headers), len(headers)),
+            remote_address=(scope.get('client') or (None,))[0],
+            str_tag=tag)
+
+        async def traced_send(message):
+            if tracer and message['type'] == 'http.response.start':
+                tracer.set_status_code(message['status'])
+                response_headers = message.get('headers') or ()
+                tracer.add_response_headers(
+                    (name for name, _ in response_headers),
+                    (value for _, value in response_headers),
+                    len(response_headers))
+            await send(message)
+
+        async with tracer:
+            # Checked after starting, because the tracer may be discarded then
+            # (see oneagent.sdk.aio).
+            owned = bool(tracer)
+            if owned:
+                _thread_state.owner = task
+            try:
+                await self.app(scope, receive, traced_send)
+            finally:
+                if owned:
+                    _thread_state.owner = None
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Propagation of in-process links to :mod:`concurrent.futures` executors.
+
+Wrap an executor to link the calls that it runs to the tracer that was active
+where they were submitted, e.g.::
+
+    from concurrent.futures import ThreadPoolExecutor
+    from oneagent.sdk.futures import LinkingExecutor
+
+    executor = LinkingExecutor(ThreadPoolExecutor(max_workers=8))
+
+.. versionadded:: 1.6.0
+'''
+
+import time
+from concurrent.futures import Executor
+
+import oneagent
+
+try:
+    _clock = time.monotonic
+except AttributeError: # Python 2
+    _clock = time.time
+
+#: The default name of the custom request attribute for the time (in
+#: milliseconds) that a call waited in the queue of the executor.
+QUEUE_WAIT_ATTRIBUTE = 'Executor queue wait time (ms)'
+
+#pylint:disable=too-many-arguments
+def _run_linked(sdk, link, wait_attribute, submitted, func, args, kwargs):
+    with sdk.trace_in_process_link(link):
+        if wait_attribute:
+            sdk.add_custom_request_attribute(
+                wait_attribute, (_clock() - submitted) * 1000.0)
+        return func(*args, **kwargs)
+
+class LinkingExecutor(Executor):
+    '''A :class:`concurrent.futures.Executor` that submits calls to another
+    executor, each in an :class:`oneagent.sdk.tracers.InProcessLinkTracer`
+    that is linked to the tracer that is active on the submitting thread (see
+    :meth:`oneagent.sdk.SDK.create_in_process_link`).
+
+    If no tracer is active (or the agent is inactive), the link is empty and
+    the call is submitted unchanged, so untraced work costs only the call
+    that creates the link.
+
+    The time that each linked call waited for a worker is added to its
+    in-process link tracer as a custom request attribute.
+
+    :param concurrent.futures.Executor executor: The executor that runs the
+        calls, e.g., a :class:`concurrent.futures.ThreadPoolExecutor`. It must
+        run them in this process.
+    :param oneagent.sdk.SDK sdk: The SDK to use. Defaults to the one returned
+        by :func:`oneagent.get_sdk` at the time of each submission.
+    :param str wait_attribute: The name of the custom request attribute for
+        the queue wait time in milliseconds, or :code:`None` to not add it.
+    '''
+
+    def __init__(self, executor, sdk=None, wait_attribute=QUEUE_WAIT_ATTRIBUTE):
+        self.executor = executor
+        self.sdk = sdk
+        self.wait_attribute = wait_attribute
+
+    def submit(self, fn, *args, **kwargs): #pylint:disable=arguments-differ
+        sdk = self.sdk or oneagent.get_sdk()
+        if sdk._unsampled.active(): #pylint:disable=protected-access
+            link = b''
+        else:
+            link = sdk.create_in_process_link()
+        if not link:
+            return self.executor.submit(fn, *args, **kwargs)
+        return self.executor.submit(
+            _run_linked, sdk, link, self.wait_attribute, _clock(), fn, args, kwargs)
+
+    def shutdown(self, wait=True, **kwargs): #pylint:disable=arguments-differ
+        self.executor.shutdown(wait, **kwargs)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Overhead governor that throttles tracing while the SDK uses too much of
+the process' CPU time. Start it with
+:meth:`oneagent.sdk.SDK.start_overhead_governor`.
+
+.. versionadded:: 1.6.0
+'''
+
+import threading
+import time
+from collections import namedtuple
+
+from oneagent import logger
+from oneagent.sdk.tracers import (
+    CustomServiceTracer, DatabaseRequestTracer, OutgoingWebRequestTracer)
+
+try:
+    _clock = time.perf_counter
+    _process_time = time.process_time
+except AttributeError: # Python 2
+    _clock = time.time
+    _process_time = time.clock #pylint:disable=no-member
+
+# Without a per-thread CPU clock (before Python 3.7), the CPU time of SDK
+# calls is approximated by their wall time.
+_thread_time = getattr(time, 'thread_time', _clock)
+
+#: The tracer types that are disabled at each throttling level, starting with
+#: the most frequent and least valuable ones.
+THROTTLING_LEVELS = (
+    (),
+    (DatabaseRequestTracer, CustomServiceTracer),
+    (DatabaseRequestTracer, CustomServiceTracer, OutgoingWebRequestTracer))
+
+class OverheadSample(namedtuple('OverheadSample', 'sdk_time cpu_time wall_time sdk_cpu_time')):
+    '''The wall time spent in SDK calls (:code:`sdk_time`), the CPU time used
+    by the whole process (:code:`cpu_time`), the duration (:code:`wall_time`)
+    and the CPU time used by the calling threads during SDK calls
+    (:code:`sdk_cpu_time`, defaults to :code:`sdk_time`) of one measurement
+    window of the :class:`OverheadGovernor`, in seconds.
+
+    The wall time of SDK calls also includes e.g. waiting for the GIL, so the
+    overhead is based on their CPU time.'''
+
+    __slots__ = ()
+
+    def __new__(cls, sdk_time, cpu_time, wall_time, sdk_cpu_time=None):
+        if sdk_cpu_time is None:
+            sdk_cpu_time = sdk_time
+        return super(OverheadSample, cls).__new__(
+            cls, sdk_time, cpu_time, wall_time, sdk_cpu_time)
+
+    @property
+    def overhead(self):
+        '''The share of process CPU time spent in SDK calls.'''
+        return self.sdk_cpu_time / self.cpu_time if self.cpu_time > 0 else 0.0
+
+class Throttling(object):
+    '''Holds the tracer types that are currently disabled by the overhead
+    governor. Shared by an SDK instance and its prepared tracer factories.
+    :attr:`types` is a :class:`frozenset` that is replaced, never modified,
+    so it can be checked without locking.'''
+
+    __slots__ = ('types',)
+
+    def __init__(self):
+        self.types = frozenset()
+
+class _ThreadBusy(object):
+    '''The wall and CPU time spent in SDK calls by one thread. Only updated
+    by that thread, and read by :meth:`_TimedInterface.take_busy`.'''
+
+    __slots__ = ('thread', 'wall', 'cpu', 'taken_wall', 'taken_cpu')
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.wall = self.cpu = self.taken_wall = self.taken_cpu = 0.0
+
+class _TimedInterface(object):
+    '''Wraps a native SDK interface and adds up the wall time and the thread
+    CPU time spent in its methods. Each thread adds up its own times, so
+    calls don't need a lock.'''
+
+    def __init__(self, nsdk):
+        self._nsdk = nsdk
+        self._local = threading.local()
+        self._threads = []
+        self._threads_lk = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._nsdk, name)
+        if name == 'prepare_call':
+            prepare_call = attr
+            attr = lambda *args: self._timed(prepare_call(*args))
+        elif callable(attr) and not name.startswith('_'):
+            attr = self._timed(attr)
+        setattr(self, name, attr) # Cache, so that __getattr__ is called only once.
+        return attr
+
+    def _register_thread(self):
+        busy = self._local.busy = _ThreadBusy()
+        with self._threads_lk:
+            self._threads.append(busy)
+        return busy
+
+    def _timed(self, func):
+        clock = _clock
+        thread_time = _thread_time
+        local = self._local
+        register_thread = self._register_thread
+        def timed(*args, **kwargs):
+            busy = getattr(local, 'busy', None) or register_thread()
+            start, start_cpu = clock(), thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                busy.cpu += thread_time() - start_cpu
+                busy.wall += clock() - start
+        return timed
+
+    def take_busy(self):
+        '''Returns the wall and CPU time spent in SDK calls since the last
+        call, as a tuple.'''
+        wall = cpu = 0.0
+        with self._threads_lk:
+            for busy in self._threads:
+                busy_wall, busy_cpu = busy.wall, busy.cpu
+                wall += busy_wall - busy.taken_wall
+                cpu += busy_cpu - busy.taken_cpu
+                busy.taken_wall, busy.taken_cpu = busy_wall, busy_cpu
+            # The times of finished threads have been taken now.
+            self._threads = [busy for busy in self._threads if busy.thread.is_alive()]
+        return wall, cpu
+
+class OverheadGovernor(object):
+    '''Measures the time spent in SDK calls per window on a daemon thread and
+    disables tracer types (see :data:`THROTTLING_LEVELS`) while it exceeds the
+    budget. Created by :meth:`oneagent.sdk.SDK.start_overhead_governor`.'''
+
+    #: Windows in which the process used less CPU time than this share of the
+    #: window duration count as having no overhead, because a few SDK calls in
+    #: an otherwise idle process would be reported as a huge share.
+    MIN_CPU_SHARE = 0.01
+
+    #: Upper bound for the factor by which the number of windows required for
+    #: restoring is multiplied after restoring failed repeatedly.
+    MAX_RESTORE_BACKOFF = 32
+
+    #pylint:disable=too-many-arguments
+    def __init__(self, timed_nsdk, throttling, budget, window, restore_ratio, restore_windows):
+        self.budget = budget
+        self.window = window
+        self.restore_ratio = restore_ratio
+        self.restore_windows = restore_windows
+        self._timed_nsdk = timed_nsdk
+        self._throttling = throttling
+        self._level = 0
+        self._good_windows = 0
+        self._restore_backoff = 1
+        self._restored = False
+        self._last_sample = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='oneagent-overhead-governor')
+        self._thread.daemon = True
+        self._cpu_start = self._wall_start = None
+
+    @property
+    def level(self):
+        '''The current throttling level, an index into
+        :data:`THROTTLING_LEVELS`. 0 if nothing is throttled.'''
+        return self._level
+
+    @property
+    def throttled_types(self):
+        '''The tracer types that are currently disabled.'''
+        return THROTTLING_LEVELS[self._level]
+
+    @property
+    def last_sample(self):
+        '''The :class:`OverheadSample` of the last window that was evaluated
+        or None.'''
+        return self._last_sample
+
+    def start(self):
+        self._begin_window()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _begin_window(self):
+        self._timed_nsdk.take_busy()
+        self._cpu_start = _process_time()
+        self._wall_start = _clock()
+
+    def _run(self):
+        while not self._stopped.wait(self.window):
+            try:
+                self._end_window()
+            except Exception: #pylint:disable=broad-except
+                logger.exception('Failed updating tracing overhead.')
+
+    def _end_window(self):
+        cpu, wall = _process_time(), _clock()
+        sdk_time, sdk_cpu_time = self._timed_nsdk.take_busy()
+        sample = OverheadSample(
+            sdk_time, cpu - self._cpu_start, wall - self._wall_start, sdk_cpu_time)
+        self._cpu_start, self._wall_start = cpu, wall
+        if sample.cpu_time < sample.wall_time * self.MIN_CPU_SHARE:
+            sample = sample._replace(cpu_time=0.0)
+        self._evaluate(sample)
+
+    def _evaluate(self, sample):
+        '''Adjusts the throttling level for the measured window.'''
+        self._last_sample = sample
+        overhead = sample.overhead
+        restored, self._restored = self._restored, False
+        if overhead > self.budget:
+            self._good_windows = 0
+            if restored:
+                # The load that caused throttling is still there, so wait
+                # longer before trying again.
+                self._restore_backoff = min(
+                    self._restore_backoff * 2, self.MAX_RESTORE_BACKOFF)
+            if self._level + 1 < len(THROTTLING_LEVELS):
+                self._set_level(self._level + 1, overhead)
+            return
+        if restored:
+            self._restore_backoff = 1
+        if overhead < self.budget * self.restore_ratio and self._level > 0:
+            # Restore only after several good windows in a row, so that the
+            # level does not flap around the budget.
+            self._good_windows += 1
+            if self._good_windows >= self.restore_windows * self._restore_backoff:
+                self._good_windows = 0
+                self._restored = True
+                self._set_level(self._level - 1, overhead)
+        else:
+            self._good_windows = 0
+
+    def _set_level(self, level, overhead):
+        self._level = level
+        self._throttling.types = frozenset(THROTTLING_LEVELS[level])
+        logger.info(
+            'Tracing overhead %.2f%% (budget %.2f%%), throttling level is now %d.',
+            overhead * 100, self.budget * 100, level)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Filtering of the HTTP headers that are captured by web request tracers.
+Install a filter with :meth:`oneagent.sdk.SDK.set_header_filter`.
+
+.. versionadded:: 1.6.0
+'''
+
+from oneagent._impl import six
+
+def _encoded_length(value):
+    if value is None:
+        return 0
+    if isinstance(value, six.text_type):
+        return len(value.encode('utf-8'))
+    return len(value)
+
+def _truncate(value, length):
+    if isinstance(value, six.text_type):
+        # Drops a character that would be cut in the middle.
+        return value.encode('utf-8')[:length].decode('utf-8', 'ignore')
+    return value[:length]
+
+class HeaderFilter(object):
+    '''Selects and truncates HTTP headers before they are passed to the
+    native SDK.
+
+    Headers are filtered before they are converted to their native
+    representation, so dropped headers cost little more than a dictionary
+    lookup. Header sizes are measured in bytes, with text encoded as UTF-8
+    (as it is passed to the native SDK). Text values are truncated at
+    character boundaries. Values that are None are passed through and count
+    as empty.
+
+    :param allow: The names of the headers to capture (case-insensitive), or
+        None to capture all headers.
+    :type allow: ~typing.Iterable[str] or None
+    :param int max_value_length: Values longer than this many bytes are
+        truncated, None for no limit.
+    :param int max_total_length: Headers are skipped once the sum of the
+        lengths of the names and (truncated) values of the headers captured so
+        far would exceed this, None for no limit. Applies to each call
+        separately, e.g., to the request headers of one request.
+
+    .. versionadded:: 1.6.0
+    '''
+
+    #: The maximum number of distinct header name spellings for which the
+    #: result of the allowlist lookup is cached.
+    MAX_CACHED_NAMES = 1024
+
+    def __init__(self, allow=None, max_value_length=None, max_total_length=None):
+        for name, limit in (('max_value_length', max_value_length),
+                            ('max_total_length', max_total_length)):
+            if limit is not None and limit < 0:
+                raise ValueError('{} must not be negative, got {!r}'.format(name, limit))
+        if allow is None:
+            self.allow = None
+        else:
+            self.allow = frozenset(name.lower() for name in allow)
+        self.max_value_length = max_value_length
+        self.max_total_length = max_total_length
+        # Maps header names exactly as passed in (str and bytes) to whether
+        # they are allowed, so that most lookups need no lower().
+        self._allowed = {}
+        if self.allow is not None:
+            for name in self.allow:
+                self._allowed[name] = True
+                if isinstance(name, six.text_type):
+                    self._allowed[name.encode('utf-8')] = True
+
+    def _is_allowed(self, name):
+        allowed = self._allowed.get(name)
+        if allowed is None:
+            lname = name.lower()
+            if not isinstance(lname, six.string_types): # bytes on Python 3
+                lname = lname.decode('utf-8', 'replace')
+            allowed = lname in self.allow
+            if len(self._allowed) < self.MAX_CACHED_NAMES:
+                self._allowed[name] = allowed
+        return allowed
+
+    def apply(self, names, values, count):
+        '''Returns the names, values and count of the headers to capture out
+        of the first :code:`count` headers from the iterables :code:`names`
+        and :code:`values`.'''
+        check_allowed = self.allow is not None
+        max_value_length = self.max_value_length
+        remaining = self.max_total_length
+        result_names = []
+        result_values = []
+        for _, name, value in six.moves.zip(six.moves.range(count), names, values):
+            if check_allowed and not self._is_allowed(name):
+                continue
+            if max_value_length is not None or remaining is not None:
+                value_length = _encoded_length(value)
+                if max_value_length is not None and value_length > max_value_length:
+                    value = _truncate(value, max_value_length)
+                    value_length = _encoded_length(value)
+            if remaining is not None:
+                size = _encoded_length(name) + value_length
+                if size > remaining:
+                    continue
+                remaining -= size
+            result_names.append(name)
+            result_values.append(value)
+        return result_names, result_values, len(result_names)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Propagation of Dynatrace tags to process pools
+(:class:`multiprocessing.pool.Pool`,
+:class:`concurrent.futures.ProcessPoolExecutor`), so that the work done by
+the worker processes is part of the path that submitted it.
+
+When a call is submitted, an outgoing remote call is traced on the
+submitting thread and its byte tag is pickled together with the call. The
+worker process traces the call as an incoming remote call with that tag::
+
+    from oneagent.sdk.pools import TaggingExecutor, tag_call
+
+    executor = TaggingExecutor(ProcessPoolExecutor())
+    future = executor.submit(crunch, data)
+
+    # multiprocessing.Pool: One tag for all items of a map
+    results = pool.map(tag_call(crunch), items)
+
+The worker processes must initialize the SDK themselves (e.g., by passing
+:func:`oneagent.initialize` as the :code:`initializer` of the pool), unless
+they are forked from a process that was initialized with
+:code:`forkable=True`. Otherwise, the calls are run untraced.
+
+.. versionadded:: 1.6.0
+'''
+
+import os
+from concurrent.futures import Executor
+
+import oneagent
+from oneagent.common import ChannelType
+from oneagent._impl.util import getfullname
+from oneagent.sdk import Channel
+
+#: The default service name of the remote calls to the worker processes.
+DEFAULT_SERVICE_NAME = 'ProcessPool'
+
+_PROTOCOL_NAME = 'pickle'
+_CHANNEL = Channel(
+    ChannelType.UNIX_DOMAIN_SOCKET if os.name == 'posix' else ChannelType.NAMED_PIPE)
+
+def _method_name(func):
+    if hasattr(func, '__qualname__') or hasattr(func, '__name__'):
+        return getfullname(func)
+    return getfullname(type(func))
+
+class TaggedCall(object):
+    '''A picklable callable that calls :code:`func` in an
+    :class:`oneagent.sdk.tracers.IncomingRemoteCallTracer` with the byte tag
+    :code:`tag`. Use :func:`tag_call` to create instances.'''
+
+    __slots__ = ('func', 'tag', 'method', 'service', 'endpoint')
+
+    #pylint:disable=too-many-arguments
+    def __init__(self, func, tag, method, service, endpoint):
+        self.func = func
+        self.tag = tag
+        self.method = method
+        self.service = service
+        self.endpoint = endpoint
+
+    def __reduce__(self):
+        return (TaggedCall, (self.func, self.tag, self.method, self.service, self.endpoint))
+
+    def __call__(self, *args, **kwargs):
+        tracer = oneagent.get_sdk().trace_incoming_remote_call(
+            self.method, self.service, self.endpoint, _PROTOCOL_NAME, byte_tag=self.tag)
+        with tracer:
+            return self.func(*args, **kwargs)
+
+def tag_call(func, service_name=DEFAULT_SERVICE_NAME, service_endpoint=None, sdk=None):
+    '''Traces an outgoing remote call to :code:`func` on the calling thread
+    and returns a :class:`TaggedCall` for :code:`func` with its tag, to be
+    submitted to a process pool instead of :code:`func`. All calls of the
+    returned object are linked to the same outgoing remote call, e.g., those
+    of a :meth:`multiprocessing.pool.Pool.map`.
+
+    If the outgoing remote call is not traced (e.g., because the agent is
+    inactive), :code:`func` is returned unchanged.
+
+    :param func: The function to call in the worker processes. It must be
+        picklable.
+    :param str service_name: The service name of the remote calls.
+    :param str service_endpoint: The service endpoint of the remote calls.
+        Defaults to :code:`service_name`.
+    :param oneagent.sdk.SDK sdk: The SDK to use for the outgoing remote call.
+        Defaults to the one returned by :func:`oneagent.get_sdk`.
+    :rtype: TaggedCall
+    '''
+    sdk = sdk or oneagent.get_sdk()
+    method = _method_name(func)
+    service_endpoint = service_endpoint or service_name
+    with sdk.trace_outgoing_remote_call(
+            method, service_name, service_endpoint, _CHANNEL, _PROTOCOL_NAME) as tracer:
+        if not tracer:
+            return func
+        tag = tracer.outgoing_dynatrace_byte_tag
+    if not tag:
+        return func
+    return TaggedCall(func, tag, method, service_name, service_endpoint)
+
+class TaggingExecutor(Executor):
+    '''A :class:`concurrent.futures.Executor` that submits calls to another
+    executor (usually a :class:`concurrent.futures.ProcessPoolExecutor`)
+    as :class:`TaggedCall` objects (see :func:`tag_call`).
+
+    :meth:`submit` traces one outgoing remote call per call, :meth:`map` one
+    for all calls.
+
+    :param concurrent.futures.Executor executor: The executor that runs the
+        calls.
+    :param str service_name: See :func:`tag_call`.
+    :param str service_endpoint: See :func:`tag_call`.
+    :param oneagent.sdk.SDK sdk: See :func:`tag_call`.
+    '''
+
+    def __init__(self, executor, service_name=DEFAULT_SERVICE_NAME, service_endpoint=None,
+                 sdk=None):
+        self.executor = executor
+        self.service_name = service_name
+        self.service_endpoint = service_endpoint
+        self.sdk = sdk
+
+    def _tag_call(self, func):
+        return tag_call(func, self.service_name, self.service_endpoint, self.sdk)
+
+    def submit(self, fn, *args, **kwargs): #pylint:disable=arguments-differ
+        return self.executor.submit(self._tag_call(fn), *args, **kwargs)
+
+    def map(self, fn, *iterables, **kwargs): #pylint:disable=arguments-differ
+        return self.executor.map(self._tag_call(fn), *iterables, **kwargs)
+
+    def shutdown(self, wait=True, **kwargs): #pylint:disable=arguments-differ
+        self.executor.shutdown(wait, **kwargs)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''A :class:`queue.Queue` that links the processing of its items to the
+tracers that were active where they were put, for producer/consumer
+pipelines within a process.
+
+Producers put items as usual, consumers process each item in a
+:code:`with`-block::
+
+    from oneagent.sdk.queues import LinkingQueue
+
+    pipeline = LinkingQueue()
+
+    # Producer
+    pipeline.put(item)
+
+    # Consumer
+    with pipeline.get() as item:
+        process(item)
+
+.. versionadded:: 1.6.0
+'''
+
+import oneagent
+from oneagent._impl.six.moves import queue #pylint:disable=import-error
+
+class LinkedItem(object):
+    '''An item of a :class:`LinkingQueue` together with its in-process link.
+
+    Use it as a context manager: Entering it starts an
+    :class:`oneagent.sdk.tracers.InProcessLinkTracer` for the link (unless
+    the link is empty) and returns the item, leaving it ends the tracer.
+
+    .. attribute:: item
+
+        The item that was put into the queue.
+
+    .. attribute:: link
+
+        The in-process link (:class:`bytes`) that was created when the item
+        was put (empty if no tracer was active then). Items that were put by
+        one call to :meth:`LinkingQueue.put_many` share the same link object.
+    '''
+
+    __slots__ = ('item', 'link', '_sdk', '_tracer')
+
+    def __init__(self, sdk, link, item):
+        self.item = item
+        self.link = link
+        self._sdk = sdk
+        self._tracer = None
+
+    def __enter__(self):
+        if self.link:
+            tracer = self._sdk.trace_in_process_link(self.link)
+            tracer.start()
+            self._tracer = tracer
+        return self.item
+
+    def __exit__(self, e_ty, e_val, e_tb):
+        tracer, self._tracer = self._tracer, None
+        if tracer is not None:
+            tracer.__exit__(e_ty, e_val, e_tb)
+
+class LinkingQueue(queue.Queue):
+    '''A :class:`queue.Queue` that stores an in-process link (see
+    :meth:`oneagent.sdk.SDK.create_in_process_link`) with each item, and
+    returns :class:`LinkedItem` objects from :meth:`get` (and
+    :meth:`get_nowait`).
+
+    :param int maxsize: See :class:`queue.Queue`.
+    :param oneagent.sdk.SDK sdk: The SDK to use. Defaults to the one returned
+        by :func:`oneagent.get_sdk` at the time of each put.
+    '''
+
+    def __init__(self, maxsize=0, sdk=None):
+        queue.Queue.__init__(self, maxsize)
+        self.sdk = sdk
+
+    def _create_link(self):
+        sdk = self.sdk or oneagent.get_sdk()
+        if sdk._unsampled.active(): #pylint:disable=protected-access
+            return sdk, b''
+        return sdk, sdk.create_in_process_link()
+
+    def put(self, item, block=True, timeout=None):
+        '''Puts :code:`item` into the queue together with a link to the
+        tracer that is active on the calling thread. See
+        :meth:`queue.Queue.put` for the parameters.'''
+        sdk, link = self._create_link()
+        queue.Queue.put(self, LinkedItem(sdk, link, item), block, timeout)
+
+    def put_many(self, items, block=True, timeout=None):
+        '''Puts all :code:`items` into the queue, like calling :meth:`put`
+        for each of them, but creates only one link for all of them. The
+        :code:`block` and :code:`timeout` parameters apply to each item.'''
+        sdk, link = self._create_link()
+        for item in items:
+            queue.Queue.put(self, LinkedItem(sdk, link, item), block, timeout)
+
+    def get(self, block=True, timeout=None):
+        '''Removes and returns the next :class:`LinkedItem` from the queue.
+        See :meth:`queue.Queue.get` for the parameters.
+
+        :rtype: LinkedItem
+        '''
+        return queue.Queue.get(self, block, timeout)
+
+    def get_many(self, max_items, block=True, timeout=None):
+        '''Removes and returns up to :code:`max_items` items from the queue
+        as a list of :class:`LinkedItem`. Only waits (as specified by
+        :code:`block` and :code:`timeout`) for the first item, further items
+        are only returned if they are already available.
+
+        :param int max_items: The maximum number of items to return, at least 1.
+        :rtype: list[LinkedItem]
+        '''
+        if max_items < 1:
+            raise ValueError('max_items must be at least 1, got {!r}'.format(max_items))
+        result = [queue.Queue.get(self, block, timeout)]
+        with self.not_full:
+            while len(result) < max_items and self._qsize():
+                result.append(self._get())
+            if len(result) > 1:
+                self.not_full.notify(len(result) - 1)
+        return result
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Head-based samplers that decide which incoming requests are traced.
+
+Install a sampler with :meth:`oneagent.sdk.SDK.set_sampler`. The sampler is
+asked before an incoming web request, remote call or message process tracer
+is created. If it rejects the request, the SDK returns a falsy tracer without
+calling into the native SDK at all, and while that tracer is started, all
+other tracers created in the same context are falsy, too. On Python 3.7+, the
+context is that of :mod:`contextvars`, i.e., the current thread or asyncio task
+(including tasks created while the tracer is started), otherwise the current
+thread.
+
+Samplers must be thread-safe. To write your own sampler, derive from
+:class:`Sampler` and implement :meth:`Sampler.should_sample`.
+
+.. versionadded:: 1.6.0
+'''
+
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+
+try:
+    import contextvars
+except ImportError: # Python < 3.7
+    contextvars = None
+
+from oneagent._impl.native.sdknulliface import SDKNullInterface
+
+try:
+    _monotonic = time.monotonic
+except AttributeError: # Python 2
+    _monotonic = time.time
+
+SamplingCounts = namedtuple('SamplingCounts', 'sampled dropped')
+SamplingCounts.__doc__ = '''The number of incoming requests that were traced
+(:code:`sampled`) and not traced (:code:`dropped`). See
+:attr:`oneagent.sdk.SDK.sampling_counts`.'''
+
+class Sampler(object):
+    '''Base class for samplers.'''
+
+    def should_sample(self, service, has_tag):
+        '''Returns whether the incoming request should be traced.
+
+        :param service: A hashable value identifying the service the request
+            is for: The :code:`name` of a remote call, or the
+            :attr:`~oneagent.common.WebapplicationInfoHandle.service_key` of
+            the web application info of a web request or the
+            :attr:`~oneagent.common.MessagingSystemInfoHandle.service_key` of
+            the messaging system info of a message. These stay the same for
+            all info objects created with the same arguments.
+        :param bool has_tag: Whether the request has an incoming Dynatrace
+            tag, i.e., whether it is part of a path that is already traced.
+        :rtype: bool
+        '''
+        raise NotImplementedError('Must implement should_sample in derived class')
+
+    def _after_fork_in_child(self):
+        '''Called in a forked child process, to recreate locks etc.'''
+
+class ProbabilitySampler(Sampler):
+    '''Traces each request with the given probability.
+
+    :param float probability: The probability to trace a request, between 0
+        (trace nothing) and 1 (trace everything).
+    '''
+
+    def __init__(self, probability):
+        if not 0 <= probability <= 1:
+            raise ValueError('probability must be between 0 and 1, got {!r}'.format(probability))
+        self.probability = probability
+        self._random = random.random
+
+    def should_sample(self, service, has_tag):
+        return self._random() < self.probability
+
+class RateLimitingSampler(Sampler):
+    '''Traces at most :code:`rate` requests per second and service, using a
+    token bucket per service.
+
+    :param float rate: The number of requests per second that are traced per
+        service in the long run.
+    :param float burst: The number of requests that can be traced at once
+        after a quiet period. Defaults to :code:`max(rate, 1)`.
+    :param int max_services: The maximum number of services for which a
+        bucket is kept. Buckets that were idle long enough to be full again
+        are dropped first (which makes no difference), beyond that the least
+        recently used ones (whose services start with a full bucket again).
+    '''
+
+    def __init__(self, rate, burst=None, max_services=1024):
+        if not rate > 0:
+            raise ValueError('rate must be positive, got {!r}'.format(rate))
+        if max_services < 1:
+            raise ValueError('max_services must be at least 1, got {!r}'.format(max_services))
+        self.rate = float(rate)
+        self.burst = float(max(rate, 1) if burst is None else burst)
+        self.max_services = max_services
+        # service -> [tokens, last update time], least recently used first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        buckets = self._buckets
+        refill_time = self.burst / self.rate
+        while buckets:
+            service, bucket = next(iter(buckets.items()))
+            if len(buckets) < self.max_services and now - bucket[1] < refill_time:
+                break
+            del buckets[service]
+
+    def should_sample(self, service, has_tag):
+        now = _monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(service, None)
+            if bucket is None:
+                self._evict(now)
+                bucket = [self.burst, now]
+            self._buckets[service] = bucket # Most recently used
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - 1
+            return True
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+
+class IncomingTagSampler(Sampler):
+    '''Traces all requests with an incoming tag, so that paths that are
+    already traced by the caller are never cut off, and lets another sampler
+    decide for all other requests.
+
+    :param Sampler delegate: The sampler for requests without incoming tag.
+    '''
+
+    def __init__(self, delegate):
+        self.delegate = delegate
+
+    def should_sample(self, service, has_tag):
+        return has_tag or self.delegate.should_sample(service, has_tag)
+
+    def _after_fork_in_child(self):
+        after_fork = getattr(self.delegate, '_after_fork_in_child', None)
+        if after_fork is not None:
+            after_fork()
+
+class _UnsampledHandle(object):
+    '''Falsy tracer handle of an unsampled request.'''
+
+    __slots__ = ('started', '__weakref__')
+
+    def __init__(self):
+        self.started = False
+
+    def __bool__(self):
+        return False
+
+    __nonzero__ = __bool__
+
+def _is_started(node):
+    handle = node[0]()
+    return handle is not None and handle.started
+
+def _skip_ended(node):
+    while node is not None and not _is_started(node):
+        node = node[1]
+    return node
+
+class UnsampledState(object):
+    '''Tracks the started tracers of unsampled requests, per context (see the
+    module documentation).
+
+    The state of a context is a linked list of :code:`(weak reference to
+    handle, outer node)` nodes, innermost first. Tracing is suppressed while
+    any of the handles is started. Because the handles are only referenced
+    weakly, and ending a tracer (in any context) clears its handle's
+    :code:`started` flag, a tracer that is ended in another context, or that
+    is dropped without being ended, does not suppress tracing any longer.'''
+
+    def __init__(self):
+        if contextvars is not None:
+            var = contextvars.ContextVar('oneagent.sdk.unsampled', default=None)
+            self._get = var.get
+            self._set = var.set
+        else:
+            tls = threading.local()
+            self._get = lambda: getattr(tls, 'node', None)
+            self._set = lambda node: setattr(tls, 'node', node)
+
+    def active(self):
+        '''Returns whether the tracer of an unsampled request is started in
+        the current context.'''
+        return _skip_ended(self._get()) is not None
+
+    def push(self, handle):
+        self._set((weakref.ref(handle), _skip_ended(self._get())))
+
+    def pop(self, handle):
+        node = self._get()
+        if node is not None and node[0]() is handle:
+            self._set(_skip_ended(node[1]))
+
+class UnsampledInterface(SDKNullInterface): #pylint:disable=too-many-public-methods
+    '''Null interface for the tracers of unsampled requests. While such a
+    tracer is started, tracing in its context is suppressed (see
+    :class:`UnsampledState`).'''
+
+    def __init__(self, state):
+        SDKNullInterface.__init__(self)
+        self._state = state
+
+    @staticmethod
+    def new_handle():
+        return _UnsampledHandle()
+
+    def tracer_start(self, tracer_h):
+        if not tracer_h.started:
+            tracer_h.started = True
+            self._state.push(tracer_h)
+
+    def tracer_end(self, tracer_h):
+        if tracer_h.started:
+            tracer_h.started = False
+            self._state.pop(tracer_h)
@@ -19,9 +19,24 @@ private though).
 
 Use the factory functions from :class:`oneagent.sdk.SDK` to create tracers.'''
 
-from oneagent._impl.util import error_from_exc as _error_from_exc
+import sys
+import threading
+
+from oneagent._impl.util import error_from_exc as _error_from_exc, make_null_object
+from oneagent._impl.native.sdknulliface import SDKNullInterface
 from oneagent._impl import six
 
+class _LinkCache(threading.local):
+    '''The in-process link for the active tracer of a thread, see
+    :meth:`oneagent.sdk.SDK.create_in_process_link`.'''
+
+    def __init__(self): #pylint:disable=super-init-not-called
+        # (native SDK, link) or None. Reset whenever a tracer is started or
+        # ended on the thread, i.e., when the active tracer may change.
+        self.link = None
+
+_link_cache = _LinkCache()
+
 class OutgoingTaggable(object):
     '''Mixin base class for tracers that support having other paths linked to
     them.
@@ -54,6 +69,78 @@ class OutgoingTaggable(object):
         '''
         return self.nsdk.tracer_get_outgoing_tag(self.handle, True)
 
+class PreparedTracerFactory(object):
+    '''Callable that creates tracers of one type for a fixed set of arguments.
+
+    All arguments are converted to their native representation once, when the
+    factory is prepared, so that calling the factory only costs a single native
+    call. Use the :code:`oneagent.sdk.SDK.prepare_*` methods (e.g.,
+    :meth:`oneagent.sdk.SDK.prepare_custom_service`) to create instances.
+
+    Calling the factory returns a new, unstarted tracer, just like the
+    corresponding :code:`oneagent.sdk.SDK.trace_*` method would.
+
+    .. note:: A factory is bound to the native SDK that was loaded when it was
+        prepared. Prepare factories only after calling
+        :func:`oneagent.initialize` and don't use them after
+        :func:`oneagent.shutdown`.
+
+    .. versionadded:: 1.6.0
+    '''
+
+    __slots__ = ('_nsdk', '_create', '_tracer_type', '_setup', '_unsampled', '_throttling')
+
+    #pylint:disable=too-many-arguments
+    def __init__(self, nsdk, create, tracer_type, setup=None, unsampled=None,
+                 throttling=None):
+        self._nsdk = nsdk
+        self._create = create
+        self._tracer_type = tracer_type
+        self._setup = setup
+        self._unsampled = unsampled
+        self._throttling = throttling
+
+    def __call__(self):
+        unsampled = self._unsampled
+        throttling = self._throttling
+        if ((unsampled is not None and unsampled.active())
+                or (throttling is not None and self._tracer_type in throttling.types)):
+            return _NULL_TRACERS[self._tracer_type]
+        tracer = _new_tracer(self._tracer_type, self._nsdk, self._create())
+        if self._setup is not None and tracer:
+            self._setup(tracer)
+        return tracer
+
+class PreparedIncomingTracerFactory(PreparedTracerFactory):
+    '''A :class:`PreparedTracerFactory` for tracers that can be linked to an
+    incoming tag.
+
+    .. method:: __call__(str_tag=None, byte_tag=None)
+
+        Creates a new tracer. For the parameters, see :ref:`tagging`.
+
+    .. versionadded:: 1.6.0
+    '''
+
+    __slots__ = ('_applytag', '_sample')
+
+    #pylint:disable=too-many-arguments
+    def __init__(self, nsdk, create, tracer_type, applytag, setup=None, unsampled=None,
+                 sample=None):
+        PreparedTracerFactory.__init__(self, nsdk, create, tracer_type, setup, unsampled)
+        self._applytag = applytag
+        self._sample = sample
+
+    def __call__(self, str_tag=None, byte_tag=None): #pylint:disable=arguments-differ
+        if self._sample is not None:
+            tracer = self._sample(str_tag, byte_tag)
+            if tracer is not None:
+                return tracer
+        tracer = PreparedTracerFactory.__call__(self)
+        if tracer:
+            self._applytag(tracer, str_tag, byte_tag)
+        return tracer
+
 class Tracer(object):
     '''Base class for tracing of operations.
 
@@ -63,7 +150,9 @@ class Tracer(object):
     If a tracer object evaluates to :data:`False` (i.e., is falsy), tracing has
     been rejected for some reason (e.g., because the agent is currently or
     permanently inactive). You may then skip adding more information to the
-    tracer, which might speed up your application.
+    tracer, which might speed up your application. Falsy tracers returned by
+    the :class:`oneagent.sdk.SDK` factory methods are shared, immutable
+    instances (one per tracer type) that don't allocate anything when used.
 
     .. _tracer-states:
 
@@ -100,6 +189,11 @@ class Tracer(object):
     This will start the tracer upon entering the :code:`with`-block and end it
     upon leaving it. Additionally, if an exception leaves the block,
     :meth:`.mark_failed_exc` will be called on the tracer.
+
+    On Python 3.5+, tracers can also be used in :code:`async with` blocks,
+    with the same effect. Use :code:`async with` for tracers that stay started
+    across :code:`await` expressions, so that the task factory of
+    :mod:`oneagent.sdk.aio` knows about them.
     '''
 
     def __init__(self, nsdk, handle):
@@ -116,6 +210,7 @@ class Tracer(object):
         :code:`with`-block) instead of manually calling this method.
         '''
         self.nsdk.tracer_start(self.handle)
+        _link_cache.link = None
 
     def end(self):
         '''Ends the tracer.
@@ -131,6 +226,7 @@ class Tracer(object):
         if self.handle is not None:
             self.nsdk.tracer_end(self.handle)
             self.handle = None
+            _link_cache.link = None
 
     def mark_failed(self, clsname, msg):
         '''Marks the tracer as failed with the given exception class name
@@ -205,6 +301,11 @@ class Tracer(object):
 
     __nonzero__ = __bool__
 
+if sys.version_info >= (3, 5):
+    from oneagent.sdk import _tracers_py3 as _py3
+    Tracer.__aenter__ = _py3.tracer_aenter
+    Tracer.__aexit__ = _py3.tracer_aexit
+
 class DatabaseRequestTracer(Tracer):
     '''Traces a database request. See
         :meth:`oneagent.sdk.SDK.trace_sql_database_request`.'''
@@ -237,27 +338,35 @@ class OutgoingRemoteCallTracer(Tracer, OutgoingTaggable):
     '''Traces an outgoing remote call. See
     :meth:`oneagent.sdk.SDK.trace_outgoing_remote_call`.'''
 
-def _make_add_kvs_fn(fnname):
+def _make_add_kvs_fn(fnname, headers=False):
+    '''If :code:`headers` is true, the functions apply the header filter of the
+    tracer (see :meth:`oneagent.sdk.SDK.set_header_filter`).'''
     add_kv_name = fnname
     add_kvs_name = add_kv_name + 's'
 
     def add_kvs_fn(self, names_or_dict, values=None, count=None):
         add_kvs_impl = getattr(self.nsdk, add_kvs_name)
         if values is None:
-            add_kvs_impl(
-                self.handle,
-                six.iterkeys(names_or_dict),
-                six.itervalues(names_or_dict),
-                len(names_or_dict))
+            names = six.iterkeys(names_or_dict)
+            values = six.itervalues(names_or_dict)
+            count = len(names_or_dict)
         else:
-            add_kvs_impl(
-                self.handle,
-                names_or_dict,
-                values,
-                len(names_or_dict) if count is None else count)
+            names = names_or_dict
+            if count is None:
+                count = len(names_or_dict)
+        header_filter = self._header_filter if headers else None
+        if header_filter is not None:
+            names, values, count = header_filter.apply(names, values, count)
+        add_kvs_impl(self.handle, names, values, count)
 
     def add_kv_fn(self, name, value):
         add_kv_impl = getattr(self.nsdk, add_kv_name)
+        header_filter = self._header_filter if headers else None
+        if header_filter is not None:
+            names, values, count = header_filter.apply((name,), (value,), 1)
+            if not count:
+                return
+            name, value = names[0], values[0]
         add_kv_impl(self.handle, name, value)
 
     return add_kvs_fn, add_kv_fn
@@ -311,12 +420,18 @@ class IncomingWebRequestTracer(Tracer):
         provide the name and corresponding values for each, or, if possible for
         that particular header, set the value to an appropriately concatenated
         string.
+
+        The header filter of the SDK, if any, is applied (see
+        :meth:`oneagent.sdk.SDK.set_header_filter`).
     '''
 
+    # Set by the SDK if it has a header filter.
+    _header_filter = None
+
     add_parameters, add_parameter = _make_add_kvs_fn('incomingwebrequesttracer_add_parameter')
 
     add_response_headers, add_response_header = _make_add_kvs_fn(
-        'incomingwebrequesttracer_add_response_header')
+        'incomingwebrequesttracer_add_response_header', headers=True)
 
     def set_status_code(self, code):
         '''Sets the HTTP status code for the response to the traced incoming
@@ -348,11 +463,17 @@ class OutgoingWebRequestTracer(Tracer, OutgoingTaggable):
         that particular header, set the value to an appropriately concatenated
         string.
 
+        The header filter of the SDK, if any, is applied (see
+        :meth:`oneagent.sdk.SDK.set_header_filter`).
+
         .. versionadded:: 1.1.0
     '''
 
+    # Set by the SDK if it has a header filter.
+    _header_filter = None
+
     add_response_headers, add_response_header = \
-        _make_add_kvs_fn('outgoingwebrequesttracer_add_response_header')
+        _make_add_kvs_fn('outgoingwebrequesttracer_add_response_header', headers=True)
 
     def set_status_code(self, code):
         '''Sets the HTTP status code for the response of the traced outgoing
@@ -445,3 +566,26 @@ class CustomServiceTracer(Tracer):
 
         .. versionadded:: 1.2.0
     '''
+
+_NULL_NSDK = SDKNullInterface()
+
+_NULL_TRACERS = dict(
+    (tracer_type, make_null_object(tracer_type, _NULL_NSDK, None)) for tracer_type in (
+        DatabaseRequestTracer,
+        IncomingRemoteCallTracer,
+        OutgoingRemoteCallTracer,
+        IncomingWebRequestTracer,
+        OutgoingWebRequestTracer,
+        InProcessLinkTracer,
+        OutgoingMessageTracer,
+        IncomingMessageReceiveTracer,
+        IncomingMessageProcessTracer,
+        CustomServiceTracer))
+
+def _new_tracer(tracer_type, nsdk, handle):
+    '''Returns a new :code:`tracer_type` for :code:`handle`, or the shared
+    falsy tracer of that type if :code:`handle` is falsy (i.e., tracing was
+    rejected), so that rejected tracers don't allocate anything.'''
+    if handle:
+        return tracer_type(nsdk, handle)
+    return _NULL_TRACERS[tracer_type]
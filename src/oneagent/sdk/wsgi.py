@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''WSGI (:pep:`3333`) middleware that traces incoming web requests.
+
+Wrap your WSGI application to trace each request it handles, e.g.::
+
+    from oneagent.sdk.wsgi import TracingMiddleware
+
+    application = TracingMiddleware(application, application_id='MyWebApp')
+
+.. versionadded:: 1.6.0
+'''
+
+from wsgiref.util import request_uri
+
+from oneagent.common import DYNATRACE_HTTP_HEADER_NAME
+from oneagent._impl import six
+from oneagent.sdk._middleware import WebAppMiddleware
+
+_TAG_KEY = 'HTTP_' + DYNATRACE_HTTP_HEADER_NAME.upper().replace('-', '_')
+
+# Maps environ keys to header names ('' for keys that are no headers), so that
+# the name of each header is only computed once.
+_HEADER_NAMES = {'CONTENT_TYPE': 'Content-Type', 'CONTENT_LENGTH': 'Content-Length'}
+_MAX_HEADER_NAMES = 1024
+
+def environ_headers(environ):
+    '''Returns the names, values and count of the HTTP request headers in the
+    WSGI :code:`environ`, in the form accepted by the :code:`headers`
+    parameter of :meth:`oneagent.sdk.SDK.trace_incoming_web_request`.
+
+    The header names are reconstructed from the :code:`HTTP_*` keys (e.g.,
+    :code:`HTTP_X_REQUEST_ID` becomes :code:`X-Request-Id`).'''
+    names = []
+    values = []
+    header_names = _HEADER_NAMES
+    for key, value in six.iteritems(environ):
+        name = header_names.get(key)
+        if name is None:
+            name = key[5:].replace('_', '-').title() if key.startswith('HTTP_') else ''
+            if len(header_names) < _MAX_HEADER_NAMES:
+                header_names[key] = name
+        if name:
+            names.append(name)
+            values.append(value)
+    return names, values, len(names)
+
+class _LazyEnvironHeaders(object):
+    '''The :code:`(names, values, count)` sequence returned by
+    :func:`environ_headers`, computed on first access, so that the environ is
+    not walked for requests that are not traced.'''
+
+    __slots__ = ('_environ', '_headers')
+
+    def __init__(self, environ):
+        self._environ = environ
+        self._headers = None
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        if self._headers is None:
+            self._headers = environ_headers(self._environ)
+        return self._headers[index]
+
+class _TracedRequest(object):
+    '''Passes the response of the last :code:`start_response` call to the
+    tracer when ending it. An application may call :code:`start_response`
+    again with :code:`exc_info` after an error, which replaces the response.'''
+
+    __slots__ = ('tracer', '_start_response', '_response')
+
+    def __init__(self, tracer, start_response):
+        self.tracer = tracer
+        self._start_response = start_response
+        self._response = None
+
+    def start_response(self, status, headers, exc_info=None):
+        if self.tracer:
+            # Copied, because servers may add headers to the list later.
+            self._response = (status, tuple(headers))
+        if exc_info is None:
+            return self._start_response(status, headers)
+        return self._start_response(status, headers, exc_info)
+
+    def end(self):
+        tracer = self.tracer
+        response, self._response = self._response, None
+        try:
+            if response is not None:
+                status, headers = response
+                tracer.set_status_code(int(status[:3]))
+                tracer.add_response_headers(
+                    (name for name, _ in headers), (value for _, value in headers), len(headers))
+        finally:
+            tracer.end()
+
+class _TracedResponse(object):
+    '''Wraps the response iterable of the application and ends the tracer
+    when the server closes it.'''
+
+    __slots__ = ('_result', '_request')
+
+    def __init__(self, result, request):
+        self._result = result
+        self._request = request
+
+    def __iter__(self):
+        try:
+            for chunk in self._result:
+                yield chunk
+        except Exception: #pylint:disable=broad-except
+            self._request.tracer.mark_failed_exc()
+            raise
+
+    def close(self):
+        try:
+            close = getattr(self._result, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._request.end()
+
+def _end_on_close(result, request):
+    '''Makes closing :code:`result` end the request without wrapping it, so
+    that the server still recognizes it as a :code:`wsgi.file_wrapper`
+    instance (and can e.g. use sendfile). Returns False if that is not
+    possible.'''
+    close = getattr(result, 'close', None)
+    def traced_close():
+        try:
+            if close is not None:
+                close()
+        finally:
+            request.end()
+    try:
+        result.close = traced_close
+    except AttributeError: # E.g., __slots__ without close
+        return False
+    return True
+
+class TracingMiddleware(WebAppMiddleware):
+    '''Traces each request handled by the WSGI application :code:`app` with
+    an :class:`oneagent.sdk.tracers.IncomingWebRequestTracer`.
+
+    The request headers are read directly from the :code:`HTTP_*` keys of the
+    environ (subject to the header filter of the SDK, see
+    :meth:`oneagent.sdk.SDK.set_header_filter`), and the
+    :data:`oneagent.common.DYNATRACE_HTTP_HEADER_NAME` header is used as the
+    incoming string tag. The headers are only read if the request is traced.
+    The status code and response headers are taken from the last call to
+    :code:`start_response`.
+
+    The tracer is started before calling the application and ended when the
+    server closes the response iterable, so that the time for streaming the
+    response is included. Responses that are instances of the server's
+    :code:`wsgi.file_wrapper` are returned unwrapped (so that the server can
+    still send the file efficiently), with their :code:`close` method replaced
+    by one that also ends the tracer. The server must iterate and close the response on
+    the thread that called the middleware (as almost all WSGI servers do),
+    because tracers are thread-affine.
+
+    The web application info is created on the first request and reused for
+    all further requests (it is created again if the SDK is initialized or
+    shut down in between), until :meth:`close` is called.
+
+    :param app: The WSGI application to trace.
+    :param str application_id: The application ID for the web application
+        info (see :meth:`oneagent.sdk.SDK.create_web_application_info`).
+        Defaults to the qualified name of :code:`app` (or its type).
+    :param str virtual_host: The virtual host for the web application info.
+        Defaults to the :code:`SERVER_NAME` of the first request.
+    :param str context_root: The context root for the web application info.
+        Defaults to the :code:`SCRIPT_NAME` of the first request, or
+        :code:`'/'`.
+    :param oneagent.sdk.SDK sdk: The SDK to use. Defaults to the one returned
+        by :func:`oneagent.get_sdk` at the time of each request.
+
+    .. versionadded:: 1.6.0
+    '''
+
+    def __call__(self, environ, start_response):
+        sdk = self._get_sdk()
+        tracer = sdk.trace_incoming_web_request(
+            self._get_webapp_info(
+                sdk, environ.get('SERVER_NAME', ''), environ.get('SCRIPT_NAME')),
+            request_uri(environ),
+            environ.get('REQUEST_METHOD', 'GET'),
+            headers=_LazyEnvironHeaders(environ),
+            remote_address=environ.get('REMOTE_ADDR'),
+            str_tag=environ.get(_TAG_KEY))
+        request = _TracedRequest(tracer, start_response)
+
+        tracer.start()
+        try:
+            result = self.app(environ, request.start_response)
+        except:
+            try:
+                tracer.mark_failed_exc()
+            finally:
+                request.end()
+            raise
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if (isinstance(file_wrapper, type) and isinstance(result, file_wrapper)
+                and _end_on_close(result, request)):
+            return result
+        return _TracedResponse(result, request)
@@ -21,7 +21,7 @@ from __future__ import print_function
 
 import sys
 import warnings
-from functools import wraps
+from functools import wraps, partial
 import threading
 import base64
 import struct
@@ -91,12 +91,11 @@ class TracerHandle(_Handle, ThreadBoundObject):
     has_out_tag = False
     is_entrypoint = False
 
-    custom_attribs = []
-
     def __init__(self, _nsdk, *vals):
         assert isinstance(_nsdk, SDKMockInterface)
         _Handle.__init__(self, *vals)
         ThreadBoundObject.__init__(self)
+        self.custom_attribs = []
         self.path = None
         self.state = self.CREATED
         self.err_info = None
@@ -177,7 +176,7 @@ class InRemoteCallHandle(RemoteCallHandleBase):
 class OutRemoteCallHandle(RemoteCallHandleBase):
     has_out_tag = True
 class InProcessLinkTracerHandle(TracerHandle):
-    pass
+    is_entrypoint = True
 
 class CustomServiceTracerHandle(TracerHandle):
     pass
@@ -621,7 +620,7 @@ class SDKMockInterface(object): #pylint:disable=too-many-public-methods
     def tracer_end(self, tracer_h):
         _typecheck(tracer_h, TracerHandle)
         path = self.get_path()
-        if not path:
+        if not path or tracer_h.state == TracerHandle.CREATED:
             assert tracer_h.state in (TracerHandle.ENDED, TracerHandle.CREATED)
             tracer_h.close()
             return
@@ -678,19 +677,22 @@ class SDKMockInterface(object): #pylint:disable=too-many-public-methods
         _typecheck(count, int)
         assert count > 0, 'Invalid count'
         for _, key, val in zip(range(count), keys, values):
-            self.customrequestattribute_add_integer(self, key, val)
+            self.customrequestattribute_add_integer(key, val)
 
     def customrequestattribute_add_floats(self, keys, values, count):
         _typecheck(count, int)
         assert count > 0, 'Invalid count'
         for _, key, val in zip(range(count), keys, values):
-            self.customrequestattribute_add_float(self, key, val)
+            self.customrequestattribute_add_float(key, val)
 
     def customrequestattribute_add_strings(self, keys, values, count):
         _typecheck(count, int)
         assert count > 0, 'Invalid count'
         for _, key, val in zip(range(count), keys, values):
-            self.customrequestattribute_add_string(self, key, val)
+            self.customrequestattribute_add_string(key, val)
+
+    def prepare_call(self, fn_name, *args):
+        return partial(getattr(self, fn_name), *args)
 
     def trace_in_process_link(self, link_bytes):
         assert link_bytes == b'inproc'
@@ -0,0 +1,86 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Coroutines for test_aio (needs Python 3.7+).'''
+
+import asyncio
+
+from oneagent.sdk import aio
+
+def run(coro_fn, *args):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro_fn(*args))
+    finally:
+        loop.close()
+
+async def failing_service(sdk):
+    async with sdk.trace_custom_service('fail', 'Svc') as tracer:
+        assert tracer
+        await asyncio.sleep(0)
+        raise RuntimeError('bla')
+
+async def short_steps(sdk, name):
+    for _ in range(2):
+        with sdk.trace_custom_service(name, 'Svc'):
+            pass
+        await asyncio.sleep(0)
+
+async def held_tracer(sdk, name):
+    async with sdk.trace_custom_service(name, 'Held'):
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+    with sdk.trace_custom_service(name, 'After'):
+        pass
+
+async def held_gather(sdk, name):
+    async with sdk.trace_custom_service(name, 'Held'):
+        await asyncio.gather(short_steps(sdk, name + '.0'), short_steps(sdk, name + '.1'))
+
+async def gather_linked(sdk, worker, count):
+    aio.install(sdk=sdk)
+    await asyncio.gather(*[worker(sdk, str(i)) for i in range(count)])
+
+async def install_twice(sdk):
+    loop = asyncio.get_running_loop()
+    created = []
+    def previous(loop, coro, **kwargs):
+        created.append(coro)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+    loop.set_task_factory(previous)
+    factory = aio.install(sdk=sdk)
+    assert aio.install(sdk=sdk) is factory
+    assert loop.get_task_factory() is factory
+    assert factory.task_factory is previous
+    await asyncio.ensure_future(asyncio.sleep(0, 42))
+    return created
+
+async def unsampled_request(sdk, started, release):
+    async with sdk.trace_incoming_remote_call('m', 'svc', 'ep') as tracer:
+        assert not tracer
+        started.set()
+        await release.wait()
+        assert not sdk.trace_custom_service('m', 'Nested')
+
+async def traced_while_unsampled(sdk):
+    started, release = asyncio.Event(), asyncio.Event()
+    task = asyncio.ensure_future(unsampled_request(sdk, started, release))
+    await started.wait()
+    # The unsampled request is held by another task, which doesn't affect this one.
+    with sdk.trace_custom_service('m', 'Other') as tracer:
+        traced = bool(tracer)
+    release.set()
+    await task
+    return traced
@@ -0,0 +1,89 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''ASGI applications and helpers for test_asgi (needs Python 3.5+ syntax).'''
+
+import asyncio
+
+def make_scope(**extra):
+    scope = {
+        'type': 'http',
+        'method': 'POST',
+        'scheme': 'http',
+        'root_path': '/app',
+        'path': '/app/some items',
+        'query_string': b'q=1',
+        'server': ('10.0.0.2', 8080),
+        'client': ('10.0.0.1', 12345),
+        'headers': [(b'host', b'example.com'), (b'x-request-id', b'42')]}
+    scope.update(extra)
+    return scope
+
+def run(app, scope, loop=None):
+    '''Runs a request on the ASGI :code:`app` and returns the sent messages.'''
+    own_loop = loop is None
+    if own_loop:
+        loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(request(app, scope))
+    finally:
+        if own_loop:
+            loop.close()
+
+async def request(app, scope):
+    sent = []
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    async def send(message):
+        sent.append(message)
+    await app(scope, receive, send)
+    return sent
+
+async def ok_app(scope, receive, send):
+    await receive()
+    await send({
+        'type': 'http.response.start',
+        'status': 201,
+        'headers': [(b'content-type', b'text/plain')]})
+    await asyncio.sleep(0)
+    await send({'type': 'http.response.body', 'body': b'ok'})
+
+def make_tracing_app(sdk):
+    '''Returns an ASGI app that traces a custom service around an
+    :code:`await` while handling the request.'''
+    async def tracing_app(scope, receive, send):
+        with sdk.trace_custom_service('handle', 'AsgiApp'):
+            await asyncio.sleep(0)
+        await ok_app(scope, receive, send)
+    return tracing_app
+
+async def failing_app(scope, receive, send):
+    await asyncio.sleep(0)
+    raise RuntimeError('app')
+
+async def passthrough_app(scope, receive, send):
+    await send({'type': scope['type'] + '.passed'})
+
+def run_overlapping(app, scope):
+    '''Runs two requests that are handled concurrently on the same event
+    loop.'''
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(overlapping(app, scope))
+    finally:
+        loop.close()
+
+async def overlapping(app, scope):
+    return await asyncio.gather(request(app, scope), request(app, scope))
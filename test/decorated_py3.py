@@ -0,0 +1,47 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Coroutine and generator functions for test_decorators (needs Python 3.5+
+syntax).'''
+
+import asyncio
+
+def make_coroutine_functions(sdk):
+    @sdk.traced_custom_service(name='AsyncService')
+    async def succeed(value):
+        await asyncio.sleep(0)
+        return value
+
+    @sdk.traced_custom_service(name='AsyncService')
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError('bla')
+
+    async def agen():
+        yield 1
+
+    return succeed, fail, agen
+
+def make_returning_generator(sdk):
+    @sdk.traced_custom_service(name='GenService')
+    def gen():
+        yield 1
+        return 'done'
+
+    def delegate():
+        result = yield from gen()
+        yield result
+
+    return delegate
@@ -0,0 +1,33 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Helper module for .test_init_public_sdk.test_startup_time_budget'''
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+def main():
+    start = timeit.default_timer()
+    import oneagent
+    oneagent.initialize()
+    elapsed = timeit.default_timer() - start
+    print('pkg_resources loaded:', 'pkg_resources' in sys.modules)
+    print('startup seconds:', elapsed)
+    oneagent.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import pytest
+
+import sdkmockiface
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7), reason='Needs contextvars')
+
+RTERR_QNAME = RuntimeError.__module__ + '.RuntimeError'
+
+def iter_nodes(node, parent=None):
+    yield parent, node
+    for _, child in node.children:
+        for item in iter_nodes(child, node):
+            yield item
+
+def custom_services(nsdk):
+    assert len(nsdk.finished_paths) == 1
+    return [
+        (parent, node) for parent, node in iter_nodes(nsdk.finished_paths[0])
+        if isinstance(node, sdkmockiface.CustomServiceTracerHandle)]
+
+def test_tracer_async_with(sdk):
+    from . import aio_tasks_py3
+
+    nsdk = get_nsdk(sdk)
+    with create_dummy_entrypoint(sdk):
+        with pytest.raises(RuntimeError):
+            aio_tasks_py3.run(aio_tasks_py3.failing_service, sdk)
+    (_, node), = custom_services(nsdk)
+    assert node.err_info == (RTERR_QNAME, 'bla')
+
+def test_aio_interleaved_tasks(sdk):
+    from . import aio_tasks_py3
+
+    nsdk = get_nsdk(sdk)
+    with create_dummy_entrypoint(sdk):
+        aio_tasks_py3.run(
+            aio_tasks_py3.gather_linked, sdk, aio_tasks_py3.short_steps, 3)
+    assert not nsdk.get_path().nodestack
+    nodes = custom_services(nsdk)
+    assert sorted(node.service_method for _, node in nodes) == ['0', '0', '1', '1', '2', '2']
+    # Each step runs in an in-process link tracer of its own, so the tasks
+    # are not nested into each other.
+    for parent, _ in nodes:
+        assert isinstance(parent, sdkmockiface.InProcessLinkTracerHandle)
+    assert len(set(id(parent) for parent, _ in nodes)) == 6
+
+def test_aio_held_tracers(sdk):
+    from . import aio_tasks_py3
+
+    nsdk = get_nsdk(sdk)
+    with create_dummy_entrypoint(sdk):
+        aio_tasks_py3.run(
+            aio_tasks_py3.gather_linked, sdk, aio_tasks_py3.held_tracer, 2)
+    assert not nsdk.get_path().nodestack
+    nodes = custom_services(nsdk)
+    # The first task keeps its thread while its tracer is started across
+    # awaits, the tracer that the second task starts meanwhile is discarded.
+    assert sorted((node.service_method, node.service_name) for _, node in nodes) == [
+        ('0', 'After'), ('0', 'Held'), ('1', 'After')]
+    for parent, node in nodes:
+        assert isinstance(parent, sdkmockiface.InProcessLinkTracerHandle)
+        # The steps of the second task are traced, but without tracers
+        for _, child in node.children:
+            assert isinstance(child, sdkmockiface.InProcessLinkTracerHandle)
+            assert not child.children
+
+def test_aio_held_tracer_subtasks(sdk):
+    from . import aio_tasks_py3
+
+    nsdk = get_nsdk(sdk)
+    with create_dummy_entrypoint(sdk):
+        aio_tasks_py3.run(
+            aio_tasks_py3.gather_linked, sdk, aio_tasks_py3.held_gather, 1)
+    assert not nsdk.get_path().nodestack
+    nodes = custom_services(nsdk)
+    assert sorted(node.service_method for _, node in nodes) == [
+        '0', '0.0', '0.0', '0.1', '0.1']
+    for parent, _ in nodes:
+        assert isinstance(parent, sdkmockiface.InProcessLinkTracerHandle)
+
+def test_aio_install(sdk):
+    from . import aio_tasks_py3
+
+    created = aio_tasks_py3.run(aio_tasks_py3.install_twice, sdk)
+    assert len(created) == 1
+    assert type(created[0]).__name__ == '_LinkedCoroutine'
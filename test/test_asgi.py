@@ -0,0 +1,161 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import pytest
+
+from oneagent.sdk import sampling
+
+import sdkmockiface
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 5), reason='Needs async def')
+
+RTERR_QNAME = RuntimeError.__module__ + '.RuntimeError'
+
+class SequenceSampler(sampling.Sampler):
+    def __init__(self, results):
+        self.results = list(results)
+
+    def should_sample(self, service, has_tag):
+        return self.results.pop(0)
+
+def test_asgi_request(sdk):
+    from oneagent.sdk.asgi import TracingMiddleware
+    from . import asgi_apps_py3
+
+    nsdk = get_nsdk(sdk)
+    traced = TracingMiddleware(asgi_apps_py3.ok_app, sdk=sdk)
+    assert traced.application_id.endswith('ok_app')
+    sent = asgi_apps_py3.run(traced, asgi_apps_py3.make_scope())
+    assert [msg['type'] for msg in sent] == ['http.response.start', 'http.response.body']
+    asgi_apps_py3.run(traced, asgi_apps_py3.make_scope(headers=[]))
+    traced.close()
+
+    assert len(nsdk.finished_paths) == 2
+    root = nsdk.finished_paths[0]
+    assert isinstance(root, sdkmockiface.InWebReqHandle)
+    assert root.vals[1:] == ('http://example.com/app/some%20items?q=1', 'POST')
+    assert root.vals[0].vals == ('10.0.0.2', traced.application_id, '/app')
+    # The web application info is reused.
+    assert nsdk.finished_paths[1].vals[0] is root.vals[0]
+    # Without a host header, the server address is used.
+    assert nsdk.finished_paths[1].vals[1] == 'http://10.0.0.2:8080/app/some%20items?q=1'
+    # Headers are passed as raw bytes.
+    assert root.req_hdrs == [(b'host', b'example.com'), (b'x-request-id', b'42')]
+    assert root.resp_hdrs == [(b'content-type', b'text/plain')]
+    assert root.resp_code == 201
+    assert root.remote_addr == '10.0.0.1'
+    assert root.err_info is None
+    assert not nsdk.get_path().nodestack
+
+def test_asgi_passthrough(sdk):
+    from oneagent.sdk.asgi import TracingMiddleware
+    from . import asgi_apps_py3
+
+    traced = TracingMiddleware(asgi_apps_py3.passthrough_app, sdk=sdk)
+    for scope_type in ('lifespan', 'websocket'):
+        sent = asgi_apps_py3.run(traced, {'type': scope_type})
+        assert sent == [{'type': scope_type + '.passed'}]
+    traced.close()
+    assert not get_nsdk(sdk).finished_paths
+
+def test_asgi_incoming_tag(sdk):
+    from oneagent.sdk.asgi import TracingMiddleware
+    from . import asgi_apps_py3
+
+    nsdk = get_nsdk(sdk)
+    traced = TracingMiddleware(asgi_apps_py3.ok_app, 'tagged', 'vhost', '/', sdk=sdk)
+    with create_dummy_entrypoint(sdk):
+        with sdk.trace_outgoing_web_request('http://example.com/', 'GET') as out:
+            tag = out.outgoing_dynatrace_string_tag
+            asgi_apps_py3.run(traced, asgi_apps_py3.make_scope(
+                headers=[(b'x-dynatrace', tag)]))
+    traced.close()
+    nsdk.process_finished_paths_tags()
+    _, out_node = nsdk.finished_paths[0].children[0]
+    _, in_node = out_node.children[-1]
+    assert isinstance(in_node, sdkmockiface.InWebReqHandle)
+    assert in_node.vals[0].vals == ('vhost', 'tagged', '/')
+    assert in_node.in_tag_as_id == id(out_node) and in_node.is_in_tag_resolved
+
+def test_asgi_error(sdk):
+    from oneagent.sdk.asgi import TracingMiddleware
+    from . import asgi_apps_py3
+
+    nsdk = get_nsdk(sdk)
+    traced = TracingMiddleware(asgi_apps_py3.failing_app, sdk=sdk)
+    with pytest.raises(RuntimeError):
+        asgi_apps_py3.run(traced, asgi_apps_py3.make_scope())
+    traced.close()
+    assert [path.err_info for path in nsdk.finished_paths] == [(RTERR_QNAME, 'app')]
+    assert not nsdk.get_path().nodestack
+
+def test_asgi_overlapping_requests(sdk):
+    from oneagent.sdk.asgi import TracingMiddleware
+    from . import asgi_apps_py3
+
+    nsdk = get_nsdk(sdk)
+    traced = TracingMiddleware(asgi_apps_py3.ok_app, sdk=sdk)
+    results = asgi_apps_py3.run_overlapping(traced, asgi_apps_py3.make_scope())
+    assert [len(sent) for sent in results] == [2, 2]
+    # The second request overlaps with the traced first one, so it is skipped.
+    assert len(nsdk.finished_paths) == 1
+    assert not nsdk.finished_paths[0].children
+    assert traced.skipped_count == 1
+    # Requests after the first one completed are traced again.
+    asgi_apps_py3.run(traced, asgi_apps_py3.make_scope())
+    assert len(nsdk.finished_paths) == 2
+
+    # An unsampled request doesn't own the thread.
+    sdk.set_sampler(SequenceSampler([False, True]))
+    asgi_apps_py3.run_overlapping(traced, asgi_apps_py3.make_scope())
+    assert len(nsdk.finished_paths) == 3
+    assert traced.skipped_count == 1
+    traced.close()
+
+def test_asgi_overlapping_request_suppressed(sdk):
+    from oneagent.sdk.asgi import TracingMiddleware
+    from . import asgi_apps_py3
+
+    nsdk = get_nsdk(sdk)
+    traced = TracingMiddleware(asgi_apps_py3.make_tracing_app(sdk), sdk=sdk)
+    results = asgi_apps_py3.run_overlapping(traced, asgi_apps_py3.make_scope())
+    assert [len(sent) for sent in results] == [2, 2]
+    assert traced.skipped_count == 1
+    # The custom service of the skipped request is not nested into the path
+    # of the traced one.
+    assert len(nsdk.finished_paths) == 1
+    assert len(nsdk.finished_paths[0].children) == 1
+    assert not nsdk.get_path().nodestack
+    assert not sdk._unsampled.active() #pylint:disable=protected-access
+    traced.close()
+
+def test_asgi_nested_middlewares(sdk):
+    from oneagent.sdk.asgi import TracingMiddleware
+    from . import asgi_apps_py3
+
+    nsdk = get_nsdk(sdk)
+    inner = TracingMiddleware(asgi_apps_py3.ok_app, sdk=sdk)
+    outer = TracingMiddleware(inner, sdk=sdk)
+    asgi_apps_py3.run(outer, asgi_apps_py3.make_scope())
+    # The request is traced once, and not counted as skipped.
+    assert len(nsdk.finished_paths) == 1
+    assert not nsdk.finished_paths[0].children
+    assert outer.skipped_count == inner.skipped_count == 0
+    outer.close()
+    inner.close()
@@ -0,0 +1,209 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import inspect
+import sys
+
+import pytest
+
+from oneagent import sdk as onesdk
+from oneagent._impl.native.sdknulliface import SDKNullInterface
+from oneagent.sdk import sampling
+
+import sdkmockiface
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+RTERR_QNAME = RuntimeError.__module__ + '.RuntimeError'
+
+def traced_children(sdk):
+    root = get_nsdk(sdk).finished_paths[-1]
+    return [child for _, child in root.children]
+
+class OrderService(object):
+    def __init__(self, sdk):
+        self.place = sdk.traced_custom_service()(self.place)
+
+    def place(self, order):
+        return order
+
+def test_traced_custom_service(sdk):
+    @sdk.traced_custom_service(name='Svc')
+    def succeed(value):
+        '''Docstring'''
+        return value
+
+    @sdk.traced_custom_service(method='m', name='Svc')
+    def fail():
+        raise RuntimeError('bla')
+
+    assert succeed.__name__ == 'succeed' and succeed.__doc__ == 'Docstring'
+    with create_dummy_entrypoint(sdk):
+        assert succeed(42) == 42
+        with pytest.raises(RuntimeError):
+            fail()
+        assert OrderService(sdk).place('o') == 'o'
+
+    paths = traced_children(sdk)
+    assert len(paths) == 3
+    assert isinstance(paths[0], sdkmockiface.CustomServiceTracerHandle)
+    assert (paths[0].service_method, paths[0].service_name) == ('succeed', 'Svc')
+    assert paths[0].err_info is None
+    assert (paths[1].service_method, paths[1].service_name) == ('m', 'Svc')
+    assert paths[1].err_info == (RTERR_QNAME, 'bla')
+    assert (paths[2].service_method, paths[2].service_name) == (
+        'place', __name__ + '.OrderService')
+
+def test_traced_generator(sdk):
+    @sdk.traced_custom_service(name='Svc')
+    def gen(count):
+        for i in range(count):
+            received = yield i
+            if received is not None:
+                yield received
+
+    @sdk.traced_custom_service(name='Svc')
+    def catching_gen():
+        try:
+            yield 1
+        except ValueError:
+            yield 'caught'
+        raise RuntimeError('bla')
+
+    assert inspect.isgeneratorfunction(gen)
+    with create_dummy_entrypoint(sdk) as entry:
+        items = gen(3)
+        assert not entry.handle.children # Not started before the first item
+        consumed = []
+        for item in items:
+            # The consumer isn't traced as part of the generator.
+            with sdk.trace_custom_service('consume', 'Consumer'):
+                consumed.append(item)
+        assert consumed == [0, 1, 2]
+        # One tracer for the first item, the following steps (including the
+        # return) are linked to it.
+        assert len(entry.handle.children) == 7
+
+        items = gen(3)
+        assert next(items) == 0
+        assert items.send('x') == 'x'
+        items.close() # Closing early is not a failure
+        assert len(entry.handle.children) == 9
+
+        items = catching_gen()
+        assert next(items) == 1
+        assert items.throw(ValueError('v')) == 'caught'
+        with pytest.raises(RuntimeError):
+            next(items)
+
+    paths = traced_children(sdk)
+    linked = sdkmockiface.InProcessLinkTracerHandle
+    assert [getattr(path, 'service_name', None) for path in paths[:7]] == [
+        'Svc', 'Consumer', None, 'Consumer', None, 'Consumer', None]
+    # gen(3) consumed, gen(3) closed early, catching_gen()
+    assert [isinstance(path, linked) for path in paths] == [
+        False, False, True, False, True, False, True, False, True, False, True, True]
+    assert all(not path.children for path in paths)
+    assert all(path.err_info is None for path in paths[:-1])
+    assert paths[-1].err_info == (RTERR_QNAME, 'bla')
+
+class SequenceSampler(sampling.Sampler):
+    def __init__(self, results):
+        self.results = list(results)
+
+    def should_sample(self, service, has_tag):
+        return self.results.pop(0)
+
+def test_traced_generator_unsampled(sdk):
+    @sdk.traced_custom_service(name='Svc')
+    def gen():
+        yield 1
+        yield 2
+
+    sdk.set_sampler(SequenceSampler([False]))
+    with create_dummy_entrypoint(sdk):
+        items = gen()
+        assert next(items) == 1
+    # The request is not sampled, so the following steps are not linked to it.
+    assert list(items) == [2]
+    assert not get_nsdk(sdk).finished_paths
+    assert not sdk._unsampled.active() #pylint:disable=protected-access
+
+def test_traced_remote_calls_and_sql(sdk):
+    chan = onesdk.Channel(onesdk.ChannelType.TCP_IP, 'localhost:80')
+
+    @sdk.traced_incoming_remote_call(None, 'Svc', 'ep', protocol_name='p')
+    def handle():
+        call()
+        query()
+
+    @sdk.traced_outgoing_remote_call('m', 'OutSvc', 'ep', chan)
+    def call():
+        pass
+
+    with sdk.create_database_info('db', 'vendor', chan) as dbinfo:
+        query = sdk.traced_sql_database_request(dbinfo, 'SELECT 1')(lambda: None)
+        handle()
+
+    root = get_nsdk(sdk).finished_paths[0]
+    assert isinstance(root, sdkmockiface.InRemoteCallHandle)
+    assert root.vals == ('handle', 'Svc', 'ep')
+    assert root.protocol_name == 'p'
+    children = [child for _, child in root.children]
+    assert isinstance(children[0], sdkmockiface.OutRemoteCallHandle)
+    assert children[0].vals == ('m', 'OutSvc', 'ep', onesdk.ChannelType.TCP_IP, 'localhost:80')
+    assert isinstance(children[1], sdkmockiface.DbRequestHandle)
+
+def test_decorated_before_init(native_sdk):
+    sdk = onesdk.SDK(SDKNullInterface())
+    traced = sdk.traced_custom_service(name='Svc')(lambda: 42)
+    assert traced() == 42
+    sdk._set_native_sdk(native_sdk) #pylint:disable=protected-access
+    with create_dummy_entrypoint(sdk):
+        assert traced() == 42
+    assert len(native_sdk.finished_paths) == 1
+    assert len(native_sdk.finished_paths[0].children) == 1
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason='Needs return in generators')
+def test_traced_generator_return_value(sdk):
+    from . import decorated_py3
+
+    delegate = decorated_py3.make_returning_generator(sdk)
+    with create_dummy_entrypoint(sdk):
+        assert list(delegate()) == [1, 'done']
+    assert len(traced_children(sdk)) == 2
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason='Needs async def')
+def test_traced_coroutine(sdk):
+    import asyncio
+    from . import decorated_py3
+
+    succeed, fail, agen = decorated_py3.make_coroutine_functions(sdk)
+    assert inspect.iscoroutinefunction(succeed)
+    loop = asyncio.new_event_loop()
+    try:
+        with create_dummy_entrypoint(sdk):
+            assert loop.run_until_complete(succeed(42)) == 42
+            with pytest.raises(RuntimeError):
+                loop.run_until_complete(fail())
+    finally:
+        loop.close()
+    paths = traced_children(sdk)
+    assert len(paths) == 2
+    assert paths[0].service_name == 'AsyncService' and paths[0].err_info is None
+    assert paths[1].err_info == (RTERR_QNAME, 'bla')
+
+    with pytest.raises(TypeError):
+        sdk.traced_custom_service()(agen)
@@ -0,0 +1,72 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+import oneagent
+from oneagent.common import AgentForkState
+from oneagent._impl.native import nativeagent
+from oneagent.sdk import tracers
+from oneagent.sdk.sampling import RateLimitingSampler
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+def test_sdk_after_fork_in_child(sdk):
+    nsdk = get_nsdk(sdk)
+    sdk.set_sampler(RateLimitingSampler(1000))
+    governor = sdk.start_overhead_governor(window=60)
+    try:
+        with create_dummy_entrypoint(sdk):
+            sdk.create_in_process_link()
+            assert tracers._link_cache.link is not None #pylint:disable=protected-access
+            sdk._tls.tracecontext_raw = object() #pylint:disable=protected-access
+            sdk._after_fork_in_child() #pylint:disable=protected-access
+            assert tracers._link_cache.link is None #pylint:disable=protected-access
+            assert sdk._tls.tracecontext_raw is None #pylint:disable=protected-access
+    finally:
+        governor.stop()
+    assert sdk.overhead_governor is None
+    assert get_nsdk(sdk) is nsdk
+    # The entry point was counted in the "parent"
+    assert tuple(sdk.sampling_counts) == (0, 0)
+    # The governor can be started again in the child.
+    sdk.start_overhead_governor(window=60)
+    sdk.stop_overhead_governor()
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='Needs os.register_at_fork')
+def test_fork_resets_locks():
+    with oneagent._sdk_ref_lk: #pylint:disable=protected-access
+        pid = os.fork()
+        if pid == 0: # Child
+            acquired = oneagent._sdk_ref_lk.acquire(False) #pylint:disable=protected-access
+            os._exit(0 if acquired else 1) #pylint:disable=protected-access
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+def test_eager_child_init(native_sdk, monkeypatch):
+    states = []
+    monkeypatch.setattr(
+        native_sdk, 'agent_get_fork_state', lambda: AgentForkState.PRE_INITIALIZED)
+    monkeypatch.setattr(
+        native_sdk, 'agent_get_current_state', lambda: states.append(True) or 0)
+    monkeypatch.setattr(oneagent, '_eager_child_init', True)
+    nativeagent._force_initialize(native_sdk) #pylint:disable=protected-access
+    try:
+        oneagent._after_fork_in_child() #pylint:disable=protected-access
+    finally:
+        nativeagent._force_initialize(None) #pylint:disable=protected-access
+    assert states == [True]
@@ -0,0 +1,72 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from oneagent.sdk.futures import LinkingExecutor, QUEUE_WAIT_ATTRIBUTE
+
+import sdkmockiface
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+RTERR_QNAME = RuntimeError.__module__ + '.RuntimeError'
+
+def linked_paths(nsdk):
+    return [path for path in nsdk.finished_paths
+            if isinstance(path, sdkmockiface.InProcessLinkTracerHandle)]
+
+def test_linking_executor(sdk):
+    nsdk = get_nsdk(sdk)
+
+    def work(value):
+        with sdk.trace_custom_service('work', 'Svc'):
+            return value * 2
+
+    with LinkingExecutor(ThreadPoolExecutor(max_workers=2), sdk=sdk) as executor:
+        with create_dummy_entrypoint(sdk):
+            assert executor.submit(work, 21).result() == 42
+            assert list(executor.map(work, range(3))) == [0, 2, 4]
+
+    paths = linked_paths(nsdk)
+    assert len(paths) == 4
+    for path in paths:
+        (_, node), = path.children
+        assert node.service_method == 'work'
+        (key, value), = path.custom_attribs
+        assert key == QUEUE_WAIT_ATTRIBUTE
+        assert isinstance(value, float) and value >= 0
+
+def test_linking_executor_error(sdk):
+    nsdk = get_nsdk(sdk)
+
+    def fail():
+        raise RuntimeError('bla')
+
+    with LinkingExecutor(ThreadPoolExecutor(max_workers=1), sdk, None) as executor:
+        with create_dummy_entrypoint(sdk):
+            with pytest.raises(RuntimeError):
+                executor.submit(fail).result()
+    path, = linked_paths(nsdk)
+    assert path.err_info == (RTERR_QNAME, 'bla')
+    assert not path.custom_attribs
+
+def test_linking_executor_no_link(sdk, monkeypatch):
+    nsdk = get_nsdk(sdk)
+    monkeypatch.setattr(nsdk, 'create_in_process_link', lambda: b'')
+    with LinkingExecutor(ThreadPoolExecutor(max_workers=1), sdk) as executor:
+        assert executor.submit(len, 'abc').result() == 3
+    assert not nsdk.finished_paths
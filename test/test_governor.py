@@ -0,0 +1,134 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import pytest
+
+from oneagent.sdk import Channel, ChannelType
+from oneagent.sdk.governor import OverheadSample
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+def sample(overhead):
+    return OverheadSample(overhead, 1.0, 1.0)
+
+def traced_types(sdk, dbinfo):
+    factories = (
+        lambda: sdk.trace_sql_database_request(dbinfo, 'SELECT 1'),
+        sdk.prepare_sql(dbinfo, 'SELECT 1'),
+        lambda: sdk.trace_custom_service('m', 'svc'),
+        lambda: sdk.trace_outgoing_web_request('http://a/', 'GET'),
+        lambda: sdk.trace_outgoing_remote_call('m', 'svc', 'ep', Channel(ChannelType.OTHER)))
+    result = []
+    with create_dummy_entrypoint(sdk):
+        for factory in factories:
+            with factory() as tracer:
+                result.append(bool(tracer))
+    return tuple(result)
+
+def test_governor_levels(sdk):
+    dbinfo = sdk.create_database_info('db', 'PostgreSQL', Channel(ChannelType.OTHER))
+    # The window is long enough that only the test evaluates windows.
+    governor = sdk.start_overhead_governor(budget=0.02, window=3600, restore_windows=2)
+    assert sdk.overhead_governor is governor
+    prepared = sdk.prepare_sql(dbinfo, 'SELECT 1')
+    assert traced_types(sdk, dbinfo) == (True,) * 5
+
+    governor._evaluate(sample(0.05))
+    assert governor.level == 1
+    assert traced_types(sdk, dbinfo) == (False, False, False, True, True)
+    with prepared() as tracer:
+        assert not tracer
+    governor._evaluate(sample(0.05))
+    assert traced_types(sdk, dbinfo) == (False, False, False, False, True)
+    governor._evaluate(sample(0.05)) # Already at the highest level
+    assert governor.level == 2
+
+    # Hysteresis: Restoring needs restore_windows windows in a row below
+    # budget * restore_ratio.
+    governor._evaluate(sample(0.005))
+    governor._evaluate(sample(0.015))
+    governor._evaluate(sample(0.005))
+    assert governor.level == 2
+    governor._evaluate(sample(0.005))
+    assert governor.level == 1
+    assert traced_types(sdk, dbinfo) == (False, False, False, True, True)
+
+    # Exceeding the budget right after restoring doubles the windows needed.
+    governor._evaluate(sample(0.05))
+    assert governor.level == 2
+    for _ in range(3):
+        governor._evaluate(sample(0.005))
+    assert governor.level == 2
+    governor._evaluate(sample(0.005))
+    assert governor.level == 1
+
+    sdk.stop_overhead_governor()
+    assert sdk.overhead_governor is None
+    assert traced_types(sdk, dbinfo) == (True,) * 5
+    dbinfo.close()
+
+def test_governor_measures_sdk_calls(sdk):
+    nsdk = get_nsdk(sdk)
+    governor = sdk.start_overhead_governor(window=3600)
+    assert get_nsdk(sdk) is not nsdk
+    with create_dummy_entrypoint(sdk):
+        for _ in range(10):
+            with sdk.trace_custom_service('m', 'svc'):
+                pass
+    governor._end_window()
+    measured = governor.last_sample
+    assert 0 < measured.sdk_time <= measured.wall_time
+    assert 0 <= measured.sdk_cpu_time
+    assert len(nsdk.finished_paths) == 1
+    assert len(nsdk.finished_paths[0].children) == 10
+
+    sdk.stop_overhead_governor()
+    assert get_nsdk(sdk) is nsdk
+
+def test_governor_sums_threads(sdk):
+    governor = sdk.start_overhead_governor(window=3600)
+    timed_nsdk = get_nsdk(sdk)
+    def call_sdk():
+        with create_dummy_entrypoint(sdk):
+            for _ in range(100):
+                with sdk.trace_custom_service('m', 'svc'):
+                    pass
+    threads = [threading.Thread(target=call_sdk) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall, cpu = timed_nsdk.take_busy()
+    assert wall > 0 and cpu >= 0
+    # The times of the finished threads are only taken once.
+    assert timed_nsdk.take_busy() == (0.0, 0.0)
+    assert not timed_nsdk._threads
+    assert governor.throttled_types == ()
+    sdk.stop_overhead_governor()
+
+def test_governor_idle_window():
+    assert OverheadSample(0.1, 0.0, 1.0).overhead == 0
+    assert OverheadSample(0.1, 0.5, 1.0).overhead == pytest.approx(0.2)
+    # The CPU time of SDK calls is used if known.
+    assert OverheadSample(0.1, 0.5, 1.0, 0.05).overhead == pytest.approx(0.1)
+
+def test_governor_invalid_args(sdk):
+    with pytest.raises(ValueError):
+        sdk.start_overhead_governor(budget=0)
+    with pytest.raises(ValueError):
+        sdk.start_overhead_governor(window=-1)
+    assert sdk.overhead_governor is None
@@ -15,7 +15,9 @@
 
 from __future__ import print_function
 
+import ctypes
 import os
+import sys
 from os import path
 import inspect
 import pytest
@@ -39,6 +41,25 @@ ignoredmods = set([
     'oneagent.launch_by_import',
     ])
 
+try:
+    import cffi #pylint:disable=unused-import
+except ImportError:
+    ignoredmods.add('oneagent._impl.native.sdkcffiiface')
+
+try:
+    import concurrent.futures #pylint:disable=unused-import
+except ImportError:
+    ignoredmods.add('oneagent.sdk.futures')
+    ignoredmods.add('oneagent.sdk.pools')
+
+if sys.version_info < (3, 5):
+    ignoredmods.add('oneagent.sdk._decorators_py3') # Needs async def
+    ignoredmods.add('oneagent.sdk._tracers_py3')
+    ignoredmods.add('oneagent.sdk.asgi')
+
+if sys.version_info < (3, 7):
+    ignoredmods.add('oneagent.sdk.aio') # Needs contextvars
+
 @pytest.fixture(scope='module', autouse=True)
 def set_sdk():
     nativeagent.initialize(SDKMockInterface())
@@ -90,12 +111,49 @@ def test_sdkctypesiface_smoke(csdkinst):
     assert state == sdkcommon.AgentState.NOT_INITIALIZED
     sdk.stub_free_variables()
 
+@pytest.mark.dependsnative
+def test_sdkctypesiface_lazy_bind(csdkinst):
+    sdk = csdk.loadsdk(lazy_bind=True)
+    assert 'stub_free_variables' not in vars(sdk)
+    assert 'incomingwebrequesttracer_add_request_header' not in vars(sdk)
+    nativeagent.checkresult(
+        sdk, sdk.stub_set_variable('agentactive=true', False))
+    sdk.stub_free_variables()
+    assert 'stub_free_variables' in vars(sdk)
+
+    # Binding one half of a wrapped header function binds both
+    assert callable(sdk.incomingwebrequesttracer_add_request_header)
+    assert 'incomingwebrequesttracer_add_request_headers' in vars(sdk)
+
+    assert pubnames(sdk) == pubnames(csdkinst)
+    assert not check_sdk_iface(csdkinst, sdk)
+    with pytest.raises(AttributeError):
+        sdk.no_such_function() #pylint:disable=no-member
+
+@pytest.mark.dependsnative
+def test_sdkctypesiface_retain_gil(csdkinst):
+    #pylint:disable=protected-access
+    sdk = csdk.loadsdk(retain_gil=True)
+    assert sdk.tracer_start._flags_ & ctypes._FUNCFLAG_PYTHONAPI
+    assert sdk._incomingwebrequesttracer_add_request_headers._flags_ & ctypes._FUNCFLAG_PYTHONAPI
+    assert not sdk._initialize_2._flags_ & ctypes._FUNCFLAG_PYTHONAPI
+    assert not csdkinst.tracer_start._flags_ & ctypes._FUNCFLAG_PYTHONAPI
+    assert not check_sdk_iface(csdkinst, sdk)
+
+    sdk = csdk.loadsdk(retain_gil=True, lazy_bind=True)
+    assert sdk.tracer_end._flags_ & ctypes._FUNCFLAG_PYTHONAPI
+    assert not sdk.shutdown._flags_ & ctypes._FUNCFLAG_PYTHONAPI
+
 def argstr(func):
     while hasattr(func, '__wrapped__'):
         func = func.__wrapped__
     #pylint:disable=deprecated-method
     if not inspect.ismethod(func) and not inspect.isfunction(func):
-        return '({})'.format(', '.join('_arg' + str(i) for i in range(len(func.argtypes))))
+        argtypes = getattr(func, 'argtypes', None)
+        if argtypes is None: # cffi function
+            from oneagent._impl.native.sdkcffiiface import ffi
+            argtypes = ffi.typeof(func).args
+        return '({})'.format(', '.join('_arg' + str(i) for i in range(len(argtypes))))
     sig = inspect.signature(func)
     iparams = iter(sig.parameters)
     if sig.parameters and next(iparams) == 'self':
@@ -134,6 +192,15 @@ def test_mock_sdk_impl_match(csdkinst):
         'Additional names in SDKMockInterface: ',
         ', '.join(check_sdk_iface(csdkinst, msdk.SDKMockInterface)))
 
+@pytest.mark.dependsnative
+def test_cffi_sdk_impl_match(csdkinst):
+    pytest.importorskip('cffi')
+    from oneagent._impl.native import sdkcffiiface
+    cffisdk = sdkcffiiface.loadsdk()
+    # No additional public names, both backends must be interchangeable
+    assert not check_sdk_iface(csdkinst, cffisdk)
+    assert not check_sdk_iface(cffisdk, csdkinst)
+
 @pytest.mark.dependsnative
 def test_null_sdk_impl_match(csdkinst):
     nulliface = nsdk.SDKNullInterface()
@@ -24,6 +24,10 @@ from testhelpers import run_in_new_interpreter
 
 import oneagent
 
+# Generous, to not fail on slow CI machines; the typical value is far lower.
+# Importing pkg_resources alone used to take longer than this on some systems.
+STARTUP_BUDGET_SECONDS = 1.0
+
 #pylint:disable=unsupported-membership-test
 
 @pytest.mark.dependsnative
@@ -55,6 +59,16 @@ def test_run_public_sdk_noc():
     assert '-main' in out
     assert 'DONE.' in out
 
+def test_startup_time_budget():
+    '''Test that importing and initializing the SDK is cheap enough for
+    short-lived processes.'''
+    from . import startup_prog
+    out = run_in_new_interpreter(startup_prog)
+    print('OUTPUT:\n' + out)
+    assert 'pkg_resources loaded: False' in out
+    elapsed = float(out.split('startup seconds:')[1].split()[0])
+    assert elapsed < STARTUP_BUDGET_SECONDS
+
 def test_mk_sdkopts_alldefaults():
     oldargs = sys.argv
     newargs = ['--dt_foo=bar', 'qu', '--dt_bla=off', 'dt_quak=on']
@@ -0,0 +1,79 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import oneagent
+from oneagent import sdk as onesdk
+from oneagent._impl.native.sdknulliface import SDKNullInterface
+from oneagent.sdk.pools import TaggedCall, TaggingExecutor, tag_call
+
+import sdkmockiface
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+def square(value):
+    return value * value
+
+@pytest.fixture
+def worker_sdk(sdk, monkeypatch):
+    # The SDK that TaggedCall objects use in the "worker process".
+    monkeypatch.setattr(oneagent, 'get_sdk', lambda: sdk)
+    return sdk
+
+def remote_calls(nsdk):
+    nsdk.process_finished_paths_tags()
+    entry_paths = [path for path in nsdk.finished_paths if path.vals == ('ENTRY',) * 3]
+    _, out_node = entry_paths[-1].children[0]
+    assert isinstance(out_node, sdkmockiface.OutRemoteCallHandle)
+    return out_node, [node for _, node in out_node.children]
+
+def test_tag_call_pickle(sdk, worker_sdk):
+    nsdk = get_nsdk(sdk)
+    with create_dummy_entrypoint(sdk):
+        call = tag_call(square, 'Crunch', sdk=sdk)
+    assert isinstance(call, TaggedCall)
+    call = pickle.loads(pickle.dumps(call))
+    assert call.func is square
+    assert (call.method, call.service, call.endpoint) == (
+        __name__ + '.square', 'Crunch', 'Crunch')
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(call, 3).result() == 9
+
+    out_node, (in_node,) = remote_calls(nsdk)
+    assert out_node.vals[:3] == (__name__ + '.square', 'Crunch', 'Crunch')
+    assert isinstance(in_node, sdkmockiface.InRemoteCallHandle)
+    assert in_node.vals == out_node.vals[:3]
+    assert in_node.protocol_name == 'pickle'
+
+def test_tagging_executor(sdk, worker_sdk):
+    nsdk = get_nsdk(sdk)
+    with TaggingExecutor(ThreadPoolExecutor(max_workers=2), sdk=sdk) as executor:
+        with create_dummy_entrypoint(sdk):
+            assert executor.submit(square, 2).result() == 4
+        with create_dummy_entrypoint(sdk):
+            assert list(executor.map(square, range(3))) == [0, 1, 4]
+    # One outgoing remote call for all calls of map
+    out_node, in_nodes = remote_calls(nsdk)
+    assert len(in_nodes) == 3
+    for node in in_nodes:
+        assert node.in_tag_as_id == id(out_node) and node.is_in_tag_resolved
+
+def test_tag_call_untraced():
+    sdk = onesdk.SDK(SDKNullInterface())
+    assert tag_call(square, sdk=sdk) is square
@@ -15,12 +15,25 @@
 
 from __future__ import print_function
 
+import array
+import time
+from decimal import Decimal
+from fractions import Fraction
+
 import pytest
 
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
 import oneagent
 from oneagent import sdk as onesdk
 from oneagent._impl import six
 from oneagent._impl.native import nativeagent
+from oneagent._impl.native.sdknulliface import SDKNullInterface
+from oneagent.sdk import tracers
+from oneagent.sdk.headers import HeaderFilter
 
 import sdkmockiface
 
@@ -97,6 +110,196 @@ def test_trace_sql_database_request(sdk):
     assert root.round_trip_count == 1
     assert root.returned_row_count == 42
 
+def test_tracecontext_reuse(sdk):
+    nsdk = get_nsdk(sdk)
+    ctx = sdk.tracecontext_get_current()
+    assert not ctx
+    assert ctx.trace_id == onesdk.TraceContextInfo.INVALID_TRACE_ID
+    assert not hasattr(ctx, '__dict__')
+
+    raw = (onesdk.ErrorCode.SUCCESS, '1' * 32, '2' * 16)
+    nsdk.tracecontext_get_current = lambda: raw
+    ctx = sdk.tracecontext_get_current()
+    assert ctx and ctx.span_id == '2' * 16
+    assert sdk.tracecontext_get_current() is ctx # Native result did not change
+    nsdk.tracecontext_get_current = lambda: (onesdk.ErrorCode.SUCCESS, '1' * 32, '3' * 16)
+    assert sdk.tracecontext_get_current().span_id == '3' * 16
+
+def test_add_custom_request_attributes(sdk):
+    nsdk = get_nsdk(sdk)
+    calls = []
+    for name in ('integers', 'floats', 'strings'):
+        fn_name = 'customrequestattribute_add_' + name
+        def counting(keys, values, count, _fn=getattr(nsdk, fn_name), _name=name):
+            calls.append(_name)
+            return _fn(keys, values, count)
+        setattr(nsdk, fn_name, counting)
+
+    warnings = []
+    nsdk.agent_get_logging_callback = lambda: warnings.append
+
+    with create_dummy_entrypoint(sdk):
+        sdk.add_custom_request_attributes([
+            ('int', 1), ('flag', True), ('float', 0.5), ('str', 'x'), ('dec', Decimal('1.25')),
+            ('frac', Fraction(1, 4)), ('huge', 2 ** 64), ('none', None), ('off', False),
+            ('snan', Decimal('sNaN'))])
+        sdk.add_custom_request_attributes({})
+        sdk.add_custom_request_attributes({'only_str': 'y'})
+        sdk.add_custom_request_attribute('single_flag', True)
+    root = nsdk.finished_paths[-1]
+
+    assert calls == ['integers', 'floats', 'strings', 'strings']
+    assert len(warnings) == 2
+    assert "'none'" in warnings[0] and "'snan'" in warnings[1]
+    attribs = dict(root.custom_attribs)
+    assert len(attribs) == len(root.custom_attribs) == 10
+    assert attribs['int'] == 1 and type(attribs['int']) is int
+    assert attribs['flag'] == 'true' and attribs['off'] == 'false'
+    assert attribs['float'] == 0.5
+    assert attribs['dec'] == 1.25 and type(attribs['dec']) is float
+    assert attribs['frac'] == 0.25
+    assert attribs['huge'] == str(2 ** 64)
+    assert attribs['str'] == 'x' and attribs['only_str'] == 'y'
+    assert attribs['single_flag'] == 'true'
+
+def test_add_custom_request_numeric_attributes(sdk):
+    nsdk = get_nsdk(sdk)
+    with create_dummy_entrypoint(sdk):
+        sdk.add_custom_request_integer_attributes(['a', 'b'], array.array('q', [1, 2, 3]))
+        sdk.add_custom_request_float_attributes(('x',), array.array('d', [0.5]))
+        sdk.add_custom_request_integer_attributes([], [])
+        sdk.add_custom_request_float_attributes(['y', 'z'], [1.5])
+    root = nsdk.finished_paths[-1]
+    assert root.custom_attribs == [('a', 1), ('b', 2), ('x', 0.5), ('y', 1.5)]
+
+def test_agent_state_watcher(sdk):
+    nsdk = get_nsdk(sdk)
+    nsdk._state = onesdk.AgentState.PERMANENTLY_INACTIVE #pylint:disable=protected-access
+    with pytest.raises(ValueError):
+        sdk.start_agent_state_watcher(0)
+    sdk.start_agent_state_watcher(poll_interval=0.01)
+    try:
+        assert sdk.agent_state == onesdk.AgentState.PERMANENTLY_INACTIVE
+        assert get_nsdk(sdk) is not nsdk
+        tracer = sdk.trace_custom_service('m', 's')
+        assert not tracer
+        assert sdk.trace_custom_service('m2', 's2') is tracer
+        assert not create_dummy_entrypoint(sdk)
+        with tracer:
+            pass
+
+        nsdk._state = onesdk.AgentState.ACTIVE #pylint:disable=protected-access
+        deadline = time.time() + 5
+        while sdk.agent_state != onesdk.AgentState.ACTIVE and time.time() < deadline:
+            time.sleep(0.01)
+        assert sdk.agent_state == onesdk.AgentState.ACTIVE
+        with create_dummy_entrypoint(sdk) as entry:
+            assert entry
+    finally:
+        sdk.stop_agent_state_watcher()
+    assert get_nsdk(sdk) is nsdk
+    assert len(nsdk.finished_paths) == 1
+
+def test_null_sdk_shared_objects(monkeypatch):
+    monkeypatch.setattr(oneagent, '_sdk_instance', None)
+    assert oneagent.get_sdk() is oneagent.get_sdk()
+
+    sdk = onesdk.SDK(SDKNullInterface())
+    chan = onesdk.Channel(onesdk.ChannelType.OTHER, 'e')
+    dbinfo = sdk.create_database_info('db', 'vendor', chan)
+    assert not dbinfo
+    assert sdk.create_database_info('db2', 'vendor', chan) is dbinfo
+    with dbinfo:
+        pass
+    assert dbinfo.handle is not None # Shared info handles are never closed
+
+    tracer = sdk.trace_sql_database_request(dbinfo, 'SELECT 1')
+    assert not tracer
+    assert isinstance(tracer, tracers.DatabaseRequestTracer)
+    assert sdk.trace_sql_database_request(dbinfo, 'SELECT 2') is tracer
+    assert sdk.prepare_sql(dbinfo, 'SELECT 3')() is tracer
+    with pytest.raises(AttributeError):
+        tracer.handle = 42
+    with tracer:
+        tracer.set_rows_returned(1)
+    with pytest.raises(RuntimeError):
+        with tracer:
+            raise RuntimeError('bla')
+
+    other = sdk.trace_custom_service('m', 's')
+    assert not other
+    assert isinstance(other, tracers.CustomServiceTracer)
+
+@pytest.mark.skipif(tracemalloc is None, reason='tracemalloc requires Python 3.4+')
+def test_null_sdk_allocation_free():
+    sdk = onesdk.SDK(SDKNullInterface())
+    chan = onesdk.Channel(onesdk.ChannelType.OTHER, 'e')
+    dbinfo = sdk.create_database_info('db', 'vendor', chan)
+    webapp = sdk.create_web_application_info('vhost', 'app', '/')
+    headers = {'Host': 'example.com'}
+    count = 1000
+    # Keeps all returned objects alive: A new object per call shows up as
+    # retained memory.
+    results = [None] * (count * 5)
+
+    def trace_all(count):
+        i = 0
+        for _ in range(count):
+            results[i] = sdk.trace_sql_database_request(dbinfo, 'SELECT 1')
+            results[i + 1] = sdk.trace_incoming_web_request(
+                webapp, 'http://example.com/', 'GET', headers=headers, str_tag='tag')
+            results[i + 2] = sdk.trace_outgoing_remote_call(
+                'm', 's', 'e', chan, protocol_name='p')
+            with sdk.trace_custom_service('m', 's') as tracer:
+                results[i + 3] = tracer
+            results[i + 4] = sdk.tracecontext_get_current()
+            i += 5
+
+    trace_all(10) # Warm up caches
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        trace_all(count)
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert retained < 1024, 'Retained {} bytes for {} calls'.format(retained, count * 5)
+    assert len(set(map(id, results))) == 5
+
+def test_prepared_factories(sdk):
+    trace_svc = sdk.prepare_custom_service('meth', 'Svc')
+    trace_in = sdk.prepare_incoming_remote_call('a', 'b', 'c', protocol_name='p')
+    chan = onesdk.Channel(onesdk.ChannelType.OTHER, 'e')
+    trace_out = sdk.prepare_outgoing_remote_call('x', 'y', 'z', chan, protocol_name='q')
+    with sdk.create_database_info('dbn', 'dbv', chan) as dbi:
+        trace_sql = sdk.prepare_sql(dbi, DUMMY_SQL)
+        for _ in range(2):
+            with trace_in():
+                with trace_svc() as svc_tracer:
+                    assert isinstance(svc_tracer, onesdk.tracers.CustomServiceTracer)
+                with trace_out() as out_tracer:
+                    out_tag = out_tracer.outgoing_dynatrace_byte_tag
+                    with trace_sql() as sql_tracer:
+                        sql_tracer.set_rows_returned(3)
+            with trace_in(byte_tag=out_tag):
+                pass
+    nsdk = get_nsdk(sdk)
+    assert_resolve_all(nsdk)
+    assert len(nsdk.finished_paths) == 4
+    root = nsdk.finished_paths[0]
+    assert isinstance(root, sdkmockiface.InRemoteCallHandle)
+    assert root.vals == ('a', 'b', 'c')
+    assert root.protocol_name == 'p'
+    (_, svc), (_, out) = root.children[:2]
+    assert isinstance(svc, sdkmockiface.CustomServiceTracerHandle)
+    assert (svc.service_method, svc.service_name) == ('meth', 'Svc')
+    assert out.vals == ('x', 'y', 'z', onesdk.ChannelType.OTHER, 'e')
+    assert out.protocol_name == 'q'
+    _, sql = out.children[0]
+    assert sql.vals[1] == DUMMY_SQL
+    assert sql.returned_row_count == 3
+    assert nsdk.finished_paths[1].linked_parent is out
+
 DUMMY_URL = 'http://a/b/c'
 
 def test_trace_iwr_minimal(sdk):
@@ -167,6 +370,63 @@ def test_trace_iwr_autocount(sdk):
     assert root.req_hdrs == [('x', 'xv'), ('y', 'yv')]
     assert root.resp_hdrs == [('u', 'uv')]
 
+def test_header_filter(sdk):
+    sdk.set_header_filter(HeaderFilter(
+        allow=('host', 'X-Request-Id', 'Set-Cookie', 'Location'),
+        max_value_length=8, max_total_length=30))
+    req_hdrs = {
+        'Host': 'example.com',
+        'Cookie': 'c' * 4096,
+        'X-REQUEST-ID': '42',
+        'x-request-id': '43'}
+    with sdk.create_web_application_info('a', 'b', '/b') as wapp:
+        with sdk.trace_incoming_web_request(wapp, DUMMY_URL, 'GET', headers=req_hdrs) as wreq:
+            wreq.add_response_header('Cookie', 'c')
+            wreq.add_response_header('LOCATION', DUMMY_URL)
+            wreq.add_parameter('Cookie', 'c') # Parameters are not filtered
+            wreq.add_response_headers(
+                ['Set-Cookie', 'Vary', 'Set-Cookie'], ['a=1', 'Accept', 'b=2'])
+        with create_dummy_entrypoint(sdk):
+            with sdk.trace_outgoing_web_request(
+                    DUMMY_URL, 'GET', headers=(['Accept', 'Host'], ['*/*', 'example.com'])) as wreq:
+                wreq.add_response_headers({'Location': DUMMY_URL, 'Vary': 'Accept'})
+    nsdk = get_nsdk(sdk)
+    iroot = nsdk.finished_paths[0]
+    # Values truncated to 8, then only headers that fit into 30 in total.
+    assert iroot.req_hdrs == [('Host', 'example.'), ('X-REQUEST-ID', '42')]
+    assert iroot.resp_hdrs == [
+        ('LOCATION', DUMMY_URL[:8]), ('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2')]
+    assert iroot.params == [('Cookie', 'c')]
+    _, oroot = nsdk.finished_paths[1].children[0]
+    assert oroot.req_hdrs == [('Host', 'example.')]
+    assert oroot.resp_hdrs == [('Location', DUMMY_URL[:8])]
+
+    sdk.set_header_filter(None)
+    assert sdk.header_filter is None
+    with sdk.create_web_application_info('a', 'b', '/b') as wapp:
+        with sdk.trace_incoming_web_request(wapp, DUMMY_URL, 'GET', headers=req_hdrs) as wreq:
+            wreq.add_response_header('Cookie', 'c')
+    assert len(nsdk.finished_paths[2].req_hdrs) == 4
+    assert nsdk.finished_paths[2].resp_hdrs == [('Cookie', 'c')]
+
+def test_header_filter_encoded_lengths():
+    header_filter = HeaderFilter(max_value_length=5, max_total_length=12)
+    # Sizes are in bytes of UTF-8, text is not cut within a character.
+    assert header_filter.apply(
+        [u'A', b'B', u'C', u'D'], [u'\xe4\xe4\xe4', b'\xc3\xa4\xc3\xa4\xc3', None, u'x'], 4) == (
+            [u'A', b'B', u'C'], [u'\xe4\xe4', b'\xc3\xa4\xc3\xa4\xc3', None], 3)
+
+def test_header_filter_bytes_names():
+    header_filter = HeaderFilter(allow=['X-Id'])
+    names = [b'x-id', b'X-ID', b'Cookie', u'x-Id']
+    assert header_filter.apply(names, ['1', '2', '3', '4'], 4) == (
+        [b'x-id', b'X-ID', u'x-Id'], ['1', '2', '4'], 3)
+    # The count limits the headers that are considered.
+    assert header_filter.apply(iter(names), iter(['1', '2', '3', '4']), 1) == (
+        [b'x-id'], ['1'], 1)
+    with pytest.raises(ValueError):
+        HeaderFilter(max_value_length=-1)
+
 def assert_resolve_all(nsdk):
     unresolved = nsdk.process_finished_paths_tags()
     if not unresolved:
@@ -322,3 +582,21 @@ def test_public_sdk_sample(native_sdk_noinit, monkeypatch):
 @pytest.mark.dependsnative
 def test_sdk_callback_smoke():
     print(run_in_new_interpreter(sdk_diag_prog))
+
+def test_in_process_link_cache(sdk, monkeypatch):
+    nsdk = get_nsdk(sdk)
+    calls = []
+    def create_in_process_link():
+        calls.append(len(nsdk.get_path().nodestack) if nsdk.get_path() else 0)
+        return b'inproc'
+    monkeypatch.setattr(nsdk, 'create_in_process_link', create_in_process_link)
+
+    with create_dummy_entrypoint(sdk):
+        links = [sdk.create_in_process_link() for _ in range(10)]
+        assert links == [b'inproc'] * 10
+        with sdk.trace_custom_service('m', 'Svc'):
+            sdk.create_in_process_link()
+            sdk.create_in_process_link()
+        # Ending the tracer invalidates the cached link
+        sdk.create_in_process_link()
+    assert calls == [1, 2, 1]
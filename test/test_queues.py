@@ -0,0 +1,83 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import pytest
+
+from oneagent.sdk.queues import LinkingQueue, LinkedItem
+
+import sdkmockiface
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+RTERR_QNAME = RuntimeError.__module__ + '.RuntimeError'
+
+def consume(pipeline, sdk, count, batch=None):
+    processed = []
+    def run():
+        while len(processed) < count:
+            items = pipeline.get_many(batch) if batch else [pipeline.get()]
+            for linked in items:
+                with linked as item:
+                    with sdk.trace_custom_service(item, 'Svc'):
+                        processed.append(item)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, processed
+
+def test_linking_queue(sdk):
+    nsdk = get_nsdk(sdk)
+    pipeline = LinkingQueue(sdk=sdk)
+    with create_dummy_entrypoint(sdk):
+        pipeline.put('a')
+        pipeline.put_many(['b', 'c'])
+    thread, processed = consume(pipeline, sdk, 3)
+    thread.join()
+    assert processed == ['a', 'b', 'c']
+    paths = [path for path in nsdk.finished_paths
+             if isinstance(path, sdkmockiface.InProcessLinkTracerHandle)]
+    assert [path.children[0][1].service_method for path in paths] == ['a', 'b', 'c']
+
+def test_linking_queue_batches(sdk):
+    pipeline = LinkingQueue(maxsize=10, sdk=sdk)
+    with create_dummy_entrypoint(sdk):
+        pipeline.put_many(['a', 'b', 'c'])
+        pipeline.put('d')
+    items = pipeline.get_many(3)
+    assert [linked.item for linked in items] == ['a', 'b', 'c']
+    # One link for all items of put_many
+    assert items[0].link is items[1].link is items[2].link
+    assert [linked.item for linked in pipeline.get_many(3)] == ['d']
+    assert pipeline.empty()
+    with pytest.raises(ValueError):
+        pipeline.get_many(0)
+    thread, processed = consume(pipeline, sdk, 2, batch=5)
+    pipeline.put_many(['e', 'f'])
+    thread.join()
+    assert processed == ['e', 'f']
+
+def test_linked_item(sdk):
+    nsdk = get_nsdk(sdk)
+    with pytest.raises(RuntimeError):
+        with LinkedItem(sdk, b'inproc', 42) as item:
+            assert item == 42
+            raise RuntimeError('bla')
+    path, = nsdk.finished_paths
+    assert isinstance(path, sdkmockiface.InProcessLinkTracerHandle)
+    assert path.err_info == (RTERR_QNAME, 'bla')
+    with LinkedItem(sdk, b'', 42) as item:
+        assert item == 42
+    assert len(nsdk.finished_paths) == 1
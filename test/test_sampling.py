@@ -0,0 +1,185 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+
+import pytest
+
+from oneagent.sdk import sampling, Channel, ChannelType, MessagingDestinationType
+from oneagent.sdk.sampling import (
+    ProbabilitySampler, RateLimitingSampler, IncomingTagSampler, SamplingCounts)
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+class FixedSampler(sampling.Sampler):
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    def should_sample(self, service, has_tag):
+        self.calls.append((service, has_tag))
+        return self.results.pop(0)
+
+def test_probability_sampler():
+    assert not any(ProbabilitySampler(0).should_sample('s', False) for _ in range(100))
+    assert all(ProbabilitySampler(1).should_sample('s', False) for _ in range(100))
+    with pytest.raises(ValueError):
+        ProbabilitySampler(1.5)
+
+def test_rate_limiting_sampler(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(sampling, '_monotonic', lambda: now[0])
+    sampler = RateLimitingSampler(2, burst=3)
+    assert [sampler.should_sample('a', False) for _ in range(4)] == [True] * 3 + [False]
+    assert sampler.should_sample('b', False) # Separate bucket per service
+    now[0] += 0.5 # One token refilled
+    assert [sampler.should_sample('a', False) for _ in range(2)] == [True, False]
+    now[0] += 100 # Refill is capped by burst
+    assert [sampler.should_sample('a', False) for _ in range(4)] == [True] * 3 + [False]
+    with pytest.raises(ValueError):
+        RateLimitingSampler(0)
+    with pytest.raises(ValueError):
+        RateLimitingSampler(1, max_services=0)
+
+def test_rate_limiting_sampler_bounded(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(sampling, '_monotonic', lambda: now[0])
+    sampler = RateLimitingSampler(1, burst=2, max_services=2)
+    assert sampler.should_sample('a', False)
+    assert sampler.should_sample('b', False)
+    assert sampler.should_sample('b', False)
+    # 'a' is least recently used, so it is evicted for 'c' (and 'b' is kept).
+    assert sampler.should_sample('c', False)
+    assert list(sampler._buckets) == ['b', 'c'] #pylint:disable=protected-access
+    assert not sampler.should_sample('b', False)
+    # Buckets that are full again are dropped when new services come.
+    now[0] += 2
+    assert sampler.should_sample('d', False)
+    assert list(sampler._buckets) == ['d'] #pylint:disable=protected-access
+
+def test_incoming_tag_sampler():
+    delegate = FixedSampler([False])
+    sampler = IncomingTagSampler(delegate)
+    assert sampler.should_sample('s', True)
+    assert not sampler.should_sample('s', False)
+    assert delegate.calls == [('s', False)]
+
+def test_unsampled_request_suppresses_nested_tracers(sdk):
+    nsdk = get_nsdk(sdk)
+    sdk.set_sampler(ProbabilitySampler(0))
+    assert sdk.sampler is not None
+
+    tracer = sdk.trace_incoming_remote_call('m', 'svc', 'ep')
+    assert not tracer
+    with tracer:
+        nested = sdk.trace_custom_service('m', 'svc')
+        assert nested is sdk.trace_custom_service('m', 'other')
+        assert not nested
+        with nested:
+            pass
+        # Nested incoming requests are neither sampled nor counted.
+        assert not sdk.trace_incoming_remote_call('m', 'svc', 'ep')
+        assert not sdk.prepare_custom_service('m', 'svc')()
+    assert not nsdk.finished_paths
+    assert sdk.sampling_counts == SamplingCounts(0, 1)
+
+    # Outside the unsampled request, tracing works again.
+    sdk.set_sampler(None)
+    assert sdk.sampling_counts == SamplingCounts(0, 0)
+    with create_dummy_entrypoint(sdk) as tracer:
+        assert tracer
+        with sdk.trace_custom_service('m', 'svc') as tracer:
+            assert tracer
+    assert len(nsdk.finished_paths) == 1
+    assert len(nsdk.finished_paths[0].children) == 1
+
+def test_unsampled_request_ended_elsewhere_or_dropped(sdk):
+    sdk.set_sampler(ProbabilitySampler(0))
+
+    # Ended on another thread
+    tracer = sdk.trace_incoming_remote_call('m', 'svc', 'ep')
+    tracer.start()
+    assert not sdk.trace_custom_service('m', 'svc')
+    thread = threading.Thread(target=tracer.end)
+    thread.start()
+    thread.join()
+    sdk.set_sampler(None)
+    with create_dummy_entrypoint(sdk) as entry:
+        assert entry
+
+    # Started, but never ended
+    sdk.set_sampler(ProbabilitySampler(0))
+    tracer = sdk.trace_incoming_remote_call('m', 'svc', 'ep')
+    tracer.start()
+    assert not sdk.trace_custom_service('m', 'svc')
+    del tracer
+    sdk.set_sampler(None)
+    with create_dummy_entrypoint(sdk) as entry:
+        assert entry
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='Needs contextvars')
+def test_unsampled_request_is_per_task(sdk):
+    from . import aio_tasks_py3
+
+    nsdk = get_nsdk(sdk)
+    sdk.set_sampler(FixedSampler([True, False])) # Sample the entry point only
+    with create_dummy_entrypoint(sdk):
+        assert aio_tasks_py3.run(aio_tasks_py3.traced_while_unsampled, sdk)
+    assert [node.service_name for _, node in nsdk.finished_paths[0].children] == ['Other']
+
+def test_sampler_sees_service_and_tag(sdk):
+    nsdk = get_nsdk(sdk)
+    webapp = sdk.create_web_application_info('vhost', 'app', '/')
+    msi = sdk.create_messaging_system_info(
+        'Kafka', 'topic', MessagingDestinationType.TOPIC,
+        Channel(ChannelType.TCP_IP, 'localhost:9092'))
+    sampler = FixedSampler([True, False, True, False])
+    sdk.set_sampler(sampler)
+
+    with sdk.trace_incoming_web_request(webapp, 'http://a/', 'GET') as tracer:
+        assert tracer
+    assert not sdk.trace_incoming_web_request(webapp, 'http://a/', 'GET', str_tag='tag')
+    with sdk.trace_incoming_message_process(msi) as tracer:
+        assert tracer
+    assert not sdk.trace_incoming_message_process(msi, byte_tag=b'tag')
+
+    webapp_key = ('vhost', 'app', '/')
+    msi_key = (
+        'Kafka', 'topic', MessagingDestinationType.TOPIC, ChannelType.TCP_IP, 'localhost:9092')
+    assert sampler.calls == [
+        (webapp_key, False), (webapp_key, True), (msi_key, False), (msi_key, True)]
+    assert sdk.sampling_counts == SamplingCounts(2, 2)
+    assert len(nsdk.finished_paths) == 2
+    webapp.close()
+    msi.close()
+
+    # Infos created with the same arguments share the service key, so that
+    # samplers keep their state per service, not per info object.
+    with sdk.create_web_application_info('vhost', 'app', '/') as webapp2:
+        assert webapp2.service_key == webapp_key
+
+def test_prepared_incoming_remote_call_sampling(sdk):
+    nsdk = get_nsdk(sdk)
+    factory = sdk.prepare_incoming_remote_call('m', 'svc', 'ep')
+    sampler = FixedSampler([False, True])
+    sdk.set_sampler(sampler)
+    with factory() as tracer:
+        assert not tracer
+    with factory() as tracer:
+        assert tracer
+    assert sampler.calls == [('svc', False), ('svc', False)]
+    assert sdk.sampling_counts == SamplingCounts(1, 1)
+    assert len(nsdk.finished_paths) == 1
@@ -0,0 +1,65 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for the cffi backend.'''
+
+import gc
+
+import pytest
+
+from oneagent.common import AgentState
+from oneagent._impl.native import nativeagent
+
+cffiiface = pytest.importorskip('oneagent._impl.native.sdkcffiiface')
+ffi = cffiiface.ffi
+
+def cstr_value(cstr):
+    return ffi.unpack(ffi.cast('char*', cstr.data), cstr.byte_length)
+
+def test_to_cstring():
+    cstr = cffiiface.to_cstring(u'Ordersäervice')
+    assert cstr_value(cstr) == u'Ordersäervice'.encode('utf-8')
+    assert cstr.ccsid == cffiiface.CCSID_UTF8
+    assert cffiiface.to_cstring(u'Ordersäervice') is cstr
+
+    assert cstr_value(cffiiface.to_cstring(b'raw')) == b'raw'
+    assert cffiiface.to_cstring(None) is cffiiface.NULL_CSTRING
+    assert cffiiface.NULL_CSTRING.data == ffi.NULL
+    with pytest.raises(ValueError):
+        cffiiface.to_cstring(42)
+
+def test_cstring_keeps_data_alive():
+    cstr = cffiiface.to_cstring(b''.join([b'dyn', b'amic']))
+    gc.collect()
+    assert cstr_value(cstr) == b'dynamic'
+
+def test_backend_selection():
+    #pylint:disable=protected-access
+    assert nativeagent._get_loadsdk(None) is cffiiface.loadsdk
+    assert nativeagent._get_loadsdk('cffi') is cffiiface.loadsdk
+    assert nativeagent._get_loadsdk(None, retain_gil=True) is not cffiiface.loadsdk
+    assert nativeagent._get_loadsdk(None, lazy_bind=True) is not cffiiface.loadsdk
+    assert nativeagent._get_loadsdk('ctypes') is not cffiiface.loadsdk
+    with pytest.raises(ValueError):
+        nativeagent._get_loadsdk('other')
+
+@pytest.mark.dependsnative
+def test_cffi_smoke():
+    nsdk = cffiiface.loadsdk()
+    nativeagent.checkresult(
+        nsdk, nsdk.stub_set_variable('agentactive=true', False))
+    assert nsdk.agent_get_current_state() == AgentState.NOT_INITIALIZED
+    assert nsdk.strerror(cffiiface.ErrorCode.AGENT_NOT_ACTIVE)
+    nsdk.stub_free_variables()
@@ -0,0 +1,166 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Tests for the parts of the ctypes backend that do not need the native stub.'''
+
+import array
+import ctypes
+import sys
+import threading
+
+import pytest
+
+from oneagent._impl.native import sdkctypesiface as csdk
+
+def ccstr_value(ccstr):
+    return ctypes.string_at(ccstr.data, ccstr.bytes_length)
+
+def test_ccstring_cache_hit_miss():
+    cache = csdk.CCStringCache(maxsize=4)
+    first = cache.lookup(u'OrderService')
+    assert ccstr_value(first) == b'OrderService'
+    assert first.ccsid == csdk.CCSID_UTF8
+    assert cache.lookup(u'OrderService') is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_ccstring_cache_lru_eviction():
+    cache = csdk.CCStringCache(maxsize=2)
+    a_str = cache.lookup(u'a')
+    cache.lookup(u'b')
+    assert cache.lookup(u'a') is a_str # a is now most recently used
+    cache.lookup(u'c') # Evicts b
+    assert len(cache) == 2
+    assert cache.lookup(u'a') is a_str
+    misses = cache.misses
+    cache.lookup(u'b')
+    assert cache.misses == misses + 1
+
+def test_ccstring_cache_limits():
+    cache = csdk.CCStringCache(maxsize=8, max_str_len=3)
+    assert cache.lookup(u'long') is not cache.lookup(u'long')
+    assert not cache
+    cache.lookup(u'x')
+    cache.resize(0)
+    assert not cache
+    assert cache.lookup(u'x') is not cache.lookup(u'x')
+    assert ccstr_value(cache.lookup(u'ä')) == u'ä'.encode('utf-8')
+
+@pytest.mark.parametrize('lock_free_hits', [False, True])
+def test_ccstring_cache_threads(monkeypatch, lock_free_hits):
+    if lock_free_hits and not csdk.CCStringCache._LOCK_FREE_HITS: #pylint:disable=protected-access
+        pytest.skip('Needs the C implementation of OrderedDict')
+    monkeypatch.setattr(csdk.CCStringCache, '_LOCK_FREE_HITS', lock_free_hits)
+    cache = csdk.CCStringCache(maxsize=16)
+    names = [u'name' + str(i) for i in range(32)]
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(200):
+                for name in names:
+                    assert ccstr_value(cache.lookup(name)) == name.encode('ascii')
+        except Exception as e: #pylint:disable=broad-except
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache) == 16
+    assert cache.misses >= len(names)
+    assert 0 < cache.hits + cache.misses <= 4 * 200 * len(names)
+
+def test_ccstring_from_param_uses_cache():
+    assert csdk.CCString.from_param(u'handle') is csdk.CCString.from_param(u'handle')
+    assert ccstr_value(csdk.CCString.from_param(b'raw')) == b'raw'
+    assert csdk.CCString.from_param(None) is csdk.NULL_STR
+
+def test_thread_buffers_grow_only():
+    buffers = csdk._ThreadBuffers() #pylint:disable=protected-access
+    key_arr, val_arr = buffers.arrays(csdk.CCString, 3)
+    assert len(key_arr) >= 3 and len(val_arr) >= 3
+    assert key_arr is not val_arr
+    assert buffers.arrays(csdk.CCString, 2) == (key_arr, val_arr)
+    key_arr2, int_arr = buffers.arrays(ctypes.c_int64, 100)
+    assert len(key_arr2) >= 100 and len(int_arr) >= 100
+    assert isinstance(int_arr[0], int)
+    assert buffers.arrays(csdk.CCString, 100)[0] is key_arr2
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(buffers.arrays(csdk.CCString, 1)))
+    thread.start()
+    thread.join()
+    assert other[0][0] is not key_arr2
+
+def test_thread_buffers_bounded_and_cleared():
+    buffers = csdk._ThreadBuffers() #pylint:disable=protected-access
+    limit = buffers._MAX_CAPACITY #pylint:disable=protected-access
+    key_arr, val_arr = buffers.arrays(csdk.CCString, limit + 1)
+    assert len(key_arr) > limit and len(val_arr) > limit
+    assert buffers.arrays(csdk.CCString, limit + 1)[0] is not key_arr
+    assert buffers.key_arr is None
+
+    key_arr = buffers.arrays(csdk.CCString, 2)[0]
+    data = b'large cookie'
+    refcount = sys.getrefcount(data)
+    key_arr[0] = csdk.CCString.from_param(data)
+    assert sys.getrefcount(data) > refcount
+    buffers.clear(key_arr, 1)
+    assert sys.getrefcount(data) == refcount
+    assert not key_arr[0].data and key_arr[0].bytes_length == 0
+
+def test_thread_buffers_fill_tag_buf():
+    buffers = csdk._ThreadBuffers() #pylint:disable=protected-access
+    calls = []
+
+    def getter(tag, buf, buf_size, required_size):
+        calls.append(buf_size)
+        required_size.value = len(tag)
+        if buf_size < len(tag):
+            return 0
+        buf[:len(tag)] = tag
+        return len(tag)
+
+    assert buffers.fill_tag_buf(getter, b'small\0tag') == (b'small\0tag', 9)
+    assert len(calls) == 1
+    del calls[:]
+    big_tag = b'x' * (csdk._TAG_BUFFER_SIZE + 1) #pylint:disable=protected-access
+    assert buffers.fill_tag_buf(getter, big_tag) == (big_tag, len(big_tag))
+    assert len(calls) == 2
+    del calls[:]
+    assert buffers.fill_tag_buf(getter, big_tag)[0] == big_tag
+    assert len(calls) == 1 # The buffer has grown
+
+def test_invalid_tracecontext_shared():
+    #pylint:disable=protected-access
+    ctx = csdk._invalid_tracecontext(csdk.ErrorCode.NO_DATA)
+    assert ctx == (csdk.ErrorCode.NO_DATA, '0' * 32, '0' * 16)
+    assert csdk._invalid_tracecontext(csdk.ErrorCode.NO_DATA) is ctx
+
+def test_numeric_buffer_formats():
+    #pylint:disable=protected-access
+    ints, floats = csdk._INT64_BUFFER_FORMATS, csdk._DOUBLE_BUFFER_FORMATS
+    assert csdk.numeric_buffer(array.array('q', [1, 2]), ints).tolist() == [1, 2]
+    assert csdk.numeric_buffer(array.array('d', [0.5]), floats).tolist() == [0.5]
+    assert csdk.numeric_buffer(array.array('d', [0.5]), ints) is None
+    assert csdk.numeric_buffer(array.array('f', [0.5]), floats) is None
+    assert csdk.numeric_buffer(array.array('i', [1]), ints) is None
+    assert csdk.numeric_buffer([1, 2], ints) is None
+    assert csdk.numeric_buffer(b'12345678', ints) is None
+    view = memoryview(array.array('q', range(4)))
+    assert csdk.numeric_buffer(view[::2], ints) is None
+    assert csdk.numeric_buffer(view.cast('B').cast('q', (2, 2)), ints) is None
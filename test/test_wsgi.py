@@ -0,0 +1,244 @@
+#
+# Copyright 2018 Dynatrace LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+from oneagent.sdk import sampling
+from oneagent.sdk.wsgi import TracingMiddleware, environ_headers
+
+import sdkmockiface
+
+from testhelpers import get_nsdk, create_dummy_entrypoint
+
+RTERR_QNAME = RuntimeError.__module__ + '.RuntimeError'
+
+class SequenceSampler(sampling.Sampler):
+    def __init__(self, results):
+        self.results = list(results)
+
+    def should_sample(self, service, has_tag):
+        return self.results.pop(0)
+
+def make_environ(path='/app/items', **extra):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'SCRIPT_NAME': '/app',
+        'PATH_INFO': path[len('/app'):],
+        'QUERY_STRING': 'q=1',
+        'SERVER_NAME': 'example.com',
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '10.0.0.1',
+        'CONTENT_TYPE': 'text/plain',
+        'HTTP_HOST': 'example.com',
+        'HTTP_X_REQUEST_ID': '42'}
+    environ.update(extra)
+    setup_testing_defaults(environ)
+    return environ
+
+def run(app, environ):
+    statuses = []
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+    result = app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        result.close()
+    return statuses, body
+
+def test_environ_headers():
+    names, values, count = environ_headers(make_environ())
+    assert count == 3
+    assert sorted(zip(names, values)) == [
+        ('Content-Type', 'text/plain'), ('Host', 'example.com'), ('X-Request-Id', '42')]
+
+def test_wsgi_streaming_response(sdk):
+    nsdk = get_nsdk(sdk)
+    closed = []
+
+    class Body(object):
+        def __iter__(self):
+            yield b'a'
+            # Still traced while the response is streamed
+            assert nsdk.get_path().nodestack
+            yield b'b'
+
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        start_response('201 Created', [('Content-Type', 'text/plain'), ('X-Out', 'x')])
+        return Body()
+
+    traced = TracingMiddleware(app, sdk=sdk)
+    assert traced.application_id.endswith('app')
+    assert run(traced, make_environ()) == (['201 Created'], b'ab')
+    assert run(traced, make_environ())[1] == b'ab'
+    assert closed == [True, True]
+
+    assert len(nsdk.finished_paths) == 2
+    root = nsdk.finished_paths[0]
+    assert isinstance(root, sdkmockiface.InWebReqHandle)
+    assert root.vals[1:] == ('http://example.com/app/items?q=1', 'POST')
+    assert root.vals[0].vals == ('example.com', traced.application_id, '/app')
+    # The web application info is reused.
+    assert nsdk.finished_paths[1].vals[0] is root.vals[0]
+    assert sorted(root.req_hdrs) == [
+        ('Content-Type', 'text/plain'), ('Host', 'example.com'), ('X-Request-Id', '42')]
+    assert root.resp_hdrs == [('Content-Type', 'text/plain'), ('X-Out', 'x')]
+    assert root.resp_code == 201
+    assert root.remote_addr == '10.0.0.1'
+    assert root.err_info is None
+    traced.close()
+
+def test_wsgi_replaced_response(sdk):
+    nsdk = get_nsdk(sdk)
+    def app(environ, start_response):
+        start_response('200 OK', [('X-Out', 'x')])
+        try:
+            raise ValueError('late')
+        except ValueError:
+            start_response('500 Internal Server Error', [('X-Err', 'e')], sys.exc_info())
+        return [b'error']
+
+    traced = TracingMiddleware(app, sdk=sdk)
+    assert run(traced, make_environ()) == (['200 OK', '500 Internal Server Error'], b'error')
+    root = nsdk.finished_paths[0]
+    # Only the last response is recorded.
+    assert root.resp_code == 500
+    assert root.resp_hdrs == [('X-Err', 'e')]
+    traced.close()
+
+def test_wsgi_file_wrapper(sdk):
+    nsdk = get_nsdk(sdk)
+    closed = []
+
+    class FileWrapper(object):
+        def __init__(self, filelike, block_size=8192):
+            self.filelike = filelike
+            self.block_size = block_size
+
+        def __iter__(self):
+            return iter([self.filelike])
+
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        start_response('200 OK', [])
+        return environ['wsgi.file_wrapper'](b'file')
+
+    traced = TracingMiddleware(app, sdk=sdk)
+    environ = make_environ(**{'wsgi.file_wrapper': FileWrapper})
+    result = traced(environ, lambda status, headers, exc_info=None: None)
+    # Passed through, so that the server can recognize it.
+    assert isinstance(result, FileWrapper)
+    assert nsdk.get_path().nodestack
+    result.close()
+    assert closed == [True]
+    assert not nsdk.get_path().nodestack
+    assert len(nsdk.finished_paths) == 1
+    traced.close()
+
+def test_wsgi_untraced_headers_not_read(sdk):
+    class Environ(dict):
+        walked = False
+
+        def items(self):
+            self.walked = True
+            return dict.items(self)
+
+        iteritems = items
+
+    def app(environ, start_response):
+        start_response('200 OK', [])
+        return [b'']
+
+    traced = TracingMiddleware(app, sdk=sdk)
+    sdk.set_sampler(SequenceSampler([False, True]))
+    environ = Environ(make_environ())
+    run(traced, environ)
+    assert not environ.walked
+    run(traced, environ)
+    assert environ.walked
+    assert len(get_nsdk(sdk).finished_paths) == 1
+    traced.close()
+
+def test_wsgi_incoming_tag(sdk):
+    nsdk = get_nsdk(sdk)
+    with create_dummy_entrypoint(sdk):
+        with sdk.trace_outgoing_web_request('http://example.com/', 'GET') as out:
+            tag = out.outgoing_dynatrace_string_tag.decode('utf-8')
+            def app(environ, start_response):
+                start_response('200 OK', [])
+                return [b'']
+            traced = TracingMiddleware(app, 'tagged', 'vhost', '/', sdk=sdk)
+            run(traced, make_environ(HTTP_X_DYNATRACE=tag))
+    traced.close()
+    nsdk.process_finished_paths_tags()
+    _, out_node = nsdk.finished_paths[0].children[0]
+    _, in_node = out_node.children[-1]
+    assert isinstance(in_node, sdkmockiface.InWebReqHandle)
+    assert in_node.vals[0].vals == ('vhost', 'tagged', '/')
+    assert in_node.in_tag_as_id == id(out_node) and in_node.is_in_tag_resolved
+
+def test_wsgi_errors(sdk):
+    nsdk = get_nsdk(sdk)
+
+    def failing_app(environ, start_response):
+        raise RuntimeError('app')
+
+    def failing_body(environ, start_response):
+        start_response('200 OK', [])
+        yield b'a'
+        raise RuntimeError('body')
+
+    for app in (failing_app, failing_body):
+        traced = TracingMiddleware(app, sdk=sdk)
+        with pytest.raises(RuntimeError):
+            run(traced, make_environ())
+        traced.close()
+    assert [path.err_info for path in nsdk.finished_paths] == [
+        (RTERR_QNAME, 'app'), (RTERR_QNAME, 'body')]
+
+def test_wsgi_webapp_info_lifetime(sdk):
+    nsdk = get_nsdk(sdk)
+    def app(environ, start_response):
+        start_response('200 OK', [])
+        return [b'']
+    traced = TracingMiddleware(app, sdk=sdk)
+
+    # Throttling swaps the SDK's interface, but keeps the web application info.
+    run(traced, make_environ())
+    info = traced._webapp_info[1] #pylint:disable=protected-access
+    assert nsdk.finished_paths[-1].vals[0] is info.handle
+    sdk.start_overhead_governor(window=60)
+    try:
+        run(traced, make_environ())
+    finally:
+        sdk.stop_overhead_governor()
+    assert nsdk.finished_paths[-1].vals[0] is info.handle
+
+    # A new native SDK replaces (and closes) it.
+    new_nsdk = sdkmockiface.SDKMockInterface()
+    sdk._set_native_sdk(new_nsdk) #pylint:disable=protected-access
+    handle = info.handle
+    run(traced, make_environ())
+    assert not info
+    assert new_nsdk.finished_paths[-1].vals[0] is not handle
+    traced.close()